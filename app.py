@@ -1,273 +1,168 @@
 import streamlit as st
-import anthropic
+import hmac
 import os
-import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
-import json
 import time
-from urllib.parse import urljoin, urlparse
 
-# Import our new modules
-from gsc_fetcher import GSCFetcher
-from ga4_fetcher import GA4Fetcher
+# Import our new modules. gspread and audit_engine (anthropic, the Google API
+# clients, xhtml2pdf) are imported on first use: Streamlit starts faster and
+# most reruns never need them
 from email_sender import EmailSender
-from pdf_generator import PDFGenerator
-
-load_dotenv()
-api_key = os.getenv('ANTHROPIC_API_KEY')
-client = anthropic.Anthropic(api_key=api_key)
+from lead_writer import BufferedLeadWriter
+from audit_worker import AuditJobQueue, audit_cache_key, job_progress
+from metrics import cache_lookups, start_from_env as start_metrics
+from seo_rules import RULES_BY_KEY, check_page, is_good
 
 st.set_page_config(page_title="AI SEO Audit Tool", page_icon="🔍", layout="wide")
 
+# METRICS_PORT / METRICS_TEXTFILE; a no-op after the first run of the script
+start_metrics()
+
 # Service account email for instructions
 SERVICE_ACCOUNT_EMAIL = st.secrets["gcp_service_account"]["client_email"]
 
+LEADS_SHEET_KEY = '1eilZ_xDiOukzIRRf-f_MHWHfUCA2Btrf16qEgT8jPEE'
+
+def open_leads_sheet():
+    """Authorize gspread and open the leads worksheet"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+    
+    credentials = Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"],
+        scopes=['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+    )
+    gc = gspread.authorize(credentials)
+    return gc.open_by_key(LEADS_SHEET_KEY).sheet1
+
+@st.cache_resource
+def get_lead_writer():
+    """Process-wide buffered writer shared by all sessions"""
+    return BufferedLeadWriter(
+        open_leads_sheet,
+        journal_path=os.getenv('LEADS_JOURNAL_PATH', 'leads_journal.jsonl'),
+        batch_size=int(os.getenv('LEADS_BATCH_SIZE', '20')),
+        flush_interval=float(os.getenv('LEADS_FLUSH_INTERVAL', '15'))
+    )
+
 def save_to_sheets(name, email, company, url, gsc_property, ga4_property_id):
-    """Save lead data to Google Sheets"""
+    """Queue lead data for a batched write to Google Sheets"""
     try:
-        credentials = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        )
-        gc = gspread.authorize(credentials)
-        sheet = gc.open_by_key('1eilZ_xDiOukzIRRf-f_MHWHfUCA2Btrf16qEgT8jPEE').sheet1
-        
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sheet.append_row([timestamp, name, email, company, url, gsc_property, ga4_property_id])
+        get_lead_writer().add([timestamp, name, email, company, url, gsc_property, ga4_property_id])
         return True
     except Exception as e:
         st.error(f"Error saving lead: {e}")
         return False
 
-def fetch_page_with_timing(url):
-    """Fetch page content with timing"""
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        start_time = time.time()
-        response = requests.get(url, headers=headers, timeout=15)
-        load_time = time.time() - start_time
-        return response.text, load_time, len(response.content)
-    except Exception as e:
-        return None, 0, 0
+# Per-page detail limit for large crawls
+MAX_DISPLAYED_PAGES = 25
 
-def check_technical_elements(base_url):
-    """Check robots.txt and sitemap.xml"""
-    domain = urlparse(base_url).scheme + "://" + urlparse(base_url).netloc
-    findings = {}
-    
-    # Check robots.txt
-    try:
-        robots_response = requests.get(f"{domain}/robots.txt", timeout=5)
-        findings['has_robots_txt'] = robots_response.status_code == 200 and len(robots_response.text) > 10
-    except:
-        findings['has_robots_txt'] = False
-    
-    # Check sitemap.xml
-    try:
-        sitemap_response = requests.get(f"{domain}/sitemap.xml", timeout=5)
-        findings['has_sitemap'] = sitemap_response.status_code == 200 and 'xml' in sitemap_response.text[:100].lower()
-    except:
-        findings['has_sitemap'] = False
-    
-    return findings
+@st.cache_resource
+def get_job_queue():
+    """Queue shared with the audit worker pool (audit_worker.py)"""
+    return AuditJobQueue(os.getenv('AUDIT_JOBS_DB_PATH', 'audit_jobs.db'))
 
-def find_internal_links(soup, base_url):
-    """Find important internal pages"""
-    links = []
-    domain = urlparse(base_url).netloc
-    
-    for link in soup.find_all('a', href=True):
-        href = link['href']
-        full_url = urljoin(base_url, href)
-        if urlparse(full_url).netloc == domain:
-            links.append(full_url)
-    
-    important_keywords = ['about', 'contact', 'product', 'service', 'shop', 'store', 'collection', 'blog']
-    important_pages = []
-    
-    for link in links:
-        link_lower = link.lower()
-        if any(keyword in link_lower for keyword in important_keywords):
-            if link not in important_pages and len(important_pages) < 4:
-                important_pages.append(link)
-    
-    has_blog = any('blog' in link.lower() for link in links)
-    
-    return important_pages[:3], has_blog
+def profiling_requested():
+    """
+    Whether this visitor may profile their audit and see the profile
 
-def detect_schemas(soup):
-    """Detect schema markup"""
-    schemas_found = []
-    
-    # JSON-LD
-    json_ld_scripts = soup.find_all('script', type='application/ld+json')
-    for script in json_ld_scripts:
-        try:
-            schema_data = json.loads(script.string)
-            if isinstance(schema_data, dict) and '@type' in schema_data:
-                schemas_found.append(schema_data['@type'])
-            elif isinstance(schema_data, list):
-                for item in schema_data:
-                    if isinstance(item, dict) and '@type' in item:
-                        schemas_found.append(item['@type'])
-        except:
-            pass
-    
-    # Microdata
-    microdata = soup.find_all(attrs={'itemtype': True})
-    for item in microdata:
-        schema_type = item['itemtype'].split('/')[-1]
-        schemas_found.append(schema_type)
-    
-    return list(set(schemas_found))
-
-def check_page_elements(soup):
-    """Check for important page elements"""
-    elements = {}
-    
-    canonical = soup.find('link', rel='canonical')
-    elements['has_canonical'] = canonical is not None
-    
-    meta_robots = soup.find('meta', attrs={'name': 'robots'})
-    elements['meta_robots'] = meta_robots['content'] if meta_robots else None
-    
-    og_title = soup.find('meta', property='og:title')
-    og_desc = soup.find('meta', property='og:description')
-    og_image = soup.find('meta', property='og:image')
-    elements['has_opengraph'] = all([og_title, og_desc, og_image])
-    
-    twitter_card = soup.find('meta', attrs={'name': 'twitter:card'})
-    elements['has_twitter_card'] = twitter_card is not None
-    
-    elements['has_json_ld'] = len(soup.find_all('script', type='application/ld+json')) > 0
-    
-    gsc_meta = soup.find('meta', attrs={'name': 'google-site-verification'})
-    elements['has_gsc_verification'] = gsc_meta is not None
-    
-    hreflang = soup.find_all('link', rel='alternate', hreflang=True)
-    elements['has_hreflang'] = len(hreflang) > 0
-    
-    return elements
-
-def analyze_page_resources(soup):
-    """Analyze images and resources"""
-    images = soup.find_all('img')
-    images_without_alt = [img for img in images if not img.get('alt') or len(img.get('alt', '').strip()) == 0]
-    
-    scripts = soup.find_all('script', src=True)
-    stylesheets = soup.find_all('link', rel='stylesheet')
-    internal_links = soup.find_all('a', href=True)
-    
-    return {
-        'total_images': len(images),
-        'images_without_alt': len(images_without_alt),
-        'external_scripts': len(scripts),
-        'stylesheets': len(stylesheets),
-        'internal_links': len(internal_links)
-    }
+    Profiles expose code paths and server file locations, so this needs
+    ENABLE_PROFILING on the server and ?profile=<token> matching the
+    profiling_token secret; a bare ?profile=1 does nothing.
+    """
+    if os.getenv('ENABLE_PROFILING', '').lower() not in ('1', 'true', 'yes'):
+        return False
+    token = st.secrets.get('profiling_token')
+    supplied = st.query_params.get('profile')
+    return bool(token and supplied) and hmac.compare_digest(str(supplied), str(token))
 
-def analyze_single_page(url, page_name="Page"):
-    """Analyze a single page"""
-    html, load_time, page_size = fetch_page_with_timing(url)
+def run_audit_job(url, client_data, gsc_property=None, ga4_property_id=None, profile=False):
+    """
+    Run the full audit with a progress bar
     
-    if not html:
-        return None
-    
-    soup = BeautifulSoup(html, 'html.parser')
+    Identical audits (same site and properties) within AUDIT_CACHE_TTL seconds
+    on the same day reuse the stored result, or wait for the one in progress.
+    New audits go to the worker pool when workers are running, otherwise they
+    run in this session. A profiled audit always runs afresh.
+    """
+    from audit_engine import render_audit_pdf, run_full_audit
     
-    title = soup.find('title')
-    title_text = title.text.strip() if title else "No title found"
-    
-    meta_desc = soup.find('meta', attrs={'name': 'description'})
-    meta_desc_text = meta_desc['content'] if meta_desc else "No meta description"
+    st.info("🔍 Starting comprehensive audit...")
     
-    h1_tags = soup.find_all('h1')
-    h1_count = len(h1_tags)
-    h1_texts = [h1.text.strip() for h1 in h1_tags[:3]]
+    progress_bar = st.progress(0)
+    status_text = st.empty()
     
-    schemas = detect_schemas(soup)
-    page_elements = check_page_elements(soup)
-    resources = analyze_page_resources(soup)
+    def progress(message, percent=None):
+        status_text.text(message)
+        if percent is not None:
+            progress_bar.progress(percent)
     
-    return {
+    queue = get_job_queue()
+    timeout = float(os.getenv('AUDIT_JOB_TIMEOUT', '1800'))
+    cache_key = audit_cache_key(url, gsc_property, ga4_property_id,
+                                bucket_seconds=int(os.getenv('AUDIT_CACHE_BUCKET', '86400')))
+    params = {
         'url': url,
-        'page_name': page_name,
-        'title': title_text,
-        'title_length': len(title_text),
-        'meta_description': meta_desc_text,
-        'meta_length': len(meta_desc_text),
-        'h1_count': h1_count,
-        'h1_texts': h1_texts,
-        'load_time': round(load_time, 2),
-        'page_size_kb': round(page_size / 1024, 2),
-        'schemas': schemas,
-        'page_elements': page_elements,
-        'resources': resources
+        'client_data': client_data,
+        'gsc_property': gsc_property,
+        'ga4_property_id': ga4_property_id
     }
-
-def comprehensive_audit(url, gsc_property=None, ga4_property_id=None):
-    """Perform comprehensive audit"""
-    st.info("🔍 Starting comprehensive audit...")
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    if profile:
+        params['profile'] = True
+    
+    job = None
+    if not profile:
+        job = queue.find_reusable(cache_key, ttl=float(os.getenv('AUDIT_CACHE_TTL', '3600')))
+        cache_lookups.inc(cache='audit', result='miss' if job is None else 'hit')
+    if job is None and queue.live_workers():
+        job = queue.get(queue.submit(params, cache_key))
+    
+    error = "Could not fetch the website."
+    if job is not None:
+        if job['status'] != 'done':
+            progress("Waiting for the audit to finish...", job['percent'])
+            job = queue.wait(job['id'], on_progress=progress, timeout=timeout)
+        bundle = job['result'] if job else None
+        if job is None:
+            error = "The audit timed out."
+        elif job['error'] and not bundle:
+            error = job['error']
+        elif bundle and (job['params']['client_data'] != client_data or not os.path.exists(bundle['pdf_path'] or '')):
+            # Reused result: the report is personalized, so render it for this visitor
+            progress("📄 Generating PDF report...")
+            bundle['pdf_path'], bundle['pdf_error'] = render_audit_pdf(bundle, client_data)
+    else:
+        # Recorded as running so duplicate submissions wait for this audit
+        job_id = queue.submit(params, cache_key, worker_id=f"inline-{os.getpid()}")
+        try:
+            bundle = run_full_audit(url, client_data, gsc_property, ga4_property_id,
+                                    progress=job_progress(queue, job_id, on_progress=progress), profile=profile or None)
+        except BaseException as e:
+            # Includes Streamlit's StopException/RerunException (a reload or
+            # double-click), so the job is never left 'running' for others to wait on
+            queue.fail(job_id, str(e) if isinstance(e, Exception) else "The audit was interrupted.")
+            raise
+        if bundle:
+            queue.complete(job_id, bundle)
+        else:
+            queue.fail(job_id, error)
     
-    # Technical checks
-    status_text.text("Checking technical infrastructure...")
-    technical_findings = check_technical_elements(url)
-    progress_bar.progress(10)
-    
-    # GSC data
-    gsc_data = None
-    if gsc_property:
-        status_text.text("Fetching Google Search Console data...")
-        gsc_fetcher = GSCFetcher()
-        gsc_data = gsc_fetcher.get_search_analytics(gsc_property, days=28)
-        progress_bar.progress(20)
-    
-    # GA4 data
-    ga4_data = None
-    if ga4_property_id:
-        status_text.text("Fetching Google Analytics data...")
-        ga4_fetcher = GA4Fetcher()
-        ga4_data = ga4_fetcher.get_analytics_data(ga4_property_id, days=28)
-        progress_bar.progress(30)
-    
-    # Analyze homepage
-    status_text.text("Analyzing homepage...")
-    homepage_data = analyze_single_page(url, "Homepage")
-    
-    if not homepage_data:
-        st.error("Could not fetch the website.")
-        return None, None, None, None, None
-    
-    progress_bar.progress(40)
-    
-    # Find additional pages
-    html, _, _ = fetch_page_with_timing(url)
-    soup = BeautifulSoup(html, 'html.parser')
-    additional_urls, has_blog = find_internal_links(soup, url)
-    
-    all_pages_data = [homepage_data]
-    
-    for idx, add_url in enumerate(additional_urls[:3]):
-        status_text.text(f"Analyzing page {idx + 2}...")
-        page_data = analyze_single_page(add_url, f"Page {idx + 2}")
-        if page_data:
-            all_pages_data.append(page_data)
-        progress_bar.progress(40 + (idx + 1) * 15)
-    
-    progress_bar.progress(100)
-    status_text.text("✅ Audit complete!")
     time.sleep(0.5)
     status_text.empty()
     progress_bar.empty()
     
-    return all_pages_data, technical_findings, has_blog, gsc_data, ga4_data
+    if not bundle:
+        st.error(error)
+    return bundle
+
+def metric_delta(entry, absolute=False):
+    """st.metric delta for a trends.change() entry: percent change, or the plain difference for rates"""
+    if not entry:
+        return None
+    if absolute or entry['change_pct'] is None:
+        return f"{entry['change']:+}"
+    return f"{entry['change_pct']:+.1f}%"
 
 def display_gsc_insights(gsc_data):
     """Display GSC data"""
@@ -278,18 +173,43 @@ def display_gsc_insights(gsc_data):
     st.subheader("🔍 Google Search Console Insights")
     
     summary = gsc_data['summary']
+    comparison = gsc_data.get('comparison')
+    changes = comparison['changes'] if comparison else {}
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Clicks", f"{summary['total_clicks']:,}")
+        st.metric("Total Clicks", f"{summary['total_clicks']:,}", delta=metric_delta(changes.get('total_clicks')))
     with col2:
-        st.metric("Impressions", f"{summary['total_impressions']:,}")
+        st.metric("Impressions", f"{summary['total_impressions']:,}",
+                 delta=metric_delta(changes.get('total_impressions')))
     with col3:
-        st.metric("Avg CTR", f"{summary['avg_ctr']}%")
+        st.metric("Avg CTR", f"{summary['avg_ctr']}%", delta=metric_delta(changes.get('avg_ctr'), absolute=True))
     with col4:
-        st.metric("Avg Position", f"{summary['avg_position']}")
-    
-    st.caption(f"Data from: {summary['date_range']}")
+        # A lower position is better
+        st.metric("Avg Position", f"{summary['avg_position']}",
+                 delta=metric_delta(changes.get('avg_position'), absolute=True), delta_color="inverse")
+    
+    st.caption(f"Data from: {summary['date_range']}"
+               + (f" (changes vs {comparison['date_range']})" if comparison else ""))
+    
+    if comparison:
+        movement = comparison['queries']
+        with st.expander(f"📈 Query movement ({movement['new_count']} new, {movement['lost_count']} lost)"):
+            col_a, col_b = st.columns(2)
+            with col_a:
+                st.write("**Gaining clicks**")
+                for entry in movement['gainers']:
+                    st.caption(f"{entry['key']}: +{entry['clicks_change']} clicks ({entry['clicks']} total)")
+                st.write("**Moving up**")
+                for entry in movement['improved']:
+                    st.caption(f"{entry['key']}: position {entry['position']} ({entry['position_change']:+})")
+            with col_b:
+                st.write("**Losing clicks**")
+                for entry in movement['losers']:
+                    st.caption(f"{entry['key']}: {entry['clicks_change']} clicks ({entry['clicks']} total)")
+                st.write("**Moving down**")
+                for entry in movement['declined']:
+                    st.caption(f"{entry['key']}: position {entry['position']} ({entry['position_change']:+})")
     
     # Top queries
     with st.expander("🔎 Top Search Queries", expanded=True):
@@ -322,62 +242,141 @@ def display_ga4_insights(ga4_data):
     st.subheader("📊 Google Analytics Insights")
     
     overall = ga4_data.get('overall')
+    comparison = ga4_data.get('comparison')
+    changes = comparison['changes'] if comparison else {}
     if overall:
         col1, col2, col3, col4, col5 = st.columns(5)
         with col1:
-            st.metric("Sessions", f"{overall['sessions']:,}")
+            st.metric("Sessions", f"{overall['sessions']:,}", delta=metric_delta(changes.get('sessions')))
         with col2:
-            st.metric("Users", f"{overall['users']:,}")
+            st.metric("Users", f"{overall['users']:,}", delta=metric_delta(changes.get('users')))
         with col3:
-            st.metric("Pageviews", f"{overall['pageviews']:,}")
+            st.metric("Pageviews", f"{overall['pageviews']:,}", delta=metric_delta(changes.get('pageviews')))
         with col4:
-            st.metric("Bounce Rate", f"{overall['bounce_rate']}%")
+            st.metric("Bounce Rate", f"{overall['bounce_rate']}%",
+                     delta=metric_delta(changes.get('bounce_rate'), absolute=True), delta_color="inverse")
         with col5:
-            st.metric("Avg Duration", f"{int(overall['avg_session_duration'])}s")
+            st.metric("Avg Duration", f"{int(overall['avg_session_duration'])}s",
+                     delta=metric_delta(changes.get('avg_session_duration')))
         
-        st.caption(f"Data from: {ga4_data['date_range']}")
+        st.caption(f"Data from: {ga4_data['date_range']}"
+                   + (f" (changes vs {comparison['date_range']})" if comparison else ""))
     
     # Top pages
     with st.expander("📈 Top Pages by Traffic", expanded=True):
         for page in ga4_data['top_pages'][:10]:
             st.write(f"**{page['page']}**")
             cols = st.columns(2)
-            cols[0].caption(f"Pageviews: {page['pageviews']:,}")
-            cols[1].caption(f"Sessions: {page['sessions']:,}")
+            cols[0].caption(f"Pageviews: {page['pageviews']:,}"
+                            + (f" (was {page['previous_pageviews']:,})" if 'previous_pageviews' in page else ""))
+            cols[1].caption(f"Sessions: {page['sessions']:,}"
+                            + (f" (was {page['previous_sessions']:,})" if 'previous_sessions' in page else ""))
     
     # Traffic sources
     with st.expander("🌐 Traffic Sources"):
         for source in ga4_data['traffic_sources'][:10]:
             st.write(f"**{source['source']}**")
-            st.caption(f"Sessions: {source['sessions']:,}")
+            st.caption(f"Sessions: {source['sessions']:,}"
+                       + (f" (was {source['previous_sessions']:,})" if 'previous_sessions' in source else ""))
+
+def display_changes(changes):
+    """Display what changed since the previous audit"""
+    st.header("🔄 What Changed")
+    st.caption(f"Compared with the audit from {changes['previous_audit_at']}")
+    
+    if not changes['has_changes']:
+        st.success("No changes since the last audit.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Changed Pages", changes['changed_page_count'])
+    with col2:
+        st.metric("Unchanged Pages", changes['unchanged_pages'])
+    with col3:
+        st.metric("New Pages", changes['added_count'])
+    with col4:
+        st.metric("Pages Gone", changes['removed_count'])
+    
+    for change in changes['site_changes']:
+        st.write(f"**{change['field'].replace('_', ' ').capitalize()}:** {change['before']} → {change['after']}")
+    
+    if changes['page_changes']:
+        with st.expander(f"📝 {changes['changed_page_count']} changed pages"):
+            for page_change in changes['page_changes']:
+                st.write(f"**{page_change['url']}**")
+                details = [f"{change['field'].replace('_', ' ')}: {change['before']} → {change['after']}"
+                           for change in page_change['fields']]
+                st.caption(" | ".join(details) if details else "Content changed")
+    if changes['added_pages']:
+        with st.expander(f"🆕 {changes['added_count']} new pages"):
+            for added_url in changes['added_pages']:
+                st.write(added_url)
+    if changes['removed_pages']:
+        with st.expander(f"🗑️ {changes['removed_count']} pages no longer found"):
+            for removed_url in changes['removed_pages']:
+                st.write(removed_url)
+
+def display_page_scores(page_scores):
+    """Display the distribution of page scores across the crawl"""
+    st.header("📈 Site-wide Page Scores")
+    percentiles = page_scores['percentiles']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Median Page Score", percentiles['p50'])
+    with col2:
+        st.metric("Weakest 10% Below", percentiles['p10'])
+    with col3:
+        st.metric("Top 10% Above", percentiles['p90'])
+    with col4:
+        st.metric("Pages Under 40", page_scores['bands']['critical'],
+                 delta="✓" if page_scores['bands']['critical'] == 0 else "⚠")
+    
+    with st.expander("✅ Checks passed across pages"):
+        st.dataframe([
+            {'Check': rule['label'], 'Target': rule['target'], 'Pages passing': f"{rule['passed_pct']}%",
+             'Pages failing': rule['failing']}
+            for rule in page_scores['rules']
+        ], use_container_width=True)
+    if page_scores['weakest']:
+        with st.expander("🩹 Lowest-scoring pages"):
+            for weak in page_scores['weakest']:
+                st.write(f"**{weak['url']}** — {weak['score']}")
+                st.caption(f"Fails: {', '.join(weak['failed'])}" if weak['failed'] else "Passes every check")
 
 def display_page_results(page_data):
     """Display page analysis"""
     st.markdown(f"### 📄 {page_data['page_name']}")
     st.caption(page_data['url'])
     
+    checks = check_page(page_data)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric("Title Length", f"{page_data['title_length']} chars",
-                 delta="✓" if 50 <= page_data['title_length'] <= 60 else "⚠")
+                 delta="✓" if is_good(checks, 'title_length') else "⚠",
+                 help=f"Target: {RULES_BY_KEY['title_length'].target}")
     
     with col2:
         st.metric("Meta Desc Length", f"{page_data['meta_length']} chars",
-                 delta="✓" if 120 <= page_data['meta_length'] <= 160 else "⚠")
+                 delta="✓" if is_good(checks, 'meta_length') else "⚠",
+                 help=f"Target: {RULES_BY_KEY['meta_length'].target}")
     
     with col3:
         st.metric("Load Time", f"{page_data['load_time']}s",
-                 delta="✓" if page_data['load_time'] < 3 else "⚠")
+                 delta="✓" if is_good(checks, 'load_time') else "⚠",
+                 help=f"Target: {RULES_BY_KEY['load_time'].target}")
     
     with col4:
         st.metric("Page Size", f"{page_data['page_size_kb']} KB",
-                 delta="✓" if page_data['page_size_kb'] < 1000 else "⚠")
+                 delta="✓" if is_good(checks, 'page_size') else "⚠",
+                 help=f"Target: {RULES_BY_KEY['page_size'].target}")
     
     with st.expander("📋 View Details", expanded=False):
         st.write(f"**Title:** {page_data['title']}")
         st.write(f"**Meta Description:** {page_data['meta_description']}")
         st.write(f"**H1 Count:** {page_data['h1_count']} - {', '.join(page_data['h1_texts'][:2])}")
+        st.write(f"**Word Count:** {page_data['word_count']}")
         
         if page_data['schemas']:
             st.write(f"**Schema Markup:** {', '.join(page_data['schemas'])}")
@@ -396,93 +395,43 @@ def display_page_results(page_data):
         with col_b:
             st.write(f"**Internal Links:** {page_data['resources']['internal_links']}")
             st.write(f"**External Scripts:** {page_data['resources']['external_scripts']}")
+            if 'broken_links' in page_data:
+                st.write(f"**Broken Links:** {page_data['broken_links']}")
+        
+        timing = page_data['timing']
+        phases = timing['phases']
+        if timing['runs'] > 1:
+            st.write(f"**Load Time:** median {phases['total']['median']}s, p90 {phases['total']['p90']}s over {timing['runs']} runs")
+        else:
+            st.write(f"**Load Time:** {phases['total']['median']}s")
+        st.caption(f"DNS {phases['dns']['median']}s · Connect {phases['connect']['median']}s · "
+                   f"TLS {phases['tls']['median']}s · TTFB {phases['ttfb']['median']}s · "
+                   f"Transfer {phases['transfer']['median']}s"
+                   + (f" · Redirects {phases['redirect']['median']}s" if phases['redirect']['median'] else ""))
+        weight = page_data['page_weight']
+        kb_by_kind = weight['kb_by_kind']
+        st.write(f"**Page Weight:** {weight['total_kb']} KB transferred "
+                 f"(scripts {kb_by_kind.get('scripts', 0)} KB, CSS {kb_by_kind.get('stylesheets', 0)} KB, "
+                 f"images {kb_by_kind.get('images', 0)} KB)")
+        issues = [f"{count} {label}" for count, label in (
+            (weight['uncompressed_count'], "uncompressed"),
+            (weight['poorly_cached_count'], "cached under a day"),
+            (weight['legacy_image_count'], "images not in WebP/AVIF"),
+            (weight['failed_count'], "failed to load")
+        ) if count]
+        if issues:
+            st.caption(f"{weight['asset_count']} assets: {', '.join(issues)}")
+        if weight['heaviest']:
+            st.caption("Heaviest: " + ", ".join(f"{asset['url'].rsplit('/', 1)[-1] or asset['url']} ({asset['kb']} KB)"
+                                                  for asset in weight['heaviest'][:3]))
+        
+        if 'internal_pagerank' in page_data:
+            st.write(f"**Internal PageRank:** {page_data['internal_pagerank']}× site average | "
+                     f"**Inbound Links:** {page_data['inlinks']} | "
+                     f"**Click Depth:** {page_data['click_depth'] if page_data['click_depth'] is not None else 'Unreachable'}")
     
     st.markdown("---")
 
-def generate_ai_recommendations(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data):
-    """Generate AI recommendations based on all data"""
-    
-    summary = f"""COMPREHENSIVE SEO AUDIT FOR: {all_pages_data[0]['url']}
-
-TECHNICAL INFRASTRUCTURE:
-- robots.txt: {'✅ EXISTS' if technical_findings['has_robots_txt'] else '❌ MISSING'}
-- sitemap.xml: {'✅ EXISTS' if technical_findings['has_sitemap'] else '❌ MISSING'}
-- Blog/Content section: {'✅ FOUND' if has_blog else '❌ NOT FOUND'}
-
-PAGES ANALYZED: {len(all_pages_data)}
-
-"""
-    
-    # Add GSC insights to summary
-    if gsc_data and gsc_data.get('success'):
-        summary += f"""
-GOOGLE SEARCH CONSOLE DATA (Last 28 days):
-- Total Clicks: {gsc_data['summary']['total_clicks']:,}
-- Total Impressions: {gsc_data['summary']['total_impressions']:,}
-- Average CTR: {gsc_data['summary']['avg_ctr']}%
-- Average Position: {gsc_data['summary']['avg_position']}
-
-Top 5 Queries:
-"""
-        for q in gsc_data['queries'][:5]:
-            summary += f"  - {q['keys'][0]}: {q.get('clicks', 0)} clicks, Position {round(q.get('position', 0), 1)}\n"
-    
-    # Add GA4 insights
-    if ga4_data and ga4_data.get('success') and ga4_data.get('overall'):
-        summary += f"""
-GOOGLE ANALYTICS DATA (Last 28 days):
-- Sessions: {ga4_data['overall']['sessions']:,}
-- Users: {ga4_data['overall']['users']:,}
-- Pageviews: {ga4_data['overall']['pageviews']:,}
-- Bounce Rate: {ga4_data['overall']['bounce_rate']}%
-
-Top 3 Pages:
-"""
-        for p in ga4_data['top_pages'][:3]:
-            summary += f"  - {p['page']}: {p['pageviews']:,} views\n"
-    
-    # Add page details
-    for page in all_pages_data:
-        summary += f"\n{page['page_name']} - {page['url']}\n"
-        summary += f"Title: {page['title']} ({page['title_length']} chars - {'GOOD' if 50 <= page['title_length'] <= 60 else 'NEEDS OPTIMIZATION'})\n"
-        summary += f"Meta: {page['meta_length']} chars - {'GOOD' if 120 <= page['meta_length'] <= 160 else 'NEEDS WORK'}\n"
-        summary += f"H1 tags: {page['h1_count']} - {'GOOD' if page['h1_count'] == 1 else 'ISSUE'}\n"
-        summary += f"Load time: {page['load_time']}s - {'GOOD' if page['load_time'] < 3 else 'SLOW'}\n"
-        summary += f"Schema: {', '.join(page['schemas']) if page['schemas'] else '❌ MISSING'}\n"
-        summary += f"Images without ALT: {page['resources']['images_without_alt']}/{page['resources']['total_images']}\n"
-    
-    prompt = f"""You are a senior SEO consultant with 20+ years of experience. Based on the verified data below, provide 7-10 specific, prioritized recommendations.
-
-{summary}
-
-CRITICAL RULES:
-1. ONLY recommend fixes for issues actually found in the data
-2. DO NOT suggest things that already exist
-3. Reference specific pages, metrics, and findings
-4. If GSC/GA4 data is available, use it to prioritize recommendations
-5. Focus on high-impact, actionable items
-
-Format:
-## HIGH PRIORITY
-[Issues that significantly impact rankings/traffic]
-
-## MEDIUM PRIORITY  
-[Important optimizations]
-
-## QUICK WINS
-[Easy fixes with good impact]
-
-Be specific, reference exact data, and explain expected impact."""
-
-    with st.spinner('🤖 Generating evidence-based recommendations...'):
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=3500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-    
-    return message.content[0].text
-
 # MAIN APP
 st.title("🔍 AI-Powered SEO Audit Tool")
 st.markdown("**By Punkaj Saini | Digital Marketing Consultant**")
@@ -547,18 +496,37 @@ This gives us access to your actual search queries, traffic data, and performanc
             # Send onboarding email if GSC/GA4 not provided
             if not gsc_property or not ga4_property_id:
                 email_sender.send_onboarding_email(email, name, website_url, SERVICE_ACCOUNT_EMAIL)
-                st.info(f"📧 Sent setup instructions to {email}")
+                st.info(f"📧 Setup instructions are on their way to {email}")
             
             # Run audit
-            all_pages_data, technical_findings, has_blog, gsc_data, ga4_data = comprehensive_audit(
-                website_url, 
+            client_data = {
+                'name': name,
+                'email': email,
+                'company': company or '',
+                'website': website_url
+            }
+            # Operator debug mode (see profiling_requested and profiling.py)
+            show_profile = profiling_requested()
+            bundle = run_audit_job(
+                website_url,
+                client_data,
                 gsc_property if gsc_property else None,
-                ga4_property_id if ga4_property_id else None
+                ga4_property_id if ga4_property_id else None,
+                profile=show_profile
             )
             
-            if all_pages_data:
+            if bundle:
+                all_pages_data = bundle['pages_data']
+                technical_findings = bundle['technical_findings']
+                has_blog = bundle['has_blog']
+                gsc_data = bundle['gsc_data']
+                ga4_data = bundle['ga4_data']
                 st.success(f"✅ Analyzed {len(all_pages_data)} pages successfully!")
                 
+                if technical_findings.get('changes'):
+                    display_changes(technical_findings['changes'])
+                    st.markdown("---")
+                
                 # Technical findings
                 st.header("🔧 Technical Infrastructure")
                 col1, col2, col3 = st.columns(3)
@@ -569,6 +537,104 @@ This gives us access to your actual search queries, traffic data, and performanc
                 with col3:
                     st.metric("Blog Section", "✅ Found" if has_blog else "❌ Not Found")
                 
+                robots = technical_findings.get('robots')
+                if robots and technical_findings['has_robots_txt']:
+                    if robots['blocks_all']:
+                        st.error("robots.txt disallows crawling the whole site.")
+                    st.caption(f"robots.txt: {robots['disallow_rules']} disallow / {robots['allow_rules']} allow rules"
+                               + (f", crawl-delay {robots['crawl_delay']}s" if robots['crawl_delay'] else "")
+                               + f", {robots.get('blocked_urls', 0)} discovered URLs skipped as disallowed")
+                link_graph = technical_findings.get('link_graph')
+                if link_graph:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Orphan Pages", link_graph['orphan_count'],
+                                 delta="✓" if link_graph['orphan_count'] == 0 else "⚠")
+                    with col2:
+                        st.metric("Max Click Depth", link_graph['max_click_depth'],
+                                 delta="✓" if link_graph['max_click_depth'] <= 3 else "⚠")
+                    with col3:
+                        st.metric("Internal Links", f"{link_graph['edges']:,}")
+                    with st.expander("🔗 Strongest Pages by Internal PageRank"):
+                        for top_page in link_graph['top_pages']:
+                            st.write(f"**{top_page['url']}**")
+                            st.caption(f"PageRank: {top_page['internal_pagerank']}× average | Inbound links: {top_page['inlinks']}")
+                    if link_graph['orphan_pages']:
+                        with st.expander(f"🏝️ {link_graph['orphan_count']} orphan pages"):
+                            for orphan_url in link_graph['orphan_pages']:
+                                st.write(orphan_url)
+                link_check = technical_findings.get('link_check')
+                if link_check:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Links Checked", f"{link_check['checked']:,}")
+                    with col2:
+                        st.metric("Broken Links", link_check['broken_count'],
+                                 delta="✓" if link_check['broken_count'] == 0 else "⚠")
+                    with col3:
+                        st.metric("Redirect Chains", link_check['redirect_chain_count'],
+                                 delta="✓" if link_check['redirect_chain_count'] == 0 else "⚠")
+                    if link_check['broken']:
+                        with st.expander(f"❌ {link_check['broken_count']} broken links"):
+                            for broken in link_check['broken']:
+                                st.write(f"**{broken['url']}** — {broken['status'] or broken['error']}")
+                                st.caption(f"Found on: {', '.join(broken['found_on'])}")
+                    if link_check.get('blocked'):
+                        with st.expander(f"🚫 {link_check['blocked_count']} links blocked by robots.txt (not checked)"):
+                            for blocked in link_check['blocked']:
+                                st.write(f"**{blocked['url']}**")
+                                st.caption(f"Found on: {', '.join(blocked['found_on'])}")
+                    if link_check['redirects']:
+                        with st.expander(f"↪️ {link_check['redirected_count']} redirected links"):
+                            for redirect in link_check['redirects']:
+                                st.write(f"**{redirect['url']}** → {redirect['final_url']}")
+                                st.caption(f"{redirect['hops']} hop(s): {' → '.join(str(code) for code in redirect['chain'])}")
+                weight = technical_findings.get('page_weight')
+                if weight and weight['pages']:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Avg Page Weight", f"{weight['avg_page_kb']:,} KB",
+                                 delta="✓" if weight['avg_page_kb'] < 2000 else "⚠")
+                    with col2:
+                        st.metric("Uncompressed Assets", len(weight['uncompressed']),
+                                 delta="✓" if not weight['uncompressed'] else "⚠")
+                    with col3:
+                        st.metric("Legacy Image Formats", len(weight['legacy_images']),
+                                 delta="✓" if not weight['legacy_images'] else "⚠")
+                    if weight['heaviest']:
+                        with st.expander(f"🏋️ Heaviest of {weight['distinct_assets']} assets"):
+                            for asset in weight['heaviest']:
+                                st.write(f"**{asset['url']}**")
+                                st.caption(f"{asset['kind'].capitalize()} · {asset['kb']} KB · loaded by {asset['pages']} page(s)")
+                duplicates = technical_findings.get('duplicates')
+                if duplicates:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Near-Duplicate Pages", duplicates['near_duplicate_count'],
+                                 delta="✓" if duplicates['near_duplicate_count'] == 0 else "⚠")
+                    with col2:
+                        st.metric("Duplicate Titles/Metas", duplicates['duplicate_title_count'] + duplicates['duplicate_meta_count'],
+                                 delta="✓" if not (duplicates['duplicate_title_count'] or duplicates['duplicate_meta_count']) else "⚠")
+                    with col3:
+                        st.metric("Thin Pages", duplicates['thin_page_count'],
+                                 delta="✓" if duplicates['thin_page_count'] == 0 else "⚠")
+                    if duplicates['near_duplicate_groups']:
+                        with st.expander("📑 Near-duplicate page groups"):
+                            for group in duplicates['near_duplicate_groups']:
+                                st.write(" | ".join(group))
+                sitemap = technical_findings.get('sitemap')
+                if sitemap and sitemap['sitemaps']:
+                    st.caption(f"Sitemaps: {len(sitemap['sitemaps'])} file(s), {sitemap['url_count']:,} URLs listed"
+                               + (" (truncated)" if sitemap['truncated'] else ""))
+                coverage = technical_findings.get('sitemap_coverage')
+                if coverage:
+                    st.metric("Crawled Pages in Sitemap", f"{coverage['coverage_pct']}%",
+                             delta="✓" if coverage['coverage_pct'] >= 90 else "⚠")
+                    if coverage['missing_from_sitemap']:
+                        with st.expander(f"🗺️ {coverage['missing_from_sitemap_count']} crawled pages missing from sitemap"):
+                            for missing_url in coverage['missing_from_sitemap']:
+                                st.write(missing_url)
+                
                 st.markdown("---")
                 
                 # GSC insights
@@ -581,57 +647,72 @@ This gives us access to your actual search queries, traffic data, and performanc
                     display_ga4_insights(ga4_data)
                     st.markdown("---")
                 
+                # Page scores across the crawl
+                page_scores = technical_findings.get('page_scores')
+                if page_scores:
+                    display_page_scores(page_scores)
+                    st.markdown("---")
+                
                 # Page analysis
                 st.header("📊 Page-by-Page Analysis")
-                for page_data in all_pages_data:
+                for page_data in all_pages_data[:MAX_DISPLAYED_PAGES]:
                     display_page_results(page_data)
+                if len(all_pages_data) > MAX_DISPLAYED_PAGES:
+                    st.caption(f"Showing {MAX_DISPLAYED_PAGES} of {len(all_pages_data)} analyzed pages.")
                 
                 # AI recommendations
                 st.header("🤖 AI-Powered Recommendations")
                 st.caption("Based on verified findings from this audit")
-                recommendations = generate_ai_recommendations(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data)
+                recommendations = bundle['recommendations']
                 st.markdown(recommendations)
-                
+
+                # Per-stage timings (absent on audits cached before tracing existed)
+                trace = bundle.get('trace')
+                if trace:
+                    with st.expander(f"⏱️ Audit timing ({trace['total_ms'] / 1000:.1f}s)"):
+                        st.dataframe([
+                            {'Stage': stage['name'], 'Calls': stage['count'], 'Total (ms)': stage['total_ms'],
+                             'p50 (ms)': stage['p50_ms'], 'p95 (ms)': stage['p95_ms'], 'Errors': stage['errors']}
+                            for stage in trace['stages']
+                        ], use_container_width=True)
+
+                # Audits profiled through AUDIT_PROFILE, or reused from an
+                # operator's run, keep their profile to operators
+                profile = bundle.get('profile') if show_profile else None
+                if profile and 'skipped' in profile:
+                    st.caption(f"Profiling skipped: {profile['skipped']}")
+                elif profile:
+                    with st.expander(f"🔬 Profile ({profile['duration_s']}s, peak {profile['peak_memory_mb']} MB)"):
+                        st.write("**Where the time went (% of samples):** " + ", ".join(
+                            f"{category} {percent}%" for category, percent in profile['categories'].items()
+                        ))
+                        st.dataframe(profile['top_functions'], use_container_width=True)
+                        st.write("**Top allocation sites**")
+                        st.dataframe(profile['top_allocations'], use_container_width=True)
+                        st.caption(f"Flame graph stacks: {profile['files']['flamegraph']} · "
+                                   f"memory snapshot: {profile['files']['memory']}")
+
                 st.markdown("---")
-                # Generate PDF report
-                with st.spinner("📄 Generating PDF report..."):
-                    try:
-                        pdf_generator = PDFGenerator()
-                        client_data = {
-                            'name': name,
-                            'email': email,
-                            'company': company or '',
-                            'website': website_url
-                        }
-                        
-                        pdf_path = pdf_generator.generate_audit_pdf(
-                            client_data,
-                            all_pages_data,
-                            technical_findings,
-                            has_blog,
-                            gsc_data,
-                            ga4_data,
-                            recommendations
+                # PDF report
+                pdf_path = bundle['pdf_path']
+                if pdf_path:
+                    # Provide download button
+                    with open(pdf_path, "rb") as pdf_file:
+                        st.download_button(
+                            label="📥 Download PDF Report",
+                            data=pdf_file,
+                            file_name=os.path.basename(pdf_path),
+                            mime="application/pdf",
+                            use_container_width=True
                         )
-                        
-                        # Provide download button
-                        with open(pdf_path, "rb") as pdf_file:
-                            st.download_button(
-                                label="📥 Download PDF Report",
-                                data=pdf_file,
-                                file_name=os.path.basename(pdf_path),
-                                mime="application/pdf",
-                                use_container_width=True
-                            )
-                        
-                        # Send email with PDF
-                        email_sender.send_audit_complete_email(email, name, website_url, pdf_path)
-                        st.success("✅ PDF report generated and emailed to you!")
-                        
-                    except Exception as e:
-                        st.warning(f"⚠️ PDF generation failed: {e}")
-                        # Still send email without PDF
-                        email_sender.send_audit_complete_email(email, name, website_url)
+                    
+                    # Send email with PDF
+                    email_sender.send_audit_complete_email(email, name, website_url, pdf_path)
+                    st.success("✅ PDF report generated and emailed to you!")
+                else:
+                    st.warning(f"⚠️ PDF generation failed: {bundle['pdf_error']}")
+                    # Still send email without PDF
+                    email_sender.send_audit_complete_email(email, name, website_url)
                 
                 st.markdown("---")
                 st.success("💡 **Want help implementing these recommendations?** Let's discuss your digital growth strategy.")
@@ -0,0 +1,708 @@
+import json
+import os
+import threading
+
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+# anthropic, the Google API clients and xhtml2pdf take seconds to import and
+# are only needed at some stages, so they are imported where they are used
+from site_crawler import SiteCrawler, normalize_url
+from sitemap_parser import SitemapCollector, sitemap_coverage
+from robots_cache import robots_cache
+from link_graph import analyze_link_graph
+from link_checker import fetched_page_result, link_checker, summarize_link_checks
+from duplicate_detector import content_signature, find_duplicates
+from page_timing import PageTimer
+from page_weight import subresource_analyzer, summarize_page_weight, summarize_site_weight
+from audit_store import AuditStore, content_hash, diff_findings, findings_snapshot, site_key
+from metrics import cache_lookups
+from profiling import profile_audit, profiling_enabled
+from resilience import anthropic_api
+from seo_rules import check_pages, status_text, summarize_page_scores
+from tracing import span, trace_summary, traced
+from trends import format_change
+
+load_dotenv()
+
+# Shared by every audit in the process, created on first use
+_audit_store = None
+_llm_client = None
+_shared_lock = threading.Lock()
+
+def get_audit_store():
+    """Process-wide store of previous audits used for incremental re-audits"""
+    global _audit_store
+    with _shared_lock:
+        if _audit_store is None:
+            _audit_store = AuditStore(os.getenv('AUDIT_STORE_PATH', 'audit_store.db'))
+        return _audit_store
+
+def get_llm_client():
+    global _llm_client
+    with _shared_lock:
+        if _llm_client is None:
+            import anthropic
+            # Retries are left to resilience.anthropic_api
+            _llm_client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), max_retries=0)
+        return _llm_client
+
+def fetch_page_with_timing(url, previous=None, runs=None):
+    """
+    Fetch page content with phase timings
+
+    `runs` cold loads are timed (median/p90 when more than one); defaults to
+    CRAWL_TIMING_RUNS (1), so crawled pages are fetched once.
+    """
+    try:
+        timer = PageTimer(runs=runs or int(os.getenv('CRAWL_TIMING_RUNS', '1')))
+        with span('page.fetch', url=url, conditional=bool(previous)) as s:
+            if previous:
+                timing = timer.measure(url, etag=previous['etag'], last_modified=previous['last_modified'])
+            else:
+                timing = timer.measure(url)
+            s.set_attribute('status', timing['status'])
+            s.set_attribute('transfer_bytes', timing['transfer_bytes'])
+        html = timing.pop('content')
+        return html, timing
+    except Exception as e:
+        return None, None
+
+def check_technical_elements(base_url):
+    """Parse robots.txt and collect URLs from the site's sitemaps"""
+    domain = urlparse(base_url).scheme + "://" + urlparse(base_url).netloc
+    findings = {}
+    
+    # Parse robots.txt once per host (shared, TTL-cached)
+    robots = robots_cache.get(domain)
+    findings['has_robots_txt'] = robots.status == 200 and robots.raw_length > 10
+    findings['robots'] = robots.summary()
+    declared_sitemaps = robots.sitemaps
+    
+    # Sitemaps declared in robots.txt, or /sitemap.xml
+    try:
+        sitemap = SitemapCollector(max_urls=int(os.getenv('SITEMAP_MAX_URLS', '200000'))).collect(domain, declared_sitemaps)
+    except Exception as e:
+        sitemap = {'urls': set(), 'url_count': 0, 'sitemaps': [], 'index_count': 0, 'truncated': False,
+                   'errors': [{'sitemap': domain, 'error': str(e)}]}
+    
+    sitemap_urls = sitemap.pop('urls')
+    findings['has_sitemap'] = len(sitemap['sitemaps']) > 0
+    findings['sitemap'] = sitemap
+    
+    return findings, sitemap_urls
+
+# Per-page detail limits for large crawls
+MAX_PROMPT_PAGES = 15
+
+# Pages worth auditing first when the page budget is small
+IMPORTANT_KEYWORDS = ['about', 'contact', 'product', 'service', 'shop', 'store', 'collection', 'blog']
+
+def extract_links(soup, base_url):
+    """Normalized, deduplicated internal and external links in document order"""
+    domain = urlparse(normalize_url(base_url) or base_url).netloc
+    internal_links = []
+    external_links = []
+    seen = set()
+    
+    for link in soup.find_all('a', href=True):
+        full_url = normalize_url(link['href'], base_url)
+        if not full_url or full_url in seen:
+            continue
+        seen.add(full_url)
+        if urlparse(full_url).netloc == domain:
+            internal_links.append(full_url)
+        else:
+            external_links.append(full_url)
+    
+    return internal_links, external_links
+
+def detect_schemas(soup):
+    """Detect schema markup"""
+    schemas_found = []
+    
+    # JSON-LD
+    json_ld_scripts = soup.find_all('script', type='application/ld+json')
+    for script in json_ld_scripts:
+        try:
+            schema_data = json.loads(script.string)
+            if isinstance(schema_data, dict) and '@type' in schema_data:
+                schemas_found.append(schema_data['@type'])
+            elif isinstance(schema_data, list):
+                for item in schema_data:
+                    if isinstance(item, dict) and '@type' in item:
+                        schemas_found.append(item['@type'])
+        except:
+            pass
+    
+    # Microdata
+    microdata = soup.find_all(attrs={'itemtype': True})
+    for item in microdata:
+        schema_type = item['itemtype'].split('/')[-1]
+        schemas_found.append(schema_type)
+    
+    return list(set(schemas_found))
+
+def check_page_elements(soup):
+    """Check for important page elements"""
+    elements = {}
+    
+    canonical = soup.find('link', rel='canonical')
+    elements['has_canonical'] = canonical is not None
+    
+    meta_robots = soup.find('meta', attrs={'name': 'robots'})
+    elements['meta_robots'] = meta_robots['content'] if meta_robots else None
+    
+    og_title = soup.find('meta', property='og:title')
+    og_desc = soup.find('meta', property='og:description')
+    og_image = soup.find('meta', property='og:image')
+    elements['has_opengraph'] = all([og_title, og_desc, og_image])
+    
+    twitter_card = soup.find('meta', attrs={'name': 'twitter:card'})
+    elements['has_twitter_card'] = twitter_card is not None
+    
+    elements['has_json_ld'] = len(soup.find_all('script', type='application/ld+json')) > 0
+    
+    gsc_meta = soup.find('meta', attrs={'name': 'google-site-verification'})
+    elements['has_gsc_verification'] = gsc_meta is not None
+    
+    hreflang = soup.find_all('link', rel='alternate', hreflang=True)
+    elements['has_hreflang'] = len(hreflang) > 0
+    
+    return elements
+
+def analyze_page_resources(soup):
+    """Analyze images and resources"""
+    images = soup.find_all('img')
+    images_without_alt = [img for img in images if not img.get('alt') or len(img.get('alt', '').strip()) == 0]
+    
+    scripts = soup.find_all('script', src=True)
+    stylesheets = soup.find_all('link', rel='stylesheet')
+    internal_links = soup.find_all('a', href=True)
+    
+    return {
+        'total_images': len(images),
+        'images_without_alt': len(images_without_alt),
+        'external_scripts': len(scripts),
+        'stylesheets': len(stylesheets),
+        'internal_links': len(internal_links)
+    }
+
+def extract_subresources(soup, base_url):
+    """Absolute URLs of the scripts, stylesheets and images counted by analyze_page_resources"""
+    def urls(tags, attribute):
+        found = (normalize_url(tag[attribute], base_url) for tag in tags if tag.get(attribute))
+        return list(dict.fromkeys(url for url in found if url))
+    
+    return {
+        'scripts': urls(soup.find_all('script', src=True), 'src'),
+        'stylesheets': urls(soup.find_all('link', rel='stylesheet'), 'href'),
+        'images': urls(soup.find_all('img'), 'src')
+    }
+
+def reuse_page_data(stored, page_name, timing=None):
+    """Previous analysis of an unchanged page, with fresh timings if the page was re-fetched"""
+    page_data = dict(stored, page_name=page_name, unchanged=True)
+    if timing:
+        page_data['timing'] = timing
+        page_data['load_time'] = round(timing['phases']['total']['median'], 2)
+    return page_data
+
+@traced('page.analyze')
+def analyze_single_page(url, page_name="Page", timing_runs=None):
+    """
+    Analyze a single page, reusing the stored analysis if its content has not changed
+
+    `timing_runs` is passed to fetch_page_with_timing.
+    """
+    store = get_audit_store()
+    previous = store.get_page(url)
+    html, timing = fetch_page_with_timing(url, previous, timing_runs)
+    
+    if previous and timing and timing['status'] == 304:
+        cache_lookups.inc(cache='page', result='hit')
+        return reuse_page_data(previous['page_data'], page_name, timing)
+    if not html:
+        return None
+    
+    page_hash = content_hash(html)
+    if previous and previous['content_hash'] == page_hash:
+        cache_lookups.inc(cache='page', result='hit')
+        page_data = reuse_page_data(previous['page_data'], page_name, timing)
+        store.put_page(url, page_data, page_hash, timing['etag'], timing['last_modified'])
+        return page_data
+    cache_lookups.inc(cache='page', result='miss')
+    
+    with span('page.parse', url=url):
+        soup = BeautifulSoup(html, 'html.parser')
+    
+    title = soup.find('title')
+    title_text = title.text.strip() if title else "No title found"
+    
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    meta_desc_text = meta_desc['content'] if meta_desc else "No meta description"
+    
+    h1_tags = soup.find_all('h1')
+    h1_count = len(h1_tags)
+    h1_texts = [h1.text.strip() for h1 in h1_tags[:3]]
+    
+    with span('page.extract', url=url):
+        schemas = detect_schemas(soup)
+        page_elements = check_page_elements(soup)
+        resources = analyze_page_resources(soup)
+        subresources = extract_subresources(soup, url)
+        links, external_links = extract_links(soup, url)
+        # Strips boilerplate elements from the soup, so it runs last
+        content = content_signature(soup)
+    with span('page.subresources', url=url, assets=sum(len(urls) for urls in subresources.values())):
+        page_weight = summarize_page_weight(timing['transfer_bytes'], subresource_analyzer.analyze(subresources))
+    
+    page_data = {
+        'url': url,
+        'page_name': page_name,
+        'status': timing['status'],
+        'title': title_text,
+        'title_length': len(title_text),
+        'meta_description': meta_desc_text,
+        'meta_length': len(meta_desc_text),
+        'h1_count': h1_count,
+        'h1_texts': h1_texts,
+        'load_time': round(timing['phases']['total']['median'], 2),
+        'timing': timing,
+        'page_size_kb': round(timing['decoded_bytes'] / 1024, 2),
+        'page_weight_kb': page_weight['total_kb'],
+        'page_weight': page_weight,
+        'subresources': subresources,
+        'schemas': schemas,
+        'page_elements': page_elements,
+        'resources': resources,
+        'links': links,
+        'external_links': external_links,
+        'word_count': content['word_count'],
+        'simhash': content['simhash'],
+        'content_hash': page_hash,
+        'unchanged': False
+    }
+    store.put_page(url, page_data, page_hash, timing['etag'], timing['last_modified'])
+    return page_data
+
+def _no_progress(message, percent=None):
+    pass
+
+def comprehensive_audit(url, gsc_property=None, ga4_property_id=None, max_pages=None, progress=None):
+    """
+    Perform comprehensive audit
+    
+    Args:
+        progress: optional callback(message, percent=None) for status updates
+    
+    Returns:
+        (all_pages_data, technical_findings, has_blog, gsc_data, ga4_data),
+        all None if the site could not be fetched
+    """
+    progress = progress or _no_progress
+    
+    # Technical checks
+    progress("Checking technical infrastructure...", 0)
+    with span('audit.technical'):
+        technical_findings, sitemap_urls = check_technical_elements(url)
+    progress("Checked technical infrastructure", 10)
+    
+    # GSC data
+    gsc_data = None
+    if gsc_property:
+        progress("Fetching Google Search Console data...")
+        from gsc_fetcher import GSCFetcher
+        gsc_fetcher = GSCFetcher()
+        with span('audit.gsc'):
+            gsc_data = gsc_fetcher.get_search_analytics(gsc_property, days=28)
+        progress("Fetched Google Search Console data", 20)
+    
+    # GA4 data
+    ga4_data = None
+    if ga4_property_id:
+        progress("Fetching Google Analytics data...")
+        from ga4_fetcher import GA4Fetcher
+        ga4_fetcher = GA4Fetcher()
+        with span('audit.ga4'):
+            ga4_data = ga4_fetcher.get_analytics_data(ga4_property_id, days=28)
+        progress("Fetched Google Analytics data", 30)
+    
+    # Analyze homepage, timed over PAGE_TIMING_RUNS loads
+    progress("Analyzing homepage...")
+    with span('audit.homepage'):
+        homepage_data = analyze_single_page(url, "Homepage", timing_runs=int(os.getenv('PAGE_TIMING_RUNS', '3')))
+    
+    if not homepage_data:
+        return None, None, None, None, None
+    
+    progress("Analyzed homepage", 40)
+    
+    # Crawl the rest of the site from the homepage's links
+    max_pages = max_pages or int(os.getenv('CRAWL_MAX_PAGES', '4'))
+    
+    def on_page(page_data, pages_done):
+        progress(f"Analyzed {pages_done} of up to {max_pages} pages...", min(40 + int(60 * pages_done / max_pages), 100))
+    
+    crawler = SiteCrawler(
+        analyze_single_page,
+        max_pages=max_pages,
+        max_depth=int(os.getenv('CRAWL_MAX_DEPTH', '3')),
+        max_workers=int(os.getenv('CRAWL_WORKERS', '8')),
+        politeness_delay=float(os.getenv('CRAWL_DELAY', '0.2')),
+        priority_keywords=IMPORTANT_KEYWORDS,
+        robots=robots_cache
+    )
+    with span('audit.crawl', max_pages=max_pages) as s:
+        all_pages_data = crawler.crawl(url, on_page=on_page, start_page=homepage_data, seed_urls=sitemap_urls)
+        s.set_attribute('pages', len(all_pages_data))
+    crawled_urls = {normalize_url(page['url']) for page in all_pages_data}
+    
+    # Crawled pages that answered with an error are reported as broken links
+    # and kept out of the page analysis (scores, duplicates, link graph)
+    error_pages = [page for page in all_pages_data[1:] if page.get('status', 200) >= 400]
+    all_pages_data = all_pages_data[:1] + [page for page in all_pages_data[1:] if page.get('status', 200) < 400]
+    technical_findings['sitemap_coverage'] = sitemap_coverage(all_pages_data, sitemap_urls)
+    technical_findings['robots']['blocked_urls'] = crawler.blocked_by_robots
+    
+    # Internal link structure across the crawled pages
+    progress("Analyzing internal link structure...")
+    with span('audit.link_graph'):
+        technical_findings['link_graph'] = analyze_link_graph(all_pages_data, url, sitemap_urls)
+    
+    # Resolve every discovered link that was not crawled; internal links
+    # robots.txt disallows are listed as blocked rather than requested
+    progress("Checking links for errors and redirects...")
+    uncrawled = dict.fromkeys(
+        link for page in all_pages_data for link in page['links'] + page['external_links'] if link not in crawled_urls
+    )
+    internal = {link for page in all_pages_data for link in page['links']}
+    blocked = dict.fromkeys(link for link in uncrawled if link in internal and not robots_cache.can_fetch(link))
+    to_check = [link for link in uncrawled if link not in blocked][:int(os.getenv('LINK_CHECK_MAX_URLS', '5000'))]
+    with span('audit.link_check', links=len(to_check), blocked=len(blocked)):
+        link_results = link_checker.check(to_check)
+        link_results.update((page['url'], fetched_page_result(page['url'], page['status'], page['timing']['final_url']))
+                            for page in error_pages)
+        technical_findings['link_check'] = summarize_link_checks(all_pages_data, link_results, list(blocked))
+    
+    # Page weight across every distinct asset the crawled pages load (cached per asset)
+    progress("Measuring page weight...")
+    site_assets = {}
+    for page in all_pages_data:
+        for kind, urls in page['subresources'].items():
+            site_assets.setdefault(kind, {}).update(dict.fromkeys(urls))
+    with span('audit.page_weight', assets=sum(len(urls) for urls in site_assets.values())):
+        asset_results = subresource_analyzer.analyze({kind: list(urls) for kind, urls in site_assets.items()})
+        technical_findings['page_weight'] = summarize_site_weight(all_pages_data, asset_results)
+    
+    # Duplicate and thin content across pages
+    with span('audit.duplicates'):
+        technical_findings['duplicates'] = find_duplicates(all_pages_data)
+    
+    # Every page scored against the SEO rules
+    with span('audit.page_scores', pages=len(all_pages_data)):
+        technical_findings['page_scores'] = summarize_page_scores(all_pages_data)
+    has_blog = any('blog' in link.lower() for link in homepage_data['links'])
+    
+    # Compare with the previous audit of this site
+    store = get_audit_store()
+    site = site_key(url)
+    snapshot = findings_snapshot(all_pages_data, technical_findings, gsc_data, ga4_data)
+    previous_run = store.last_run(site)
+    if previous_run:
+        changes = diff_findings(previous_run['snapshot'], snapshot)
+        changes['previous_audit_at'] = previous_run['created_at']
+        changes['previous_recommendations'] = previous_run['recommendations']
+        changes['unchanged_pages'] = sum(1 for page in all_pages_data if page.get('unchanged'))
+        technical_findings['changes'] = changes
+    technical_findings['run_id'] = store.save_run(site, snapshot)
+    
+    progress("✅ Audit complete!", 100)
+    
+    return all_pages_data, technical_findings, has_blog, gsc_data, ga4_data
+
+def build_recommendations_prompt(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data):
+    """LLM prompt summarizing the verified audit findings"""
+    changes = technical_findings.get('changes')
+    summary = f"""COMPREHENSIVE SEO AUDIT FOR: {all_pages_data[0]['url']}
+
+TECHNICAL INFRASTRUCTURE:
+- robots.txt: {'✅ EXISTS' if technical_findings['has_robots_txt'] else '❌ MISSING'}
+- sitemap.xml: {'✅ EXISTS' if technical_findings['has_sitemap'] else '❌ MISSING'}
+- Blog/Content section: {'✅ FOUND' if has_blog else '❌ NOT FOUND'}
+
+PAGES ANALYZED: {len(all_pages_data)}
+
+"""
+    
+    # robots.txt directives
+    robots = technical_findings.get('robots')
+    if robots and technical_findings['has_robots_txt']:
+        summary += f"ROBOTS.TXT: {robots['disallow_rules']} disallow / {robots['allow_rules']} allow rules"
+        summary += f", crawl-delay {robots['crawl_delay']}s" if robots['crawl_delay'] else ""
+        summary += ", BLOCKS THE WHOLE SITE" if robots['blocks_all'] else ""
+        summary += f", {robots.get('blocked_urls', 0)} discovered URLs disallowed\n"
+    
+    # Internal link structure
+    link_graph = technical_findings.get('link_graph')
+    if link_graph:
+        summary += f"""INTERNAL LINK GRAPH: {link_graph['nodes']:,} URLs, {link_graph['edges']:,} links
+- Orphan pages (no internal links pointing to them): {link_graph['orphan_count']}
+- Sitemap URLs not linked from crawled pages: {link_graph['unlinked_sitemap_urls']}
+- Max click depth: {link_graph['max_click_depth']} ({link_graph['deep_pages']} pages deeper than 3 clicks)
+"""
+        for orphan_url in link_graph['orphan_pages'][:5]:
+            summary += f"  - Orphan: {orphan_url}\n"
+    
+    # Broken links and redirects
+    link_check = technical_findings.get('link_check')
+    if link_check:
+        summary += f"""LINK CHECK: {link_check['checked']:,} links checked
+- Broken links (4xx/5xx/unreachable): {link_check['broken_count']}
+- Redirected links: {link_check['redirected_count']} ({link_check['redirect_chain_count']} with chains of 2+ hops)
+- Internal links blocked by robots.txt (not checked): {link_check.get('blocked_count', 0)}
+"""
+        for broken in link_check['broken'][:5]:
+            summary += f"  - Broken: {broken['url']} ({broken['status'] or broken['error']}) on {', '.join(broken['found_on'][:1])}\n"
+    
+    # Page weight
+    weight = technical_findings.get('page_weight')
+    if weight and weight['pages']:
+        summary += f"""PAGE WEIGHT: average {weight['avg_page_kb']} KB per page, heaviest page {weight['max_page_kb']} KB
+- Distinct scripts/stylesheets/images: {weight['distinct_assets']} ({weight['total_asset_kb']:,} KB total)
+- Uncompressed text assets: {len(weight['uncompressed'])}{'+' if len(weight['uncompressed']) >= 10 else ''}
+- Assets cached under a day: {len(weight['poorly_cached'])}{'+' if len(weight['poorly_cached']) >= 10 else ''}
+- Images not in WebP/AVIF: {len(weight['legacy_images'])}{'+' if len(weight['legacy_images']) >= 10 else ''}
+"""
+        for asset in weight['heaviest'][:5]:
+            summary += f"  - Heavy {asset['kind'][:-1]}: {asset['url']} ({asset['kb']} KB, on {asset['pages']} page(s))\n"
+    
+    # Duplicate and thin content
+    duplicates = technical_findings.get('duplicates')
+    if duplicates:
+        summary += f"""CONTENT DUPLICATION:
+- Near-duplicate pages: {duplicates['near_duplicate_count']} in {len(duplicates['near_duplicate_groups'])} group(s)
+- Pages sharing a title: {duplicates['duplicate_title_count']}
+- Pages sharing a meta description: {duplicates['duplicate_meta_count']}
+- Thin pages (under {duplicates['thin_word_count']} words): {duplicates['thin_page_count']}
+"""
+        for group in duplicates['near_duplicate_groups'][:3]:
+            summary += f"  - Near-duplicates: {', '.join(group[:4])}\n"
+    
+    # Page scores across the whole crawl
+    page_scores = technical_findings.get('page_scores')
+    if page_scores:
+        percentiles = page_scores['percentiles']
+        summary += f"""PAGE SCORES (0-100 across {page_scores['pages']} pages): median {percentiles['p50']}, mean {page_scores['mean']}, 10th percentile {percentiles['p10']}, 90th percentile {percentiles['p90']}
+"""
+        for rule in page_scores['rules']:
+            if rule['failing']:
+                summary += f"  - {rule['label']} (target {rule['target']}): failing on {rule['failing']} pages ({100 - rule['passed_pct']:.1f}%)\n"
+        for weak in page_scores['weakest'][:5]:
+            summary += f"  - Weak page: {weak['url']} (score {weak['score']}, fails: {', '.join(weak['failed'])})\n"
+    
+    # Changes since the previous audit
+    if changes:
+        summary += f"CHANGES SINCE LAST AUDIT ({changes['previous_audit_at']}): {changes['changed_page_count']} pages changed, "
+        summary += f"{changes['added_count']} new, {changes['removed_count']} no longer found\n"
+        for change in changes['site_changes']:
+            summary += f"  - {change['field'].replace('_', ' ')}: {change['before']} -> {change['after']}\n"
+        for page_change in changes['page_changes'][:5]:
+            for change in page_change['fields'][:3]:
+                summary += f"  - {page_change['url']} {change['field'].replace('_', ' ')}: {change['before']} -> {change['after']}\n"
+    
+    # Sitemap coverage
+    sitemap = technical_findings.get('sitemap')
+    if sitemap and sitemap['sitemaps']:
+        summary += f"SITEMAPS: {len(sitemap['sitemaps'])} file(s), {sitemap['url_count']:,} URLs listed\n"
+    coverage = technical_findings.get('sitemap_coverage')
+    if coverage:
+        summary += f"- Crawled pages listed in sitemap: {coverage['crawled_in_sitemap']}/{len(all_pages_data)} ({coverage['coverage_pct']}%)\n"
+        for missing_url in coverage['missing_from_sitemap'][:5]:
+            summary += f"  - Not in sitemap: {missing_url}\n"
+    
+    # Add GSC insights to summary
+    if gsc_data and gsc_data.get('success'):
+        summary += f"""
+GOOGLE SEARCH CONSOLE DATA (Last 28 days):
+- Total Clicks: {gsc_data['summary']['total_clicks']:,}
+- Total Impressions: {gsc_data['summary']['total_impressions']:,}
+- Average CTR: {gsc_data['summary']['avg_ctr']}%
+- Average Position: {gsc_data['summary']['avg_position']}
+
+Top 5 Queries:
+"""
+        for q in gsc_data['queries'][:5]:
+            summary += f"  - {q['keys'][0]}: {q.get('clicks', 0)} clicks, Position {round(q.get('position', 0), 1)}\n"
+        comparison = gsc_data.get('comparison')
+        if comparison:
+            changes = comparison['changes']
+            movement = comparison['queries']
+            summary += f"""
+Change vs previous period ({comparison['date_range']}):
+- Clicks: {format_change(changes['total_clicks'])}
+- Impressions: {format_change(changes['total_impressions'])}
+- Average position: {changes['avg_position']['previous']} -> {changes['avg_position']['current']} (lower is better)
+- Queries: {movement['new_count']} new, {movement['lost_count']} no longer ranking
+"""
+            for entry in movement['gainers'][:3]:
+                summary += f"  - Gaining: {entry['key']} (+{entry['clicks_change']} clicks, position {entry['position']})\n"
+            for entry in movement['losers'][:3]:
+                summary += f"  - Losing: {entry['key']} ({entry['clicks_change']} clicks, position {entry['position']})\n"
+            for entry in movement['declined'][:3]:
+                summary += f"  - Dropping: {entry['key']} (position {entry['position']}, {entry['position_change']:+})\n"
+    
+    # Add GA4 insights
+    if ga4_data and ga4_data.get('success') and ga4_data.get('overall'):
+        summary += f"""
+GOOGLE ANALYTICS DATA (Last 28 days):
+- Sessions: {ga4_data['overall']['sessions']:,}
+- Users: {ga4_data['overall']['users']:,}
+- Pageviews: {ga4_data['overall']['pageviews']:,}
+- Bounce Rate: {ga4_data['overall']['bounce_rate']}%
+
+Top 3 Pages:
+"""
+        for p in ga4_data['top_pages'][:3]:
+            summary += f"  - {p['page']}: {p['pageviews']:,} views"
+            summary += f" (previous period {p['previous_pageviews']:,})\n" if 'previous_pageviews' in p else "\n"
+        comparison = ga4_data.get('comparison')
+        if comparison and comparison['overall']:
+            changes = comparison['changes']
+            summary += f"""
+Change vs previous period ({comparison['date_range']}):
+- Sessions: {format_change(changes['sessions'])}
+- Users: {format_change(changes['users'])}
+- Pageviews: {format_change(changes['pageviews'])}
+- Bounce Rate: {changes['bounce_rate']['previous']}% -> {changes['bounce_rate']['current']}%
+"""
+    
+    # Add page details (large crawls are summarized above; only the first pages go in verbatim)
+    if len(all_pages_data) > MAX_PROMPT_PAGES:
+        summary += f"\nShowing details for the first {MAX_PROMPT_PAGES} of {len(all_pages_data)} pages.\n"
+    for page, checks in zip(all_pages_data, check_pages(all_pages_data[:MAX_PROMPT_PAGES])):
+        summary += f"\n{page['page_name']} - {page['url']}\n"
+        summary += f"Title: {page['title']} ({page['title_length']} chars - {status_text(checks, 'title_length')})\n"
+        summary += f"Meta: {page['meta_length']} chars - {status_text(checks, 'meta_length')}\n"
+        summary += f"H1 tags: {page['h1_count']} - {status_text(checks, 'h1_count')}\n"
+        phases = page['timing']['phases']
+        if page['timing']['runs'] > 1:
+            summary += f"Load time: {page['load_time']}s median of {page['timing']['runs']} (p90 {phases['total']['p90']}s, TTFB {phases['ttfb']['median']}s) - {status_text(checks, 'load_time')}\n"
+        else:
+            summary += f"Load time: {page['load_time']}s (TTFB {phases['ttfb']['median']}s) - {status_text(checks, 'load_time')}\n"
+        summary += f"Page weight: {page['page_weight_kb']} KB transferred across {page['page_weight']['asset_count']} assets\n"
+        summary += f"Schema: {', '.join(page['schemas']) if page['schemas'] else '❌ MISSING'}\n"
+        summary += f"Word count: {page['word_count']}\n"
+        summary += f"Images without ALT: {page['resources']['images_without_alt']}/{page['resources']['total_images']}\n"
+    
+    prompt = f"""You are a senior SEO consultant with 20+ years of experience. Based on the verified data below, provide 7-10 specific, prioritized recommendations.
+
+{summary}
+
+CRITICAL RULES:
+1. ONLY recommend fixes for issues actually found in the data
+2. DO NOT suggest things that already exist
+3. Reference specific pages, metrics, and findings
+4. If GSC/GA4 data is available, use it to prioritize recommendations
+5. Focus on high-impact, actionable items
+
+Format:
+## HIGH PRIORITY
+[Issues that significantly impact rankings/traffic]
+
+## MEDIUM PRIORITY  
+[Important optimizations]
+
+## QUICK WINS
+[Easy fixes with good impact]
+
+Be specific, reference exact data, and explain expected impact."""
+
+    return prompt
+
+def generate_ai_recommendations(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data):
+    """Generate AI recommendations based on all data"""
+    # Nothing changed since the last audit: the previous recommendations still apply
+    changes = technical_findings.get('changes')
+    if changes and not changes['has_changes'] and changes['previous_recommendations']:
+        get_audit_store().save_recommendations(technical_findings['run_id'], changes['previous_recommendations'])
+        return changes['previous_recommendations']
+    
+    with span('llm.prompt'):
+        prompt = build_recommendations_prompt(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data)
+    with span('llm.recommendations', model="claude-sonnet-4-20250514", prompt_chars=len(prompt)) as s:
+        message = anthropic_api.call(lambda: get_llm_client().messages.create(
+            model="claude-sonnet-4-20250514",
+            max_tokens=3500,
+            messages=[{"role": "user", "content": prompt}]
+        ))
+        usage = getattr(message, 'usage', None)
+        if usage is not None:
+            s.set_attribute('input_tokens', getattr(usage, 'input_tokens', None))
+            s.set_attribute('output_tokens', getattr(usage, 'output_tokens', None))
+    
+    recommendations = message.content[0].text
+    if 'run_id' in technical_findings:
+        get_audit_store().save_recommendations(technical_findings['run_id'], recommendations)
+    return recommendations
+
+def run_full_audit(url, client_data, gsc_property=None, ga4_property_id=None, max_pages=None, progress=None,
+                   profile=None):
+    """
+    Audit, recommendations and PDF report in one call, for use outside the Streamlit UI
+    
+    Args:
+        client_data: dict with name, email, company, website (for the PDF)
+        profile: profile the run (see profiling.profile_audit); defaults to
+            the AUDIT_PROFILE environment flag
+    
+    Returns:
+        dict with pages_data, technical_findings, has_blog, gsc_data, ga4_data,
+        recommendations, pdf_path, pdf_error, trace (per-stage timings) and,
+        when profiled, profile, or None if the site could not be fetched
+    """
+    if profile is None:
+        profile = profiling_enabled()
+    with profile_audit(site_key(url), enabled=profile) as profile_result, span('audit', url=url) as root:
+        all_pages_data, technical_findings, has_blog, gsc_data, ga4_data = comprehensive_audit(
+            url, gsc_property, ga4_property_id, max_pages=max_pages, progress=progress
+        )
+        if not all_pages_data:
+            root.set_attribute('fetched', False)
+            bundle = None
+        else:
+            progress = progress or _no_progress
+            progress("🤖 Generating evidence-based recommendations...")
+            recommendations = generate_ai_recommendations(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data)
+            
+            progress("📄 Generating PDF report...")
+            bundle = {
+                'pages_data': all_pages_data,
+                'technical_findings': technical_findings,
+                'has_blog': has_blog,
+                'gsc_data': gsc_data,
+                'ga4_data': ga4_data,
+                'recommendations': recommendations
+            }
+            bundle['pdf_path'], bundle['pdf_error'] = render_audit_pdf(bundle, client_data)
+    
+    summary = trace_summary(root)
+    if bundle is not None:
+        bundle['trace'] = summary
+        if profile_result:
+            bundle['profile'] = profile_result
+    return bundle
+
+def render_audit_pdf(bundle, client_data):
+    """PDF report of an audit bundle for `client_data`; returns (pdf_path, error)"""
+    try:
+        from pdf_generator import PDFGenerator
+        with span('pdf.render', pages=len(bundle['pages_data'])):
+            pdf_path = PDFGenerator().generate_audit_pdf(
+                client_data, bundle['pages_data'], bundle['technical_findings'], bundle['has_blog'],
+                bundle['gsc_data'], bundle['ga4_data'], bundle['recommendations']
+            )
+        return pdf_path, None
+    except Exception as e:
+        return None, str(e)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Per-page fields compared between runs
+PAGE_FIELDS = ['title', 'meta_description', 'h1_count', 'word_count', 'schemas', 'broken_links']
+# Metrics that jitter between runs: a change counts only if it exceeds both
+# the absolute minimum given here and NOISE_RATIO of the value
+NOISY_FIELDS = {'load_time': 0.5, 'page_weight_kb': 50, 'avg_page_kb': 50, 'word_count': 20,
+                'gsc_clicks': 10, 'gsc_impressions': 100, 'ga4_sessions': 10, 'median_page_score': 5}
+NOISE_RATIO = 0.2
+
+def content_hash(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+def site_key(url):
+    """Audits are grouped by scheme and host"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class AuditStore:
+    def __init__(self, db_path="audit_store.db"):
+        """
+        Persistent per-site store of analyzed pages and audit runs
+
+        Pages keep their HTTP validators, content hash and serialized
+        page_data so a re-audit can fetch conditionally and reuse the analysis
+        of unchanged pages. Runs keep a findings snapshot and the
+        recommendations, for diffing and for skipping the LLM when nothing
+        changed.
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    site TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT NOT NULL,
+                    page_data TEXT NOT NULL,
+                    analyzed_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    site TEXT NOT NULL,
+                    snapshot TEXT NOT NULL,
+                    recommendations TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_site ON runs (site, id)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get_page(self, url):
+        """Stored validators, content hash and page_data for `url`, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        page = dict(row)
+        page['page_data'] = json.loads(page['page_data'])
+        return page
+
+    def put_page(self, url, page_data, content_hash, etag=None, last_modified=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, site, etag, last_modified, content_hash, page_data, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, site_key(url), etag, last_modified, content_hash, json.dumps(page_data),
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+    def last_run(self, site):
+        """Most recent run of `site` as a dict with a parsed snapshot, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM runs WHERE site = ? ORDER BY id DESC LIMIT 1", (site,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run['snapshot'] = json.loads(run['snapshot'])
+        return run
+
+    def save_run(self, site, snapshot):
+        """Record an audit run and return its id"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (site, snapshot, created_at) VALUES (?, ?, ?)",
+                (site, json.dumps(snapshot), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return cursor.lastrowid
+
+    def save_recommendations(self, run_id, recommendations):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE runs SET recommendations = ? WHERE id = ?", (recommendations, run_id))
+
+def findings_snapshot(pages_data, technical_findings, gsc_data=None, ga4_data=None):
+    """Comparable summary of an audit, stored per run"""
+    link_check = technical_findings.get('link_check') or {}
+    duplicates = technical_findings.get('duplicates') or {}
+    link_graph = technical_findings.get('link_graph') or {}
+    weight = technical_findings.get('page_weight') or {}
+    page_scores = technical_findings.get('page_scores') or {}
+    gsc_summary = gsc_data['summary'] if gsc_data and gsc_data.get('success') else {}
+    ga4_overall = (ga4_data.get('overall') or {}) if ga4_data and ga4_data.get('success') else {}
+
+    return {
+        'site': {
+            'has_robots_txt': technical_findings.get('has_robots_txt'),
+            'has_sitemap': technical_findings.get('has_sitemap'),
+            'broken_links': link_check.get('broken_count'),
+            'redirect_chains': link_check.get('redirect_chain_count'),
+            'orphan_pages': link_graph.get('orphan_count'),
+            'near_duplicates': duplicates.get('near_duplicate_count'),
+            'duplicate_titles': duplicates.get('duplicate_title_count'),
+            'thin_pages': duplicates.get('thin_page_count'),
+            'avg_page_kb': weight.get('avg_page_kb'),
+            'median_page_score': (page_scores.get('percentiles') or {}).get('p50'),
+            'gsc_clicks': gsc_summary.get('total_clicks'),
+            'gsc_impressions': gsc_summary.get('total_impressions'),
+            'ga4_sessions': ga4_overall.get('sessions')
+        },
+        'pages': {
+            page['url']: dict(
+                {field: page.get(field) for field in PAGE_FIELDS},
+                load_time=page['load_time'],
+                page_weight_kb=page.get('page_weight_kb'),
+                content_hash=page.get('content_hash')
+            )
+            for page in pages_data
+        }
+    }
+
+def _changed(field, before, after):
+    if field in NOISY_FIELDS and isinstance(before, (int, float)) and isinstance(after, (int, float)):
+        return abs(after - before) > max(NOISY_FIELDS[field], NOISE_RATIO * max(abs(before), abs(after)))
+    return before != after
+
+def diff_findings(previous, current, sample_size=25):
+    """
+    What changed between two findings snapshots
+
+    Returns:
+        dict with has_changes, site_changes and page_changes ({field, before,
+        after} entries), added_pages, removed_pages and changed_page_count
+    """
+    site_changes = [
+        {'field': field, 'before': previous['site'].get(field), 'after': after}
+        for field, after in current['site'].items()
+        if _changed(field, previous['site'].get(field), after)
+    ]
+
+    previous_pages = previous['pages']
+    current_pages = current['pages']
+    added = [url for url in current_pages if url not in previous_pages]
+    removed = [url for url in previous_pages if url not in current_pages]
+
+    page_changes = []
+    changed_pages = 0
+    for url, page in current_pages.items():
+        before = previous_pages.get(url)
+        if before is None:
+            continue
+        fields = [
+            {'field': field, 'before': before.get(field), 'after': value}
+            for field, value in page.items()
+            if field != 'content_hash' and _changed(field, before.get(field), value)
+        ]
+        content_changed = page.get('content_hash') != before.get('content_hash')
+        if fields or content_changed:
+            changed_pages += 1
+            page_changes.append({'url': url, 'content_changed': content_changed, 'fields': fields})
+
+    return {
+        'has_changes': bool(site_changes or added or removed or changed_pages),
+        'site_changes': site_changes,
+        'page_changes': page_changes[:sample_size],
+        'changed_page_count': changed_pages,
+        'added_pages': added[:sample_size],
+        'added_count': len(added),
+        'removed_pages': removed[:sample_size],
+        'removed_count': len(removed)
+    }
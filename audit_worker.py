@@ -0,0 +1,312 @@
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from site_crawler import normalize_url
+
+logger = logging.getLogger(__name__)
+
+def audit_cache_key(url, gsc_property=None, ga4_property_id=None, bucket_seconds=86400):
+    """
+    Memoization key of an audit: the same site and properties within one time
+    bucket (a day by default) share results
+    """
+    bucket = int(time.time() // bucket_seconds)
+    key = json.dumps([normalize_url(url) or url, gsc_property or None, ga4_property_id or None, bucket])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class AuditJobQueue:
+    def __init__(self, db_path="audit_jobs.db", lease_seconds=1800):
+        """
+        SQLite work queue of audit jobs shared by the app and worker processes
+
+        Args:
+            db_path: SQLite database file
+            lease_seconds: how long a job may stay 'running' without progress
+                before it is considered abandoned (its worker died) and requeued;
+                abandoned inline audits fail instead, since nobody waits on a rerun
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    message TEXT,
+                    percent INTEGER NOT NULL DEFAULT 0,
+                    worker_id TEXT,
+                    result TEXT,
+                    error TEXT,
+                    cache_key TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'cache_key' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    heartbeat_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key, id)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, params, cache_key=None, worker_id=None):
+        """
+        Queue an audit; `params` are run_full_audit keyword arguments
+
+        With `worker_id` the job is recorded as already running there (an
+        audit run inline by the app), so duplicate submissions can wait on it.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (params, status, worker_id, cache_key, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (json.dumps(params), 'running' if worker_id else 'queued', worker_id, cache_key,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"), time.time())
+            )
+            return cursor.lastrowid
+
+    def find_reusable(self, cache_key, ttl, stale_seconds=300):
+        """
+        Latest job with `cache_key` that finished successfully within `ttl`
+        seconds or is still in progress (queued, or running with progress in
+        the last `stale_seconds`), or None
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE cache_key = ? AND ("
+                "(status = 'done' AND updated_at > ?) OR status = 'queued' OR "
+                "(status = 'running' AND updated_at > ?)) ORDER BY id DESC LIMIT 1",
+                (cache_key, now - ttl, now - stale_seconds)
+            ).fetchone()
+        return self.get(row['id']) if row else None
+
+    def claim(self, worker_id):
+        """Atomically take the oldest queued job, or None"""
+        conn = self._connect()
+        try:
+            # Write lock up front so two workers can't claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            expired = time.time() - self.lease_seconds
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'The audit was interrupted.' "
+                "WHERE status = 'running' AND updated_at < ? AND worker_id LIKE 'inline-%'",
+                (expired,)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker_id = NULL WHERE status = 'running' AND updated_at < ?",
+                (expired,)
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker_id = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, time.time(), row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def update_progress(self, job_id, message, percent=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET message = ?, percent = COALESCE(?, percent), updated_at = ? WHERE id = ?",
+                (message, percent, time.time(), job_id)
+            )
+
+    def complete(self, job_id, result):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', percent = 100, result = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        """Job status, progress and (once done) parsed result"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def heartbeat(self, worker_id):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, heartbeat_at) VALUES (?, ?)", (worker_id, time.time())
+            )
+
+    def remove_worker(self, worker_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self, max_age=30):
+        """Number of workers that sent a heartbeat within `max_age` seconds"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat_at > ?", (time.time() - max_age,)
+            ).fetchone()[0]
+
+    def wait(self, job_id, on_progress=None, poll_interval=0.5, timeout=None):
+        """
+        Poll until the job finishes
+
+        Args:
+            on_progress: optional callback(message, percent) on progress changes
+
+        Returns:
+            the finished job (status 'done' or 'failed'), or None on timeout
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        last = None
+        while deadline is None or time.monotonic() < deadline:
+            job = self.get(job_id)
+            if on_progress and job['message'] and (job['message'], job['percent']) != last:
+                last = (job['message'], job['percent'])
+                on_progress(job['message'], job['percent'])
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(poll_interval)
+        return None
+
+def job_progress(queue, job_id, on_progress=None, min_interval=0.5):
+    """
+    Progress callback that records a job's progress in the queue
+
+    Messages are written at most every `min_interval` seconds; percent
+    changes are always written. `on_progress` also receives every update.
+    """
+    last_write = [0.0]
+
+    def progress(message, percent=None):
+        if on_progress:
+            on_progress(message, percent)
+        now = time.monotonic()
+        if percent is not None or now - last_write[0] > min_interval:
+            last_write[0] = now
+            queue.update_progress(job_id, message, percent)
+
+    return progress
+
+def worker_loop(db_path, worker_id, max_jobs=50, poll_interval=1.0, heartbeat_interval=5.0):
+    """
+    Run audit jobs until `max_jobs` are done, then exit so the supervisor
+    replaces the process (bounds memory held by per-process caches)
+    """
+    # Imported in the child so thread pools and connections created at import
+    # time are never inherited through fork
+    from audit_engine import run_full_audit
+    from metrics import start_from_env as start_metrics
+    start_metrics()
+
+    queue = AuditJobQueue(db_path)
+    stop = threading.Event()
+
+    def beat():
+        while not stop.is_set():
+            try:
+                queue.heartbeat(worker_id)
+            except sqlite3.Error:
+                logger.exception("Heartbeat failed")
+            stop.wait(heartbeat_interval)
+
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    jobs_done = 0
+    try:
+        while jobs_done < max_jobs:
+            job = queue.claim(worker_id)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                bundle = run_full_audit(progress=job_progress(queue, job['id']), **job['params'])
+                if bundle is None:
+                    queue.fail(job['id'], "Could not fetch the website.")
+                else:
+                    queue.complete(job['id'], bundle)
+            except Exception as e:
+                logger.exception("Audit job %s failed", job['id'])
+                queue.fail(job['id'], str(e))
+            jobs_done += 1
+    finally:
+        stop.set()
+        queue.remove_worker(worker_id)
+
+def run_pool(db_path, workers, max_jobs_per_worker=50):
+    """Keep `workers` worker processes running, replacing any that exit"""
+    processes = {}
+    generation = 0
+    try:
+        while True:
+            for slot in range(workers):
+                process = processes.get(slot)
+                if process is None or not process.is_alive():
+                    generation += 1
+                    worker_id = f"{socket.gethostname()}-{os.getpid()}-{slot}-{generation}"
+                    process = multiprocessing.Process(
+                        target=worker_loop, args=(db_path, worker_id, max_jobs_per_worker),
+                        name=f"audit-worker-{slot}", daemon=True
+                    )
+                    process.start()
+                    processes[slot] = process
+            time.sleep(2)
+    except KeyboardInterrupt:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(5)
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit worker pool")
+    parser.add_argument('--db', default=os.getenv('AUDIT_JOBS_DB_PATH', 'audit_jobs.db'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('AUDIT_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--max-jobs-per-worker', type=int, default=50)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    AuditJobQueue(args.db)
+    logger.info("Starting %d audit workers on %s", args.workers, args.db)
+    run_pool(args.db, args.workers, args.max_jobs_per_worker)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+import argparse
+import ast
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Pages per benchmark site
+SIZES = {'small': 10, 'medium': 100, 'huge': 1000}
+# Heavy packages app.py must leave to first use; each costs 0.1-1.5s on a
+# cold start
+LAZY_MODULES = ('anthropic', 'xhtml2pdf', 'reportlab', 'googleapiclient', 'google.analytics', 'gspread', 'bs4')
+
+WORDS = ("seo audit search page content site link speed mobile schema title meta description keyword "
+         "traffic organic ranking crawl index sitemap robots canonical image alt heading structure "
+         "performance conversion service product customer local business guide blog article").split()
+
+
+class FixtureSite:
+    def __init__(self, pages, seed=0):
+        """
+        Deterministic synthetic website served from a local HTTP server
+
+        Pages look like a typical small-business site: shared navigation and
+        footer, an article body, JSON-LD, shared CSS/JS and per-page images,
+        links to other pages, to a missing page and to "external" pages (the
+        same server under its other host name, so nothing leaves the machine).
+        """
+        self.pages = pages
+        self.seed = seed
+        self.server = None
+        self.base_url = None
+
+    def page_html(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        base = self.base_url
+        nav = ''.join(f'<a href="{base}/page/{i}">Section {i}</a>' for i in range(min(self.pages, 12)))
+        related = ''.join(
+            f'<a href="/page/{rng.randrange(self.pages)}">Related article</a>' for _ in range(5)
+        )
+        external = f'<a href="{self.external_url}/page/{rng.randrange(self.pages)}">Partner</a>'
+        paragraphs = ''.join(
+            '<p>' + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + '</p>'
+            for _ in range(rng.randint(4, 12))
+        )
+        images = ''.join(
+            f'<img src="/img/{index}-{i}.jpg"' + (' alt="Photo">' if rng.random() > 0.3 else '>')
+            for i in range(rng.randint(1, 4))
+        )
+        title = f"Page {index} | {' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))).title()}"
+        description = '' if index % 7 == 3 else (
+            f'<meta name="description" content="{" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))}">'
+        )
+        h1s = '<h1>Welcome</h1>' * (2 if index % 9 == 4 else 1)
+        return f"""<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">
+<title>{title}</title>{description}
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta property="og:title" content="{title}"><link rel="canonical" href="{base}/page/{index}">
+<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script>
+<script type="application/ld+json">{{"@context": "https://schema.org", "@type": "Article", "headline": "{title}"}}</script>
+</head><body><header><nav>{nav}</nav></header><main>{h1s}<h2>Overview</h2>{paragraphs}{images}
+<h2>Related</h2>{related}{external}<a href="/missing-{index}">Old link</a></main>
+<footer><a href="/privacy">Privacy</a> Copyright Example Ltd</footer></body></html>"""
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, include_body):
+                path = self.path.split('?')[0]
+                content_type = 'text/html; charset=utf-8'
+                if path == '/robots.txt':
+                    body = f"User-agent: *\nDisallow: /admin\nSitemap: {site.base_url}/sitemap.xml\n".encode()
+                    content_type = 'text/plain'
+                elif path == '/sitemap.xml':
+                    locs = ''.join(f'<url><loc>{site.base_url}/page/{i}</loc></url>' for i in range(site.pages))
+                    body = f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'.encode()
+                    content_type = 'application/xml'
+                elif path == '/':
+                    body = site.page_html(0).encode()
+                elif path.startswith('/page/') and path[6:].isdigit() and int(path[6:]) < site.pages:
+                    body = site.page_html(int(path[6:])).encode()
+                elif path == '/privacy':
+                    body = b'<html><head><title>Privacy</title></head><body><p>Privacy policy</p></body></html>'
+                elif path.startswith('/static/'):
+                    body = b'/* asset */' + b'x' * 40000
+                    content_type = 'text/css' if path.endswith('.css') else 'application/javascript'
+                elif path.startswith('/img/'):
+                    body = b'\xff\xd8\xff\xe0' + b'\x00' * 60000
+                    content_type = 'image/jpeg'
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'max-age=600')
+                self.end_headers()
+                if include_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        port = self.server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.external_url = f"http://localhost:{port}"
+        threading.Thread(target=self.server.serve_forever, name="fixture-site", daemon=True).start()
+        return self.base_url + "/"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeLLMClient:
+    """Stands in for anthropic.Anthropic: returns canned recommendations"""
+
+    class _Messages:
+        def create(self, model, max_tokens, messages):
+            text = "## HIGH PRIORITY\n" + "\n".join(f"- Recommendation {i}" for i in range(20))
+            return type('Message', (), {
+                'content': [type('Block', (), {'text': text})()],
+                'usage': type('Usage', (), {'input_tokens': len(messages[0]['content']) // 4, 'output_tokens': 400})()
+            })()
+
+    def __init__(self):
+        self.messages = self._Messages()
+
+
+class FakeGSCFetcher:
+    """Stands in for GSCFetcher with Search Console data of the same shape"""
+
+    def get_search_analytics(self, site_url, days=28, compare=True):
+        from gsc_fetcher import summarize_rows
+        from trends import compare_totals, row_movement
+
+        rng = random.Random(1)
+
+        def rows(keys):
+            return sorted(({'keys': [key], 'clicks': rng.randint(0, 500), 'impressions': rng.randint(500, 20000),
+                            'ctr': rng.random() / 10, 'position': rng.uniform(1, 40)} for key in keys),
+                          key=lambda row: -row['clicks'])
+
+        query_keys = list(dict.fromkeys(f"{rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(60)))
+        queries = rows(query_keys[:50])
+        pages = rows(f"{site_url.rstrip('/')}/page/{i}" for i in range(50))
+        summary = dict(summarize_rows(queries), date_range="2024-01-01 to 2024-01-29")
+        result = {'success': True, 'queries': queries[:25], 'pages': pages[:25], 'summary': summary}
+        if compare:
+            previous_queries = rows(query_keys[10:])
+            result['comparison'] = {
+                'date_range': "2023-12-03 to 2023-12-31",
+                'changes': compare_totals(summary, summarize_rows(previous_queries),
+                                          ['total_clicks', 'total_impressions', 'avg_ctr', 'avg_position']),
+                'queries': row_movement(queries, previous_queries),
+                'pages': row_movement(pages, rows(page['keys'][0] for page in pages))
+            }
+        return result
+
+
+class FakeGA4Fetcher:
+    """Stands in for GA4Fetcher with Analytics data of the same shape"""
+
+    def get_analytics_data(self, property_id, days=28, compare=True):
+        from trends import compare_totals
+
+        rng = random.Random(2)
+        overall = {'sessions': 12000, 'users': 9000, 'pageviews': 30000, 'bounce_rate': 48.5,
+                   'avg_session_duration': 95.2}
+        result = {
+            'success': True,
+            'overall': overall,
+            'top_pages': [{'page': f"/page/{i}", 'pageviews': rng.randint(10, 3000), 'sessions': rng.randint(10, 2000)}
+                          for i in range(10)],
+            'traffic_sources': [{'source': source, 'sessions': rng.randint(100, 5000)}
+                                for source in ('google', '(direct)', 'bing', 'facebook', 'newsletter')],
+            'date_range': "2024-01-01 to 2024-01-29"
+        }
+        if compare:
+            for entry in result['top_pages']:
+                entry['previous_pageviews'] = rng.randint(10, 3000)
+                entry['previous_sessions'] = rng.randint(10, 2000)
+            for entry in result['traffic_sources']:
+                entry['previous_sessions'] = rng.randint(100, 5000)
+            previous = {'sessions': 11000, 'users': 8500, 'pageviews': 27000, 'bounce_rate': 50.1,
+                        'avg_session_duration': 90.4}
+            result['comparison'] = {'date_range': "2023-12-03 to 2023-12-31", 'overall': previous,
+                                    'changes': compare_totals(overall, previous, list(overall))}
+        return result
+
+def _summarize(samples):
+    return {
+        'n': len(samples),
+        'median_s': round(statistics.median(samples), 6),
+        'min_s': round(min(samples), 6),
+        'max_s': round(max(samples), 6)
+    }
+
+def run_size(size, pages, repeat, work_dir):
+    """Time each pipeline stage on a fresh site of `pages` pages; returns {name: summary}"""
+    import audit_engine
+    import ga4_fetcher
+    import gsc_fetcher
+    import seo_rules
+    from audit_store import AuditStore
+    from pdf_generator import PDFGenerator
+
+    audit_engine._llm_client = FakeLLMClient()
+    gsc_fetcher.GSCFetcher = FakeGSCFetcher
+    ga4_fetcher.GA4Fetcher = FakeGA4Fetcher
+    results = {}
+    run = [0]
+
+    def fresh_site():
+        # New port and empty store each time, so every HTTP cache and the
+        # incremental re-audit store start cold
+        run[0] += 1
+        audit_engine._audit_store = AuditStore(os.path.join(work_dir, f"{size}-{run[0]}.db"))
+        site = FixtureSite(pages)
+        return site, site.start()
+
+    # Single pages, cold
+    site, url = fresh_site()
+    samples = []
+    for index in range(min(pages, 20)):
+        page_url = url if index == 0 else f"{site.base_url}/page/{index}"
+        start = time.perf_counter()
+        audit_engine.analyze_single_page(page_url)
+        samples.append(time.perf_counter() - start)
+    site.stop()
+    results['analyze_single_page'] = _summarize(samples)
+
+    # Whole crawl and analysis
+    samples = []
+    for _ in range(repeat):
+        site, url = fresh_site()
+        start = time.perf_counter()
+        audit = audit_engine.comprehensive_audit(url, 'sc-domain:example.com', 'properties/1', max_pages=pages)
+        samples.append(time.perf_counter() - start)
+        site.stop()
+    results['comprehensive_audit'] = _summarize(samples)
+    all_pages_data, technical_findings, has_blog, gsc_data, ga4_data = audit
+
+    def time_repeated(func):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return _summarize(samples)
+
+    results['build_recommendations_prompt'] = time_repeated(
+        lambda: audit_engine.build_recommendations_prompt(all_pages_data, technical_findings, has_blog, gsc_data, ga4_data)
+    )
+    generator = PDFGenerator()
+    results['calculate_seo_score'] = time_repeated(
+        lambda: generator._calculate_seo_score(all_pages_data, technical_findings, gsc_data, ga4_data)
+    )
+    results['check_pages'] = time_repeated(lambda: seo_rules.check_pages(all_pages_data))
+    results['summarize_page_scores'] = time_repeated(lambda: seo_rules.summarize_page_scores(all_pages_data))
+    client_data = {'name': "Benchmark", 'email': "bench@example.com", 'company': "Example Ltd",
+                   'website': f"benchmark-{size}"}
+    recommendations = audit_engine.generate_ai_recommendations(
+        all_pages_data, technical_findings, has_blog, gsc_data, ga4_data
+    )
+    results['generate_audit_pdf'] = time_repeated(
+        lambda: os.remove(generator.generate_audit_pdf(
+            client_data, all_pages_data, technical_findings, has_blog, gsc_data, ga4_data, recommendations
+        ))
+    )
+    return results
+
+def _top_level_imports(importtime_output):
+    """{module: cumulative microseconds} of the outermost imports in -X importtime output"""
+    modules = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented by two spaces per level
+        if not name[1:].startswith(' '):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def measure_startup_imports(repeat, script='app.py'):
+    """
+    Import cost of `script`'s top-level imports (what every cold start of the
+    Streamlit app pays), from fresh interpreters under -X importtime
+
+    Returns:
+        (summary of total seconds, heaviest modules, LAZY_MODULES that were loaded)
+    """
+    with open(os.path.join(PROJECT_DIR, script)) as f:
+        source = f.read()
+    statements = [
+        ast.get_source_segment(source, node) for node in ast.parse(source).body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+
+    def run(code):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PROJECT_DIR,
+                                   capture_output=True, text=True, check=True)
+        return completed.stderr
+
+    # Interpreter startup imports are not the script's
+    startup = set(_top_level_imports(run('pass')))
+    samples = []
+    for _ in range(repeat):
+        output = run("\n".join(statements))
+        modules = {name: us for name, us in _top_level_imports(output).items() if name not in startup}
+        samples.append(sum(modules.values()) / 1e6)
+
+    loaded = {line.split('|')[2].strip() for line in output.splitlines() if line.count('|') == 2}
+    lazy_loaded = [
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(module + '.') for name in loaded)
+    ]
+    heaviest = sorted(modules.items(), key=lambda item: -item[1])[:8]
+    return _summarize(samples), heaviest, lazy_loaded
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(results, history, baseline_runs=5, threshold=0.2, min_delta=0.005):
+    """
+    Compare median timings with the median of the last `baseline_runs`
+    recorded runs of each benchmark
+
+    A benchmark regressed when it is more than `threshold` slower than its
+    baseline and by more than `min_delta` seconds (ignores jitter on
+    microsecond-scale stages).
+
+    Returns:
+        list of dicts with name, median_s, baseline_s, change and regressed
+    """
+    rows = []
+    for name, summary in results.items():
+        previous = [run['results'][name]['median_s'] for run in history if name in run['results']][-baseline_runs:]
+        baseline = statistics.median(previous) if previous else None
+        change = (summary['median_s'] - baseline) / baseline if baseline else None
+        rows.append({
+            'name': name,
+            'median_s': summary['median_s'],
+            'baseline_s': baseline,
+            'change': change,
+            'regressed': bool(change is not None and change > threshold
+                              and summary['median_s'] - baseline > min_delta)
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the audit pipeline against a local fixture site")
+    parser.add_argument('--sizes', default='small,medium', help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument('--repeat', type=int, default=3, help="samples per benchmark")
+    parser.add_argument('--history', default=os.getenv('BENCHMARK_HISTORY', 'benchmarks.jsonl'))
+    parser.add_argument('--baseline-runs', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument('--no-save', action='store_true', help="compare without recording this run")
+    parser.add_argument('--skip-startup', action='store_true', help="don't measure app.py's import time")
+    args = parser.parse_args()
+
+    # Before importing the pipeline: no politeness delay, one timing run per
+    # page (the fixture server is local) and no trace files
+    os.environ['CRAWL_DELAY'] = '0'
+    os.environ.setdefault('PAGE_TIMING_RUNS', '1')
+    os.environ['TRACE_EXPORTERS'] = 'none'
+    # The fixture site is local: don't let per-host rate limits set the pace
+    os.environ.setdefault('RATE_LIMITS', 'host=10000/s:10000,web=10000/s:10000')
+
+    results = {}
+    lazy_loaded = []
+    if not args.skip_startup:
+        print("Measuring app start-up imports...", flush=True)
+        results['startup/app_imports'], heaviest, lazy_loaded = measure_startup_imports(args.repeat)
+        print("  heaviest: " + ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in heaviest))
+
+    work_dir = tempfile.mkdtemp(prefix='seo-bench-')
+    try:
+        for size in filter(None, (size.strip() for size in args.sizes.split(','))):
+            print(f"Benchmarking {size} site ({SIZES[size]} pages)...", flush=True)
+            for name, summary in run_size(size, SIZES[size], args.repeat, work_dir).items():
+                results[f"{size}/{name}"] = summary
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history = load_history(args.history)
+    rows = compare(results, history, args.baseline_runs, args.threshold)
+    print(f"\n{'benchmark':<42}{'median':>11}{'baseline':>11}{'change':>9}")
+    for row in rows:
+        baseline = f"{row['baseline_s']:.4f}s" if row['baseline_s'] is not None else '-'
+        change = f"{row['change']:+.0%}" if row['change'] is not None else '-'
+        flag = '  REGRESSION' if row['regressed'] else ''
+        print(f"{row['name']:<42}{row['median_s']:>10.4f}s{baseline:>11}{change:>9}{flag}")
+
+    if not args.no_save:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'repeat': args.repeat,
+                'results': results
+            }) + "\n")
+
+    regressions = [row['name'] for row in rows if row['regressed']]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+    if lazy_loaded:
+        print(f"\napp.py imports modules meant to load on first use: {', '.join(lazy_loaded)}")
+    if regressions or lazy_loaded:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import hashlib
+import re
+
+import numpy as np
+
+# Elements whose text is boilerplate or not visible
+NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer', 'aside', 'form']
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def extract_body_text(soup):
+    """
+    Visible main-content text of a page
+
+    Removes non-content elements from `soup` in place, so call it after every
+    other extraction step.
+    """
+    for tag in soup.find_all(NON_CONTENT_TAGS):
+        tag.decompose()
+    body = soup.body or soup
+    return body.get_text(" ", strip=True)
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash over word shingles"""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return 0
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    # One row of 64 bits per shingle; a bit is set in the fingerprint if most shingles set it
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int(np.packbits(votes > 0, bitorder='little').view(np.uint64)[0])
+
+def content_signature(soup):
+    """Word count and SimHash of a page's main content"""
+    text = extract_body_text(soup)
+    return {
+        'word_count': len(WORD_PATTERN.findall(text)),
+        'simhash': simhash(text)
+    }
+
+
+class SimHashIndex:
+    def __init__(self, max_distance=3, bands=4):
+        """
+        Banded SimHash index for near-duplicate lookup
+
+        With `bands` > `max_distance`, any two fingerprints within
+        `max_distance` bits agree exactly on at least one band (pigeonhole),
+        so only items sharing a band bucket are compared.
+        """
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self.mask = (1 << self.band_bits) - 1
+        self.buckets = [{} for _ in range(bands)]
+        self.fingerprints = []
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> (band * self.band_bits)) & self.mask for band in range(self.bands)]
+
+    def add(self, fingerprint):
+        """Index a fingerprint; returns ids of earlier items within max_distance"""
+        item_id = len(self.fingerprints)
+        candidates = set()
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            bucket = self.buckets[band].setdefault(key, [])
+            candidates.update(bucket)
+            bucket.append(item_id)
+        self.fingerprints.append(fingerprint)
+        return [other for other in candidates
+                if bin(fingerprint ^ self.fingerprints[other]).count('1') <= self.max_distance]
+
+def _group_by(pages_data, key):
+    groups = {}
+    for page in pages_data:
+        value = key(page)
+        if value:
+            groups.setdefault(value, []).append(page['url'])
+    return [urls for urls in groups.values() if len(urls) > 1]
+
+def find_duplicates(pages_data, max_distance=3, thin_word_count=250, sample_size=20):
+    """
+    Near-duplicate content, duplicate titles/metas and thin pages across a crawl
+
+    Returns:
+        dict with near_duplicate_groups, duplicate_title_groups,
+        duplicate_meta_groups (lists of URL groups, sampled), their counts,
+        and thin_pages
+    """
+    index = SimHashIndex(max_distance=max_distance)
+    parent = list(range(len(pages_data)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    indexed = []
+    for position, page in enumerate(pages_data):
+        # Pages without real content would all collide
+        if not page.get('simhash') or page.get('word_count', 0) < 20:
+            continue
+        for other in index.add(page['simhash']):
+            parent[find(indexed[other])] = find(position)
+        indexed.append(position)
+
+    clusters = {}
+    for position in indexed:
+        clusters.setdefault(find(position), []).append(pages_data[position]['url'])
+    near_duplicates = sorted((urls for urls in clusters.values() if len(urls) > 1), key=len, reverse=True)
+
+    duplicate_titles = _group_by(
+        pages_data,
+        lambda page: page['title'].strip().lower() if page['title'] != "No title found" else None
+    )
+    duplicate_metas = _group_by(
+        pages_data,
+        lambda page: page['meta_description'].strip().lower() if page['meta_description'] != "No meta description" else None
+    )
+    thin_pages = [page['url'] for page in pages_data if page.get('word_count') is not None and page['word_count'] < thin_word_count]
+
+    return {
+        'near_duplicate_count': sum(len(urls) for urls in near_duplicates),
+        'near_duplicate_groups': near_duplicates[:sample_size],
+        'duplicate_title_count': sum(len(urls) for urls in duplicate_titles),
+        'duplicate_title_groups': duplicate_titles[:sample_size],
+        'duplicate_meta_count': sum(len(urls) for urls in duplicate_metas),
+        'duplicate_meta_groups': duplicate_metas[:sample_size],
+        'thin_page_count': len(thin_pages),
+        'thin_pages': thin_pages[:sample_size],
+        'thin_word_count': thin_word_count
+    }
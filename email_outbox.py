@@ -0,0 +1,224 @@
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class EmailOutbox:
+    def __init__(self, db_path="email_outbox.db", lease_seconds=300):
+        """
+        Persistent SQLite outbox for outgoing email
+
+        Args:
+            db_path: SQLite database file
+            lease_seconds: how long a claimed message may stay in 'sending' before
+                it is considered abandoned (e.g. the process died) and retried
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient_email TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    pdf_attachment TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    sent_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, recipient_email, subject, body, pdf_attachment=None):
+        """Store a message for delivery and return its id"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (recipient_email, subject, body, pdf_attachment, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (recipient_email, subject, body, pdf_attachment, time.time(),
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return cursor.lastrowid
+
+    def claim_due(self, limit=10):
+        """Atomically claim up to `limit` messages that are due for (re)delivery"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            # Reclaim messages whose sender died mid-delivery
+            conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND next_attempt_at < ?",
+                (now - self.lease_seconds,)
+            )
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                    [(now, row['id']) for row in rows]
+                )
+            return [dict(row) for row in rows]
+
+    def mark_sent(self, message_id):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL, sent_at = ? WHERE id = ?",
+                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), message_id)
+            )
+
+    def mark_failed(self, message_id, error, retry_at=None):
+        """Record a failed attempt; without `retry_at` the message goes to the dead-letter list"""
+        status = 'pending' if retry_at is not None else 'dead'
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (status, str(error)[:1000], retry_at if retry_at is not None else time.time(), message_id)
+            )
+
+    def dead_letters(self, limit=100):
+        """Messages that exhausted their retries"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = 'dead' ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def requeue_dead(self, message_id=None):
+        """Move one (or every) dead letter back to pending"""
+        with self._lock, self._connect() as conn:
+            if message_id is None:
+                conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'",
+                    (time.time(),)
+                )
+            else:
+                conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE id = ? AND status = 'dead'",
+                    (time.time(), message_id)
+                )
+
+    def stats(self):
+        """Message counts per status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+            return {row[0]: row[1] for row in rows}
+
+
+class OutboxWorker:
+    def __init__(self, outbox, deliver, max_per_minute=30, max_attempts=6,
+                 base_delay=30, max_delay=3600, poll_interval=2):
+        """
+        Background thread that drains an EmailOutbox
+
+        Args:
+            outbox: EmailOutbox instance
+            deliver: callable(message_dict) that sends one message and raises on failure
+            max_per_minute: provider send rate limit
+            max_attempts: attempts before a message is dead-lettered
+            base_delay: first retry delay in seconds, doubled on every attempt
+            max_delay: cap for the retry delay in seconds
+            poll_interval: seconds between polls when the outbox is empty
+        """
+        self.outbox = outbox
+        self.deliver = deliver
+        self.min_interval = 60.0 / max_per_minute if max_per_minute else 0
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._next_send_at = 0.0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def drain(self, timeout=120):
+        """
+        Stop the background thread and deliver every due message from the
+        calling thread, for processes about to exit (the worker is a daemon
+        thread and dies with the interpreter)
+
+        Stops after `timeout` seconds; messages waiting for a later retry stay
+        in the outbox for the next worker. Returns the number processed.
+        """
+        deadline = time.monotonic() + timeout
+        self.stop(timeout)
+        self._stop.clear()
+        processed = 0
+        try:
+            while time.monotonic() < deadline:
+                count = self.process_once()
+                if not count:
+                    break
+                processed += count
+        finally:
+            self._stop.set()
+        return processed
+
+    def notify(self):
+        """Wake the worker after a new message was enqueued"""
+        self._wake.set()
+
+    def retry_delay(self, attempts):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempts)))
+
+    def _throttle(self):
+        wait = self._next_send_at - time.monotonic()
+        if wait > 0:
+            self._stop.wait(wait)
+        self._next_send_at = time.monotonic() + self.min_interval
+
+    def process_once(self, limit=10):
+        """Deliver every due message once; returns the number processed"""
+        messages = self.outbox.claim_due(limit)
+        for message in messages:
+            if self._stop.is_set():
+                break
+            self._throttle()
+            try:
+                self.deliver(message)
+                self.outbox.mark_sent(message['id'])
+            except Exception as e:
+                attempts = message['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    self.outbox.mark_failed(message['id'], e)
+                else:
+                    self.outbox.mark_failed(message['id'], e, time.time() + self.retry_delay(attempts))
+        return len(messages)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_once()
+            except Exception:
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
@@ -1,9 +1,19 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import os
+import threading
+
+from smtp_pool import get_smtp_pool
+from email_outbox import EmailOutbox, OutboxWorker
+from rate_limiter import rate_limiter
+from tracing import span
+
+_workers = {}
+_workers_lock = threading.Lock()
+
 
 class EmailSender:
     def __init__(self):
@@ -13,6 +23,31 @@ class EmailSender:
         self.sender_email = st.secrets["email"]["sender_email"]
         self.sender_password = st.secrets["email"]["sender_password"]
         self.sender_name = st.secrets["email"]["sender_name"]
+        self.pool = get_smtp_pool(
+            self.smtp_server,
+            self.smtp_port,
+            self.sender_email,
+            self.sender_password,
+            max_size=int(st.secrets["email"].get("pool_size", 4))
+        )
+        self.outbox_worker = self._get_outbox_worker()
+        self.outbox = self.outbox_worker.outbox
+    
+    def _get_outbox_worker(self):
+        """Return the process-wide outbox worker, starting it on first use"""
+        config = st.secrets["email"]
+        db_path = config.get("outbox_path", "email_outbox.db")
+        with _workers_lock:
+            worker = _workers.get(db_path)
+            if worker is None:
+                worker = OutboxWorker(
+                    EmailOutbox(db_path),
+                    self._deliver,
+                    max_per_minute=int(config.get("max_per_minute", 30)),
+                    max_attempts=int(config.get("max_attempts", 6))
+                )
+                _workers[db_path] = worker
+            return worker.start()
     
     def send_onboarding_email(self, recipient_email, recipient_name, website_url, service_account_email):
         """Send onboarding instructions to new users"""
@@ -126,36 +161,83 @@ SEO & Digital Marketing Consultant
         
         return self._send_email(recipient_email, subject, body, pdf_attachment=pdf_path)
     
+    def _build_message(self, recipient_email, subject, body, pdf_attachment=None):
+        """Build a MIME message with optional PDF attachment"""
+        message = MIMEMultipart()
+        message["From"] = f"{self.sender_name} <{self.sender_email}>"
+        message["To"] = recipient_email
+        message["Subject"] = subject
+        
+        # Add body
+        message.attach(MIMEText(body, "plain"))
+        
+        # Add PDF attachment if provided
+        if pdf_attachment and os.path.exists(pdf_attachment):
+            with open(pdf_attachment, "rb") as pdf_file:
+                pdf_part = MIMEApplication(pdf_file.read(), _subtype="pdf")
+                pdf_part.add_header(
+                    "Content-Disposition",
+                    f"attachment; filename={os.path.basename(pdf_attachment)}"
+                )
+                message.attach(pdf_part)
+        
+        return message
+    
     def _send_email(self, recipient_email, subject, body, pdf_attachment=None):
-        """Internal method to send email via SMTP with optional PDF attachment"""
+        """Internal method to queue an email in the outbox for background delivery"""
         try:
-            # Create message
-            message = MIMEMultipart()
-            message["From"] = f"{self.sender_name} <{self.sender_email}>"
-            message["To"] = recipient_email
-            message["Subject"] = subject
-            
-            # Add body
-            message.attach(MIMEText(body, "plain"))
-            
-            # Add PDF attachment if provided
-            if pdf_attachment and os.path.exists(pdf_attachment):
-                with open(pdf_attachment, "rb") as pdf_file:
-                    pdf_part = MIMEApplication(pdf_file.read(), _subtype="pdf")
-                    pdf_part.add_header(
-                        "Content-Disposition",
-                        f"attachment; filename={os.path.basename(pdf_attachment)}"
-                    )
-                    message.attach(pdf_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(message)
-            
+            self.outbox.enqueue(recipient_email, subject, body, pdf_attachment)
+            self.outbox_worker.notify()
             return True
             
         except Exception as e:
-            st.error(f"Email sending failed: {e}")
+            st.error(f"Email queueing failed: {e}")
             return False
+    
+    def flush(self, timeout=120):
+        """Deliver queued email before the process exits; returns the number of messages processed"""
+        return self.outbox_worker.drain(timeout)
+    
+    def _deliver(self, message):
+        """Send one outbox message over a pooled SMTP session; raises on failure"""
+        mime_message = self._build_message(
+            message['recipient_email'],
+            message['subject'],
+            message['body'],
+            message.get('pdf_attachment')
+        )
+        rate_limiter.acquire('smtp')
+        with span('smtp.send', attachment=bool(message.get('pdf_attachment'))):
+            self.pool.send_message(mime_message)
+    
+    def send_bulk(self, emails):
+        """
+        Send many emails over the pooled SMTP sessions
+        
+        Args:
+            emails: list of dicts with recipient_email, subject, body and optional pdf_attachment
+        
+        Returns:
+            list of dicts with recipient_email, success and error (in input order)
+        """
+        def send_one(email):
+            try:
+                message = self._build_message(
+                    email['recipient_email'],
+                    email['subject'],
+                    email['body'],
+                    email.get('pdf_attachment')
+                )
+                rate_limiter.acquire('smtp')
+                with span('smtp.send', attachment=bool(email.get('pdf_attachment'))):
+                    self.pool.send_message(message)
+                return {'recipient_email': email['recipient_email'], 'success': True, 'error': None}
+            except Exception as e:
+                return {'recipient_email': email['recipient_email'], 'success': False, 'error': str(e)}
+        
+        if not emails:
+            return []
+        
+        # One worker per pooled session keeps every connection busy without over-subscribing
+        with ThreadPoolExecutor(max_workers=min(self.pool.max_size, len(emails))) as executor:
+            return list(executor.map(send_one, emails))
@@ -1,9 +1,31 @@
 from google.oauth2 import service_account
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import DateRange, Dimension, Metric, RunReportRequest
+from google.analytics.data_v1beta.types import (
+    DateRange, Dimension, Filter, FilterExpression, Metric, OrderBy, RunReportRequest
+)
 from datetime import datetime, timedelta
 import streamlit as st
 
+from resilience import CircuitOpenError, ga4_api
+from tracing import span
+from trends import compare_totals, comparison_windows, format_window
+
+def _rows_by_period(response):
+    """
+    (date range name, requested dimension values, row) for each row of a report
+
+    With several date ranges GA4 adds a 'dateRange' dimension holding the
+    range's name; with one range every row belongs to 'current'.
+    """
+    names = [header.name for header in response.dimension_headers]
+    index = names.index('dateRange') if 'dateRange' in names else None
+    rows = []
+    for row in response.rows:
+        values = [value.value for value in row.dimension_values]
+        period = values.pop(index) if index is not None else 'current'
+        rows.append((period, values, row))
+    return rows
+
 class GA4Fetcher:
     def __init__(self):
         """Initialize GA4 API client with service account"""
@@ -17,16 +39,69 @@ class GA4Fetcher:
             st.error(f"GA4 Authentication Error: {e}")
             self.client = None
     
-    def get_analytics_data(self, property_id, days=28):
+    def _top_with_previous(self, property_id, dimension, metric_names, date_ranges, report, limit=10):
+        """
+        Top `limit` values of `dimension` by the first metric in the current
+        date range, with their metrics in the previous range when one is given
+
+        Returns:
+            [(key, current metric values, previous metric values), ...];
+            previous values are zeros for keys with no data then, and empty
+            without a previous range
+        """
+        metrics = [Metric(name=name) for name in metric_names]
+        request = RunReportRequest(
+            property=property_id,
+            date_ranges=date_ranges[:1],
+            dimensions=[Dimension(name=dimension)],
+            metrics=metrics,
+            order_bys=[OrderBy(metric=OrderBy.MetricOrderBy(metric_name=metric_names[0]), desc=True)],
+            limit=limit
+        )
+        with span('ga4.run_report', report=report):
+            response = ga4_api.call(lambda: self.client.run_report(request), key=property_id)
+        current = {
+            row.dimension_values[0].value: tuple(int(value.value) for value in row.metric_values)
+            for row in response.rows
+        }
+        
+        previous = {}
+        if len(date_ranges) > 1 and current:
+            request_previous = RunReportRequest(
+                property=property_id,
+                date_ranges=date_ranges[1:],
+                dimensions=[Dimension(name=dimension)],
+                metrics=metrics,
+                dimension_filter=FilterExpression(filter=Filter(
+                    field_name=dimension,
+                    in_list_filter=Filter.InListFilter(values=list(current))
+                )),
+                limit=len(current)
+            )
+            with span('ga4.run_report', report=f'{report}_previous'):
+                response_previous = ga4_api.call(lambda: self.client.run_report(request_previous),
+                                                 key=property_id)
+            previous = {
+                row.dimension_values[0].value: tuple(int(value.value) for value in row.metric_values)
+                for row in response_previous.rows
+            }
+        
+        empty = (0,) * len(metric_names) if len(date_ranges) > 1 else ()
+        return [(key, values, previous.get(key, empty)) for key, values in current.items()]
+    
+    def get_analytics_data(self, property_id, days=28, compare=True):
         """
         Fetch analytics data from GA4
         
         Args:
             property_id: GA4 property ID (e.g., '123456789')
             days: Number of days of data to fetch
+            compare: also report the `days` before, for period-over-period changes
         
         Returns:
-            dict with traffic data, top pages, sources
+            dict with traffic data, top pages, sources and, when comparing,
+            comparison (previous period overall metrics and their changes;
+            pages and sources then carry previous_* values)
         """
         if not self.client:
             return None
@@ -36,17 +111,17 @@ class GA4Fetcher:
             if not property_id.startswith('properties/'):
                 property_id = f'properties/{property_id}'
             
-            # Date range
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=days)
+            # Date ranges: the overall report covers both periods in one request;
+            # both end yesterday, as today is still being collected
+            current, previous = comparison_windows(datetime.now().date() - timedelta(days=1), days)
+            date_ranges = [DateRange(start_date=str(current[0]), end_date=str(current[1]), name='current')]
+            if compare:
+                date_ranges.append(DateRange(start_date=str(previous[0]), end_date=str(previous[1]), name='previous'))
             
             # Get overall metrics
             request = RunReportRequest(
                 property=property_id,
-                date_ranges=[DateRange(
-                    start_date=str(start_date),
-                    end_date=str(end_date)
-                )],
+                date_ranges=date_ranges,
                 metrics=[
                     Metric(name="sessions"),
                     Metric(name="totalUsers"),
@@ -56,75 +131,68 @@ class GA4Fetcher:
                 ]
             )
             
-            response = self.client.run_report(request)
+            with span('ga4.run_report', report='overall'):
+                response = ga4_api.call(lambda: self.client.run_report(request), key=property_id)
             
             # Extract overall metrics
-            if response.rows:
-                row = response.rows[0]
-                overall = {
+            overall_by_period = {}
+            for period, _, row in _rows_by_period(response):
+                overall_by_period[period] = {
                     'sessions': int(row.metric_values[0].value),
                     'users': int(row.metric_values[1].value),
                     'pageviews': int(row.metric_values[2].value),
                     'bounce_rate': round(float(row.metric_values[3].value) * 100, 2),
                     'avg_session_duration': round(float(row.metric_values[4].value), 2)
                 }
-            else:
-                overall = None
-            
-            # Get top pages
-            request_pages = RunReportRequest(
-                property=property_id,
-                date_ranges=[DateRange(
-                    start_date=str(start_date),
-                    end_date=str(end_date)
-                )],
-                dimensions=[Dimension(name="pagePath")],
-                metrics=[
-                    Metric(name="screenPageViews"),
-                    Metric(name="sessions")
-                ],
-                limit=10
-            )
-            
-            response_pages = self.client.run_report(request_pages)
+            overall = overall_by_period.get('current')
             
+            # Get top pages and traffic sources: the current top 10, then the
+            # previous period's values for exactly those keys
             top_pages = []
-            for row in response_pages.rows:
-                top_pages.append({
-                    'page': row.dimension_values[0].value,
-                    'pageviews': int(row.metric_values[0].value),
-                    'sessions': int(row.metric_values[1].value)
-                })
-            
-            # Get traffic sources
-            request_sources = RunReportRequest(
-                property=property_id,
-                date_ranges=[DateRange(
-                    start_date=str(start_date),
-                    end_date=str(end_date)
-                )],
-                dimensions=[Dimension(name="sessionSource")],
-                metrics=[Metric(name="sessions")],
-                limit=10
-            )
-            
-            response_sources = self.client.run_report(request_sources)
+            for page, (pageviews, sessions), previous_values in self._top_with_previous(
+                property_id, 'pagePath', ['screenPageViews', 'sessions'], date_ranges, 'pages'
+            ):
+                entry = {'page': page, 'pageviews': pageviews, 'sessions': sessions}
+                if compare:
+                    entry['previous_pageviews'], entry['previous_sessions'] = previous_values
+                top_pages.append(entry)
             
             traffic_sources = []
-            for row in response_sources.rows:
-                traffic_sources.append({
-                    'source': row.dimension_values[0].value,
-                    'sessions': int(row.metric_values[0].value)
-                })
+            for source, (sessions,), previous_values in self._top_with_previous(
+                property_id, 'sessionSource', ['sessions'], date_ranges, 'sources'
+            ):
+                entry = {'source': source, 'sessions': sessions}
+                if compare:
+                    entry['previous_sessions'], = previous_values
+                traffic_sources.append(entry)
             
-            return {
+            result = {
                 'success': True,
                 'overall': overall,
                 'top_pages': top_pages,
                 'traffic_sources': traffic_sources,
-                'date_range': f"{start_date} to {end_date}"
+                'date_range': format_window(current)
             }
             
+            if compare:
+                previous_overall = overall_by_period.get('previous')
+                result['comparison'] = {
+                    'date_range': format_window(previous),
+                    'overall': previous_overall,
+                    'changes': compare_totals(
+                        overall or {}, previous_overall or {},
+                        ['sessions', 'users', 'pageviews', 'bounce_rate', 'avg_session_duration']
+                    )
+                }
+            
+            return result
+            
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Google Analytics is not responding right now. Please try again in a few minutes.'
+            }
         except Exception as e:
             return {
                 'success': False,
@@ -1,8 +1,78 @@
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import streamlit as st
 
+from resilience import CircuitOpenError, gsc_api
+from tracing import span
+from trends import compare_totals, comparison_windows, format_window, row_movement
+
+# Most rows the API returns per request; longer results are paged with startRow
+ROW_LIMIT = 25000
+# Final Search Console data trails by 2-3 days; windows end no earlier than this
+MAX_DATA_LAG_DAYS = 4
+
+def split_by_period(rows, window):
+    """
+    Rows of a ['date', dimension] query within `window`, combined per key
+
+    Returns Search Console-shaped rows ({'keys': [key], 'clicks',
+    'impressions', 'ctr', 'position'}) sorted by clicks; position is the
+    impression-weighted average of the daily positions.
+    """
+    start, end = str(window[0]), str(window[1])
+    combined = {}
+    for row in rows:
+        day, key = row['keys']
+        if not start <= day <= end:
+            continue
+        totals = combined.get(key)
+        if totals is None:
+            totals = combined[key] = [0, 0, 0.0]
+        impressions = row.get('impressions', 0)
+        totals[0] += row.get('clicks', 0)
+        totals[1] += impressions
+        totals[2] += row.get('position', 0) * impressions
+    result = [
+        {
+            'keys': [key],
+            'clicks': clicks,
+            'impressions': impressions,
+            'ctr': clicks / impressions if impressions else 0,
+            'position': weighted_position / impressions if impressions else 0
+        }
+        for key, (clicks, impressions, weighted_position) in combined.items()
+    ]
+    result.sort(key=lambda row: (-row['clicks'], -row['impressions']))
+    return result
+
+def last_data_date(rows, today):
+    """
+    Last day with data in ['date', ...] rows, so comparison windows don't
+    count the days Search Console has not reported yet; no earlier than
+    MAX_DATA_LAG_DAYS before `today` (a site may simply have had no
+    impressions since)
+    """
+    earliest = today - timedelta(days=MAX_DATA_LAG_DAYS)
+    days = [row['keys'][0] for row in rows]
+    if not days:
+        return earliest
+    return max(date.fromisoformat(max(days)), earliest)
+
+def summarize_rows(rows):
+    """Clicks, impressions, CTR and impression-weighted position over rows"""
+    total_clicks = sum(row['clicks'] for row in rows)
+    total_impressions = sum(row['impressions'] for row in rows)
+    avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
+    avg_position = (sum(row['position'] * row['impressions'] for row in rows) / total_impressions
+                    if total_impressions > 0 else 0)
+    return {
+        'total_clicks': total_clicks,
+        'total_impressions': total_impressions,
+        'avg_ctr': round(avg_ctr, 2),
+        'avg_position': round(avg_position, 1)
+    }
+
 class GSCFetcher:
     def __init__(self):
         """Initialize GSC API client with service account"""
@@ -16,70 +86,93 @@ class GSCFetcher:
             st.error(f"GSC Authentication Error: {e}")
             self.service = None
     
-    def get_search_analytics(self, site_url, days=28):
+    def _query_by_date(self, site_url, dimension, start_date, end_date):
+        """
+        Rows for `dimension` per day between the dates
+
+        Date-grouped rows come back oldest day first, so a result cut off at
+        the row limit would lose the most recent days; every page is fetched.
+        """
+        rows = []
+        while True:
+            request_body = {
+                'startDate': str(start_date),
+                'endDate': str(end_date),
+                'dimensions': ['date', dimension],
+                'rowLimit': ROW_LIMIT,
+                'startRow': len(rows)
+            }
+            with span('gsc.query', dimension=dimension, start_row=len(rows)) as s:
+                response = gsc_api.call(lambda: self.service.searchanalytics().query(
+                    siteUrl=site_url,
+                    body=request_body
+                ).execute(), key=site_url)
+                batch = response.get('rows', [])
+                s.set_attribute('rows', len(batch))
+            rows.extend(batch)
+            if len(batch) < ROW_LIMIT:
+                return rows
+    
+    def get_search_analytics(self, site_url, days=28, compare=True):
         """
         Fetch search analytics data from GSC
         
         Args:
             site_url: GSC property URL (e.g., 'https://example.com' or 'sc-domain:example.com')
             days: Number of days of data to fetch (default 28)
+            compare: also fetch the `days` before, for period-over-period changes
         
         Returns:
-            dict with queries, pages, and summary data
+            dict with queries, pages, summary data and, when comparing,
+            comparison (changes in the summary totals and query/page movement)
         """
         if not self.service:
             return None
         
         try:
-            # Date range
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=days)
+            # Date ranges: both periods come back in one request per dimension
+            # (split by the date dimension here) rather than one per period.
+            # The request covers windows ending anywhere up to MAX_DATA_LAG_DAYS
+            # ago; both windows then end at the last day with data.
+            today = datetime.now().date()
+            current, previous = comparison_windows(today - timedelta(days=MAX_DATA_LAG_DAYS), days)
+            start_date = previous[0] if compare else current[0]
             
-            # Request body
-            request_body = {
-                'startDate': str(start_date),
-                'endDate': str(end_date),
-                'dimensions': ['query'],
-                'rowLimit': 25,
-                'startRow': 0
-            }
+            query_rows = self._query_by_date(site_url, 'query', start_date, today)
+            page_rows = self._query_by_date(site_url, 'page', start_date, today)
+            current, previous = comparison_windows(last_data_date(query_rows, today), days)
             
-            # Fetch top queries
-            response = self.service.searchanalytics().query(
-                siteUrl=site_url,
-                body=request_body
-            ).execute()
+            all_queries = split_by_period(query_rows, current)
+            all_pages = split_by_period(page_rows, current)
+            summary = dict(summarize_rows(all_queries), date_range=format_window(current))
             
-            queries = response.get('rows', [])
-            
-            # Fetch top pages
-            request_body['dimensions'] = ['page']
-            response_pages = self.service.searchanalytics().query(
-                siteUrl=site_url,
-                body=request_body
-            ).execute()
+            result = {
+                'success': True,
+                'queries': all_queries[:25],
+                'pages': all_pages[:25],
+                'summary': summary
+            }
             
-            pages = response_pages.get('rows', [])
+            if compare:
+                previous_queries = split_by_period(query_rows, previous)
+                result['comparison'] = {
+                    'date_range': format_window(previous),
+                    'changes': compare_totals(
+                        summary, summarize_rows(previous_queries),
+                        ['total_clicks', 'total_impressions', 'avg_ctr', 'avg_position']
+                    ),
+                    'queries': row_movement(all_queries, previous_queries),
+                    'pages': row_movement(all_pages, split_by_period(page_rows, previous))
+                }
             
-            # Calculate totals
-            total_clicks = sum([q.get('clicks', 0) for q in queries])
-            total_impressions = sum([q.get('impressions', 0) for q in queries])
-            avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-            avg_position = sum([q.get('position', 0) for q in queries]) / len(queries) if queries else 0
+            return result
             
+        except CircuitOpenError as e:
             return {
-                'success': True,
-                'queries': queries,
-                'pages': pages,
-                'summary': {
-                    'total_clicks': total_clicks,
-                    'total_impressions': total_impressions,
-                    'avg_ctr': round(avg_ctr, 2),
-                    'avg_position': round(avg_position, 1),
-                    'date_range': f"{start_date} to {end_date}"
-                }
+                'success': False,
+                'error': str(e),
+                'message': 'Google Search Console is not responding right now. Please try again in a few minutes.'
             }
-            
         except Exception as e:
             return {
                 'success': False,
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+from rate_limiter import rate_limiter
+from tracing import span
+
+
+class BufferedLeadWriter:
+    def __init__(self, open_sheet, journal_path="leads_journal.jsonl", batch_size=20, flush_interval=15):
+        """
+        Buffer lead rows locally and write them to Google Sheets in batches
+
+        Every row is appended to a local journal before it is acknowledged, so
+        rows survive a process restart and are flushed by the next writer.
+
+        Args:
+            open_sheet: callable returning a gspread worksheet (called lazily, once)
+            journal_path: JSONL file holding rows not yet written to the sheet
+            batch_size: flush as soon as this many rows are buffered
+            flush_interval: flush buffered rows at least this often (seconds)
+        """
+        self.open_sheet = open_sheet
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._sheet = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = self._load_journal()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name="lead-writer", daemon=True)
+        self._thread.start()
+
+    def _load_journal(self):
+        rows = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as journal:
+                for line in journal:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        pass
+        return rows
+
+    def _rewrite_journal(self):
+        """Atomically replace the journal with the rows still pending"""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as journal:
+            for row in self._pending:
+                journal.write(json.dumps(row) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def add(self, row):
+        """Durably queue one row; returns once it is in the journal"""
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(row) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write every buffered row with a single append_rows call; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+
+            try:
+                if self._sheet is None:
+                    self._sheet = self.open_sheet()
+                rate_limiter.acquire('sheets')
+                with span('sheets.append_rows', rows=len(batch)):
+                    self._sheet.append_rows(batch)
+            except Exception as e:
+                # Keep the rows; drop the cached sheet in case the credentials expired
+                self._sheet = None
+                self.last_error = str(e)
+                return 0
+
+            with self._lock:
+                # Rows added while the request was in flight stay pending
+                del self._pending[:len(batch)]
+                self._rewrite_journal()
+            self.last_error = None
+            return len(batch)
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(max(0, next_flush - time.monotonic()))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.flush()
+            next_flush = time.monotonic() + self.flush_interval
@@ -0,0 +1,177 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import rate_limiter
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+# Statuses some servers return for HEAD even though GET works
+HEAD_UNSUPPORTED = {400, 403, 405, 406, 501}
+
+
+class LinkChecker:
+    def __init__(self, max_workers=32, per_host=4, timeout=10, cache_ttl=3600, max_redirects=10,
+                 max_cache_entries=200000):
+        """
+        Concurrent HEAD-first link checker with a shared result cache
+
+        Args:
+            max_workers: total concurrent requests
+            per_host: concurrent requests per host
+            timeout: request timeout in seconds
+            cache_ttl: seconds a result is reused across audits
+            max_redirects: longest redirect chain followed
+            max_cache_entries: cache size that triggers pruning
+        """
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.max_cache_entries = max_cache_entries
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.max_redirects = max_redirects
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._cache = {}
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def _request(self, method, url):
+        rate_limiter.acquire_host(url)
+        response = self.session.request(method, url, allow_redirects=True, timeout=self.timeout, stream=True)
+        response.close()
+        return response
+
+    def check_url(self, url):
+        """
+        Resolve one URL
+
+        Returns:
+            dict with status, final_url, redirect_chain (list of {url, status} hops),
+            method used, content_length and content_type, and error (None on success)
+        """
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached and cached[0] > time.monotonic():
+                self.cache_hits += 1
+                return cached[1]
+
+        result = {'url': url, 'status': None, 'final_url': None, 'redirect_chain': [], 'method': 'HEAD',
+                  'content_length': None, 'content_type': None, 'error': None}
+        with self._host_slot(url):
+            try:
+                response = self._request('HEAD', url)
+                if response.status_code in HEAD_UNSUPPORTED:
+                    result['method'] = 'GET'
+                    response = self._request('GET', url)
+                result['status'] = response.status_code
+                result['final_url'] = response.url
+                result['redirect_chain'] = [{'url': hop.url, 'status': hop.status_code} for hop in response.history]
+                if response.headers.get('Content-Length', '').isdigit():
+                    result['content_length'] = int(response.headers['Content-Length'])
+                result['content_type'] = response.headers.get('Content-Type')
+            except requests.TooManyRedirects:
+                result['error'] = 'Too many redirects'
+            except Exception as e:
+                result['error'] = type(e).__name__
+
+        with self._lock:
+            self._cache[url] = (time.monotonic() + self.cache_ttl, result)
+            if len(self._cache) > self.max_cache_entries:
+                self._prune()
+        return result
+
+    def _prune(self):
+        """Drop expired entries, then the oldest half if still over the limit (caller holds the lock)"""
+        now = time.monotonic()
+        self._cache = {url: entry for url, entry in self._cache.items() if entry[0] > now}
+        if len(self._cache) > self.max_cache_entries:
+            keep = sorted(self._cache.items(), key=lambda item: item[1][0])[len(self._cache) // 2:]
+            self._cache = dict(keep)
+
+    def check(self, urls):
+        """Check many URLs concurrently; returns {url: result}"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return dict(zip(urls, executor.map(self.check_url, urls)))
+
+def fetched_page_result(url, status, final_url=None):
+    """check_url-style result for a URL the crawler already fetched"""
+    return {'url': url, 'status': status, 'final_url': final_url or url, 'redirect_chain': [], 'method': 'GET',
+            'content_length': None, 'content_type': None, 'error': None}
+
+def summarize_link_checks(pages_data, results, blocked=(), sample_size=25):
+    """
+    Aggregate link check results and attribute problems to the pages linking to them
+
+    Adds 'broken_links' (count) to each page dict. `blocked` are links that
+    were not checked because robots.txt disallows them.
+
+    Returns:
+        dict with checked/broken/redirected/blocked counts plus samples of
+        broken and blocked links (with the pages they were found on) and
+        redirect chains
+    """
+    blocked = list(dict.fromkeys(blocked))
+    blocked_found_on = {link: [] for link in blocked}
+    found_on = {}
+    for page in pages_data:
+        page_broken = 0
+        for link in page.get('links', []) + page.get('external_links', []):
+            sources = blocked_found_on.get(link)
+            if sources is not None and len(sources) < 3:
+                sources.append(page['url'])
+            result = results.get(link)
+            if result is None:
+                continue
+            if result['error'] or result['status'] >= 400:
+                page_broken += 1
+                sources = found_on.setdefault(link, [])
+                if len(sources) < 3:
+                    sources.append(page['url'])
+        page['broken_links'] = page_broken
+
+    broken = [r for r in results.values() if r['error'] or r['status'] >= 400]
+    redirected = [r for r in results.values() if r['redirect_chain'] and not r['error']]
+    long_chains = [r for r in redirected if len(r['redirect_chain']) > 1]
+
+    return {
+        'checked': len(results),
+        'broken_count': len(broken),
+        'redirected_count': len(redirected),
+        'redirect_chain_count': len(long_chains),
+        'blocked_count': len(blocked),
+        'broken': [
+            {'url': r['url'], 'status': r['status'], 'error': r['error'], 'found_on': found_on.get(r['url'], [])}
+            for r in broken[:sample_size]
+        ],
+        'blocked': [{'url': link, 'found_on': blocked_found_on[link]} for link in blocked[:sample_size]],
+        'redirects': [
+            {'url': r['url'], 'final_url': r['final_url'], 'hops': len(r['redirect_chain']),
+             'chain': [hop['status'] for hop in r['redirect_chain']]}
+            for r in sorted(redirected, key=lambda r: -len(r['redirect_chain']))[:sample_size]
+        ]
+    }
+
+link_checker = LinkChecker()
@@ -0,0 +1,177 @@
+from array import array
+
+import numpy as np
+
+from site_crawler import normalize_url
+
+
+class LinkGraph:
+    def __init__(self):
+        """
+        Directed internal link graph stored as CSR arrays
+
+        Edges are collected into flat int32 buffers while pages are added and
+        compacted into (indptr, indices) by build(); no per-node lists are kept.
+        """
+        self.url_ids = {}
+        self.urls = []
+        self._src = array('i')
+        self._dst = array('i')
+        self.indptr = None
+        self.indices = None
+
+    def node_id(self, url):
+        node = self.url_ids.get(url)
+        if node is None:
+            node = len(self.urls)
+            self.url_ids[url] = node
+            self.urls.append(url)
+        return node
+
+    def add_page(self, url, links):
+        """Record every outgoing internal link of a crawled page"""
+        src = self.node_id(url)
+        for link in links:
+            dst = self.node_id(link)
+            if dst != src:
+                self._src.append(src)
+                self._dst.append(dst)
+
+    @property
+    def node_count(self):
+        return len(self.urls)
+
+    @property
+    def edge_count(self):
+        return 0 if self.indices is None else len(self.indices)
+
+    def build(self):
+        """Deduplicate edges and compact them into CSR form"""
+        n = self.node_count
+        src = np.frombuffer(self._src, dtype=np.int32).astype(np.int64)
+        dst = np.frombuffer(self._dst, dtype=np.int32).astype(np.int64)
+        keys = np.unique(src * n + dst) if len(src) else np.empty(0, dtype=np.int64)
+        src = (keys // n).astype(np.int32) if n else keys.astype(np.int32)
+        self.indices = (keys % n).astype(np.int32) if n else keys.astype(np.int32)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        # Free the build buffers
+        self._src = array('i')
+        self._dst = array('i')
+        return self
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=self.node_count)
+
+    def pagerank(self, damping=0.85, tol=1e-8, max_iter=100):
+        """Power-iteration PageRank; dangling pages spread their rank uniformly"""
+        n = self.node_count
+        if n == 0:
+            return np.empty(0)
+        out_degree = self.out_degree()
+        src = np.repeat(np.arange(n, dtype=np.int32), out_degree)
+        dangling = out_degree == 0
+        inv_degree = np.zeros(n)
+        inv_degree[~dangling] = 1.0 / out_degree[~dangling]
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            share = rank * inv_degree
+            new_rank = np.bincount(self.indices, weights=share[src], minlength=n)
+            new_rank = damping * (new_rank + rank[dangling].sum() / n) + (1 - damping) / n
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tol:
+                break
+        return rank
+
+    def _neighbors(self, nodes):
+        """All out-neighbors of `nodes`, gathered without a Python loop"""
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            return np.empty(0, dtype=np.int32)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.indices[offsets + np.arange(total)]
+
+    def click_depth(self, root_url):
+        """Breadth-first click depth from `root_url`; -1 for unreachable pages"""
+        depth = np.full(self.node_count, -1, dtype=np.int32)
+        root = self.url_ids.get(root_url)
+        if root is None:
+            return depth
+        depth[root] = 0
+        frontier = np.array([root], dtype=np.int64)
+        level = 0
+        while len(frontier):
+            level += 1
+            neighbors = np.unique(self._neighbors(frontier))
+            frontier = neighbors[depth[neighbors] == -1].astype(np.int64)
+            depth[frontier] = level
+        return depth
+
+def analyze_link_graph(pages_data, root_url, sitemap_urls=None, top_n=10, orphan_sample=20):
+    """
+    Build the internal link graph of crawled pages and annotate them
+
+    Adds 'internal_pagerank' (1.0 = site average), 'click_depth' and 'inlinks'
+    to each page dict.
+
+    Returns:
+        dict with node/edge counts, orphan pages, click depth distribution
+        and the pages with the highest internal PageRank
+    """
+    page_urls = [normalize_url(page['url']) or page['url'] for page in pages_data]
+    root_url = normalize_url(root_url) or root_url
+
+    graph = LinkGraph()
+    for page, url in zip(pages_data, page_urls):
+        graph.add_page(url, page.get('links', []))
+    graph.build()
+
+    rank = graph.pagerank()
+    depth = graph.click_depth(root_url)
+    in_degree = graph.in_degree()
+    n = graph.node_count
+
+    crawled_ids = np.array([graph.url_ids[url] for url in page_urls], dtype=np.int64)
+    for page, node in zip(pages_data, crawled_ids):
+        page['internal_pagerank'] = round(float(rank[node] * n), 3)
+        page['click_depth'] = int(depth[node]) if depth[node] >= 0 else None
+        page['inlinks'] = int(in_degree[node])
+
+    # Crawled pages no other crawled page links to (reached only via the sitemap)
+    root = graph.url_ids.get(root_url)
+    orphan_ids = [node for node in crawled_ids if in_degree[node] == 0 and node != root]
+    orphans = [graph.urls[node] for node in orphan_ids]
+
+    # Sitemap URLs that were never linked from any crawled page
+    unlinked_sitemap_urls = 0
+    if sitemap_urls:
+        unlinked_sitemap_urls = sum(
+            1 for url in sitemap_urls
+            if url not in graph.url_ids or in_degree[graph.url_ids[url]] == 0
+        )
+
+    crawled_depths = depth[crawled_ids]
+    reachable = crawled_depths[crawled_depths >= 0]
+    order = crawled_ids[np.argsort(-rank[crawled_ids])][:top_n]
+
+    return {
+        'nodes': n,
+        'edges': graph.edge_count,
+        'orphan_count': len(orphans),
+        'orphan_pages': orphans[:orphan_sample],
+        'unlinked_sitemap_urls': unlinked_sitemap_urls,
+        'max_click_depth': int(reachable.max()) if len(reachable) else 0,
+        'deep_pages': int((crawled_depths > 3).sum()),
+        'depth_distribution': {int(d): int(c) for d, c in zip(*np.unique(reachable, return_counts=True))},
+        'top_pages': [
+            {'url': graph.urls[node], 'internal_pagerank': round(float(rank[node] * n), 3), 'inlinks': int(in_degree[node])}
+            for node in order
+        ]
+    }
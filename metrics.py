@@ -0,0 +1,236 @@
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans range from sub-millisecond parsing to multi-minute audits
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        """Monotonic counter with optional labels, rendered in Prometheus text format"""
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = dict(const_labels, **dict(zip(self.labelnames, key)))
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        """Cumulative-bucket histogram with optional labels"""
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(const_labels, **dict(zip(self.labelnames, key)))
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        # Added to every series, e.g. to tell worker processes apart
+        self.const_labels = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(self.const_labels))
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    'seo_agent_stage_duration_seconds', "Duration of traced audit stages", ['stage', 'status'])
+audits = registry.counter('seo_agent_audits_total', "Audits run, by outcome", ['outcome'])
+fetch_errors = registry.counter('seo_agent_fetch_errors_total', "Failed page fetches")
+llm_tokens = registry.counter('seo_agent_llm_tokens_total', "LLM tokens used", ['type'])
+google_api_calls = registry.counter(
+    'seo_agent_google_api_calls_total', "Search Console and Analytics API calls", ['api', 'status'])
+emails = registry.counter('seo_agent_emails_total', "Emails sent over SMTP", ['status'])
+sheet_appends = registry.counter('seo_agent_sheet_appends_total', "Google Sheets append requests", ['status'])
+rate_limit_waits = registry.histogram(
+    'seo_agent_rate_limit_wait_seconds', "Time outbound calls queued for rate limits", ['destination'])
+cache_lookups = registry.counter(
+    'seo_agent_cache_lookups_total', "Lookups of reusable audits and pages", ['cache', 'result'])
+
+# Span name -> (counter, fixed labels) counted once per finished span
+_SPAN_COUNTERS = {
+    'gsc.query': (google_api_calls, {'api': 'gsc'}),
+    'ga4.run_report': (google_api_calls, {'api': 'ga4'}),
+    'smtp.send': (emails, {}),
+    'sheets.append_rows': (sheet_appends, {}),
+}
+
+
+class SpanMetrics:
+    """Tracing exporter that turns finished spans into metrics"""
+
+    def export(self, span):
+        status = span.status.lower()
+        stage_seconds.observe(span.duration, stage=span.name, status=status)
+
+        if span.name in _SPAN_COUNTERS:
+            counter, labels = _SPAN_COUNTERS[span.name]
+            counter.inc(status=status, **labels)
+        elif span.name == 'ratelimit.wait':
+            rate_limit_waits.observe(span.duration, destination=span.attributes.get('destination'))
+        elif span.name == 'page.fetch' and span.status == 'ERROR':
+            fetch_errors.inc()
+        elif span.name == 'llm.recommendations':
+            for token_type in ('input', 'output'):
+                if span.attributes.get(f'{token_type}_tokens'):
+                    llm_tokens.inc(span.attributes[f'{token_type}_tokens'], type=token_type)
+        elif span.name == 'audit':
+            if span.status == 'ERROR':
+                audits.inc(outcome='error')
+            elif span.attributes.get('fetched') is False:
+                audits.inc(outcome='unreachable')
+            else:
+                audits.inc(outcome='ok')
+
+tracing.add_exporter(SpanMetrics())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host='0.0.0.0'):
+    """Serve /metrics on a side port from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def write_textfile(path):
+    """Atomically write the metrics for node_exporter's textfile collector"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+def start_textfile_writer(path, interval=15):
+    """Rewrite the textfile every `interval` seconds from a daemon thread"""
+    def loop():
+        while True:
+            try:
+                write_textfile(path)
+            except OSError:
+                logger.exception("Writing metrics to %s failed", path)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+_started = False
+_start_lock = threading.Lock()
+
+def start_from_env():
+    """
+    Expose metrics as configured by the environment, once per process
+
+    METRICS_PORT serves /metrics over HTTP. METRICS_TEXTFILE writes a
+    textfile-collector file every METRICS_TEXTFILE_INTERVAL seconds; a
+    "{pid}" in the path gives each process its own file and adds a pid label
+    so series from several worker processes don't collide.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    port = os.getenv('METRICS_PORT')
+    if port:
+        try:
+            start_http_server(int(port))
+        except OSError as e:
+            # Another process (e.g. a sibling worker) already serves this port
+            logger.warning("Metrics port %s unavailable: %s", port, e)
+
+    textfile = os.getenv('METRICS_TEXTFILE')
+    if textfile:
+        if '{pid}' in textfile:
+            registry.const_labels['pid'] = str(os.getpid())
+        start_textfile_writer(textfile.format(pid=os.getpid()), float(os.getenv('METRICS_TEXTFILE_INTERVAL', '15')))
@@ -0,0 +1,198 @@
+import http.client
+import math
+import socket
+import ssl
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from requests.utils import get_encoding_from_headers
+
+from rate_limiter import rate_limiter
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'close'
+}
+PHASES = ['dns', 'connect', 'tls', 'ttfb', 'transfer', 'total']
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a small sample"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def _median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+def decompress_body(body, headers):
+    """Undo Content-Encoding"""
+    encoding = (headers.get('Content-Encoding') or '').lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+def decode_html(raw, headers):
+    """Decode to text using the declared charset, preferring UTF-8 over the HTTP default"""
+    charset = get_encoding_from_headers(headers)
+    if charset and charset.lower() != 'iso-8859-1':
+        return raw.decode(charset, errors='replace')
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode(charset or 'iso-8859-1', errors='replace')
+
+
+class PageTimer:
+    def __init__(self, runs=1, timeout=15, max_redirects=5):
+        """
+        Phase-level page timing on fresh connections
+
+        Each run resolves DNS, connects, negotiates TLS and downloads the document
+        on a new socket, so every sample measures the same cold path.
+
+        Args:
+            runs: measurements per page; median and p90 are reported. The
+                first run also fetches the content, so extra runs are extra
+                requests: worth it for the start page, not for every crawled page
+            timeout: socket timeout in seconds
+            max_redirects: redirects followed before giving up
+        """
+        self.runs = runs
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+
+    def _measure_request(self, url, extra_headers=None):
+        """One request on a new connection; returns (timings, status, headers, body)"""
+        parts = urlsplit(url)
+        secure = parts.scheme == 'https'
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += f"?{parts.query}"
+
+        # Queue for the host's rate limit before the clock starts
+        rate_limiter.acquire_host(url)
+        timings = {}
+        start = time.perf_counter()
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        timings['dns'] = resolved - start
+
+        sock = None
+        for position, (family, socktype, proto, _, address) in enumerate(addresses):
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(address)
+                break
+            except OSError:
+                sock.close()
+                if position == len(addresses) - 1:
+                    raise
+        try:
+            connected = time.perf_counter()
+            timings['connect'] = connected - resolved
+
+            if secure:
+                context = ssl.create_default_context()
+                sock = context.wrap_socket(sock, server_hostname=host)
+            handshaken = time.perf_counter()
+            timings['tls'] = handshaken - connected
+
+            connection = http.client.HTTPConnection(host, port, timeout=self.timeout)
+            connection.sock = sock
+            headers = dict(HEADERS)
+            headers['Host'] = parts.netloc
+            headers.update(extra_headers or {})
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            first_byte = time.perf_counter()
+            timings['ttfb'] = first_byte - handshaken
+
+            body = response.read()
+            finished = time.perf_counter()
+            timings['transfer'] = finished - first_byte
+            return timings, response.status, response.headers, body
+        finally:
+            sock.close()
+
+    def measure_once(self, url, extra_headers=None):
+        """Time one full page load, following redirects"""
+        totals = {phase: 0.0 for phase in PHASES[:-1]}
+        redirect_time = 0.0
+        for _ in range(self.max_redirects + 1):
+            timings, status, headers, body = self._measure_request(url, extra_headers)
+            if status in (301, 302, 303, 307, 308) and headers.get('Location'):
+                redirect_time += sum(timings.values())
+                url = urljoin(url, headers['Location'])
+                continue
+            totals.update(timings)
+            totals['redirect'] = redirect_time
+            totals['total'] = sum(timings.values()) + redirect_time
+            return totals, status, headers, body, url
+        raise http.client.HTTPException("Too many redirects")
+
+    def measure(self, url, etag=None, last_modified=None):
+        """
+        Time `url` `runs` times
+
+        With `etag` or `last_modified` the first run is conditional. If the
+        server answers 304 Not Modified, status is 304 and content is None,
+        but `runs` unconditional loads are still timed (the 304 itself is not
+        counted), so an unchanged page's load time stays current.
+
+        Returns:
+            dict with content (decoded HTML of the first run), final_url, status,
+            etag, last_modified, transfer_bytes (on the wire), decoded_bytes
+            (decompressed), runs and median/p90 seconds per phase
+        """
+        conditional = {}
+        if etag:
+            conditional['If-None-Match'] = etag
+        if last_modified:
+            conditional['If-Modified-Since'] = last_modified
+
+        timings, status, headers, body, final_url = self.measure_once(url, conditional)
+        samples = [] if status == 304 else [timings]
+        while len(samples) < max(self.runs, 1):
+            timings, run_status, run_headers, run_body, run_url = self.measure_once(url)
+            if not samples:
+                # Not modified: sizes and validators come from the full load,
+                # which also shows if the page has started failing since
+                headers, body, final_url = run_headers, run_body, run_url
+                if run_status >= 400:
+                    status = run_status
+            samples.append(timings)
+
+        raw = decompress_body(body, headers)
+        phases = {}
+        for phase in PHASES + ['redirect']:
+            values = [sample[phase] for sample in samples]
+            phases[phase] = {
+                'median': round(_median(values), 3),
+                'p90': round(_percentile(values, 90), 3)
+            }
+        return {
+            'content': decode_html(raw, headers) if status != 304 else None,
+            'final_url': final_url,
+            'status': status,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'transfer_bytes': len(body),
+            'decoded_bytes': len(raw),
+            'runs': len(samples),
+            'phases': phases
+        }
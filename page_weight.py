@@ -0,0 +1,241 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import rate_limiter
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate, br'
+}
+
+# Content types that should be served compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/x-javascript', 'application/json',
+                      'application/xml', 'image/svg+xml')
+MODERN_IMAGE_FORMATS = {'webp', 'avif', 'svg'}
+# Assets cached for less than a day count as poorly cached
+MIN_CACHE_SECONDS = 86400
+MAX_AGE_PATTERN = re.compile(r"(?:s-)?max-age=(\d+)")
+
+def sniff_image_format(head, content_type):
+    """Image format from magic bytes, falling back to the Content-Type subtype"""
+    if head.startswith(b'\x89PNG'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'GIF8'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif'
+    if b'<svg' in head[:256].lower():
+        return 'svg'
+    if content_type and content_type.startswith('image/'):
+        return content_type[6:].split('+')[0]
+    return None
+
+def cache_lifetime(cache_control, expires_header):
+    """Seconds the asset may be cached, 0 if uncacheable, None if no caching headers"""
+    cache_control = (cache_control or '').lower()
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        return int(match.group(1))
+    if expires_header:
+        try:
+            return max(0, int(time.mktime(time.strptime(expires_header, '%a, %d %b %Y %H:%M:%S GMT')) - time.mktime(time.gmtime())))
+        except ValueError:
+            return 0
+    return None
+
+def _is_uncompressed(result):
+    return (not result['content_encoding'] and bool(result['content_type'])
+            and result['content_type'].startswith(COMPRESSIBLE_TYPES) and result['bytes'] > 1024)
+
+def _is_poorly_cached(result):
+    return (bool(result['status']) and result['status'] < 400
+            and (result['cache_seconds'] is None or result['cache_seconds'] < MIN_CACHE_SECONDS))
+
+def _is_legacy_image(result):
+    return bool(result['image_format']) and result['image_format'] not in MODERN_IMAGE_FORMATS
+
+
+class SubresourceAnalyzer:
+    def __init__(self, max_workers=16, per_host=6, timeout=10, cache_ttl=3600, max_body_bytes=20 * 1024 * 1024,
+                 max_cache_entries=50000):
+        """
+        Concurrent subresource fetcher with a shared result cache
+
+        Every asset is downloaded once (in-flight requests are shared between
+        pages) so its transferred size, compression and cache headers are
+        measured rather than trusted from Content-Length.
+
+        Args:
+            max_workers: total concurrent downloads
+            per_host: concurrent downloads per host
+            timeout: request timeout in seconds
+            cache_ttl: seconds a result is reused across pages and audits
+            max_body_bytes: download cap per asset
+            max_cache_entries: cache size that triggers pruning
+        """
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.max_body_bytes = max_body_bytes
+        self.max_cache_entries = max_cache_entries
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='subresource')
+
+        self._cache = {}  # url -> (expires_at, Future)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def fetch(self, url, kind):
+        """
+        Download one asset
+
+        Returns:
+            dict with url, kind, status, bytes (as transferred), content_type,
+            content_encoding, cache_seconds, image_format and error
+        """
+        result = {'url': url, 'kind': kind, 'status': None, 'bytes': None, 'content_type': None,
+                  'content_encoding': None, 'cache_seconds': None, 'image_format': None, 'error': None}
+        with self._host_slot(url):
+            try:
+                rate_limiter.acquire_host(url)
+                with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    result['status'] = response.status_code
+                    content_type = (response.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+                    result['content_type'] = content_type or None
+                    result['content_encoding'] = response.headers.get('Content-Encoding')
+                    result['cache_seconds'] = cache_lifetime(response.headers.get('Cache-Control'),
+                                                             response.headers.get('Expires'))
+
+                    # Count bytes as sent over the wire, before decompression
+                    size = 0
+                    head = b''
+                    for chunk in response.raw.stream(65536, decode_content=False):
+                        if not head:
+                            head = chunk[:512]
+                        size += len(chunk)
+                        if size > self.max_body_bytes:
+                            break
+                    result['bytes'] = size
+                    if kind == 'images' and response.status_code < 400:
+                        result['image_format'] = sniff_image_format(head, content_type)
+            except Exception as e:
+                result['error'] = type(e).__name__
+        return result
+
+    def _submit(self, url, kind):
+        """Cached or in-flight future for `url`, starting a download if needed (caller holds the lock)"""
+        entry = self._cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            self.cache_hits += 1
+            return entry[1]
+        future = self.executor.submit(self.fetch, url, kind)
+        self._cache[url] = (time.monotonic() + self.cache_ttl, future)
+        if len(self._cache) > self.max_cache_entries:
+            self._prune()
+        return future
+
+    def _prune(self):
+        """Drop expired entries, then the oldest half if still over the limit (caller holds the lock)"""
+        now = time.monotonic()
+        self._cache = {url: entry for url, entry in self._cache.items() if entry[0] > now}
+        if len(self._cache) > self.max_cache_entries:
+            keep = sorted(self._cache.items(), key=lambda item: item[1][0])[len(self._cache) // 2:]
+            self._cache = dict(keep)
+
+    def analyze(self, subresources):
+        """Fetch {kind: [urls]} concurrently; returns a list of fetch results"""
+        with self._lock:
+            futures = [self._submit(url, kind) for kind, urls in subresources.items() for url in urls]
+        return [future.result() for future in futures]
+
+def summarize_page_weight(html_bytes, results, top_n=5):
+    """
+    Page weight of one page from its subresource fetch results
+
+    Returns:
+        dict with total_kb, kb per kind, the heaviest assets and counts of
+        uncompressed, poorly cached, legacy-format and failed assets
+    """
+    fetched = [r for r in results if r['bytes'] is not None]
+    by_kind = {}
+    for r in results:
+        by_kind[r['kind']] = by_kind.get(r['kind'], 0) + (r['bytes'] or 0)
+
+    heaviest = sorted(fetched, key=lambda r: -r['bytes'])[:top_n]
+
+    return {
+        'total_kb': round((html_bytes + sum(by_kind.values())) / 1024, 2),
+        'kb_by_kind': {kind: round(size / 1024, 2) for kind, size in by_kind.items()},
+        'asset_count': len(results),
+        'failed_count': sum(1 for r in results if r['error'] or (r['status'] or 0) >= 400),
+        'uncompressed_count': sum(1 for r in fetched if _is_uncompressed(r)),
+        'poorly_cached_count': sum(1 for r in fetched if _is_poorly_cached(r)),
+        'legacy_image_count': sum(1 for r in fetched if _is_legacy_image(r)),
+        'heaviest': [{'url': r['url'], 'kind': r['kind'], 'kb': round(r['bytes'] / 1024, 2)} for r in heaviest]
+    }
+
+def summarize_site_weight(pages_data, results, top_n=10):
+    """
+    Site-wide page weight across crawled pages
+
+    `results` are the fetch results of every distinct asset; heavy assets
+    are ranked by bytes times the number of crawled pages that load them.
+
+    Returns:
+        dict with average/max page weight, the heaviest distinct assets and
+        samples of uncompressed, poorly cached and legacy-format assets
+    """
+    weights = [page['page_weight']['total_kb'] for page in pages_data if page.get('page_weight')]
+    used_by = {}
+    for page in pages_data:
+        for urls in page.get('subresources', {}).values():
+            for url in urls:
+                used_by[url] = used_by.get(url, 0) + 1
+
+    fetched = [r for r in results if r['bytes'] is not None]
+    heaviest = sorted(fetched, key=lambda r: -r['bytes'] * used_by.get(r['url'], 1))[:top_n]
+
+    return {
+        'pages': len(weights),
+        'avg_page_kb': round(sum(weights) / len(weights), 2) if weights else 0,
+        'max_page_kb': max(weights) if weights else 0,
+        'distinct_assets': len(results),
+        'total_asset_kb': round(sum(r['bytes'] for r in fetched) / 1024, 2),
+        'heaviest': [
+            {'url': r['url'], 'kind': r['kind'], 'kb': round(r['bytes'] / 1024, 2), 'pages': used_by.get(r['url'], 0)}
+            for r in heaviest
+        ],
+        'uncompressed': [r['url'] for r in fetched if _is_uncompressed(r)][:top_n],
+        'poorly_cached': [r['url'] for r in fetched if _is_poorly_cached(r)][:top_n],
+        'legacy_images': [r['url'] for r in fetched if _is_legacy_image(r)][:top_n]
+    }
+
+subresource_analyzer = SubresourceAnalyzer()
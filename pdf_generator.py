@@ -3,10 +3,13 @@ from datetime import datetime
 import os
 import tempfile
 
+from seo_rules import calculate_seo_score, check_page
+from trends import format_change
+
 class PDFGenerator:
-    def __init__(self):
+    def __init__(self, max_detailed_pages=25):
         """Initialize PDF generator"""
-        pass
+        self.max_detailed_pages = max_detailed_pages
     
     def generate_audit_pdf(self, client_data, pages_data, technical_findings, has_blog, gsc_data, ga4_data, recommendations):
         """
@@ -41,70 +44,7 @@ class PDFGenerator:
     
     def _calculate_seo_score(self, pages_data, technical_findings, gsc_data, ga4_data):
         """Calculate overall SEO score out of 100"""
-        score = 0
-        max_score = 100
-        
-        # Technical infrastructure (20 points)
-        if technical_findings.get('has_robots_txt'):
-            score += 5
-        if technical_findings.get('has_sitemap'):
-            score += 5
-        
-        # Page optimization (30 points)
-        if pages_data:
-            homepage = pages_data[0]
-            
-            # Title optimization (10 points)
-            if 50 <= homepage['title_length'] <= 60:
-                score += 10
-            elif 30 <= homepage['title_length'] <= 70:
-                score += 5
-            
-            # Meta description (10 points)
-            if 120 <= homepage['meta_length'] <= 160:
-                score += 10
-            elif 80 <= homepage['meta_length'] <= 180:
-                score += 5
-            
-            # H1 tags (5 points)
-            if homepage['h1_count'] == 1:
-                score += 5
-            
-            # Page speed (5 points)
-            if homepage['load_time'] < 2:
-                score += 5
-            elif homepage['load_time'] < 3:
-                score += 3
-        
-        # Schema markup (10 points)
-        if pages_data and pages_data[0]['schemas']:
-            score += 10
-        
-        # Data connectivity (20 points)
-        if gsc_data and gsc_data.get('success'):
-            score += 10
-        if ga4_data and ga4_data.get('success'):
-            score += 10
-        
-        # Additional optimizations (20 points)
-        if pages_data:
-            homepage = pages_data[0]
-            elements = homepage['page_elements']
-            
-            if elements.get('has_canonical'):
-                score += 5
-            if elements.get('has_opengraph'):
-                score += 5
-            if elements.get('has_gsc_verification'):
-                score += 5
-            
-            # Image optimization
-            resources = homepage['resources']
-            if resources['total_images'] > 0:
-                alt_ratio = 1 - (resources['images_without_alt'] / resources['total_images'])
-                score += int(alt_ratio * 5)
-        
-        return min(score, max_score)
+        return calculate_seo_score(pages_data, technical_findings, gsc_data, ga4_data)
     
     def _generate_html(self, client_data, pages_data, technical_findings, has_blog, gsc_data, ga4_data, recommendations, overall_score):
         """Generate HTML content for PDF"""
@@ -398,28 +338,62 @@ class PDFGenerator:
                 <li class="{'status-good' if has_blog else 'status-warning'}">
                     Blog/Content Section: {'✓ Found' if has_blog else '✗ Not Found'}
                 </li>
+"""
+        
+        robots = technical_findings.get('robots')
+        if robots and technical_findings.get('has_robots_txt'):
+            html += f"""
+                <li class="{'status-critical' if robots['blocks_all'] else 'status-good'}">
+                    robots.txt rules: {robots['disallow_rules']} disallow, {robots['allow_rules']} allow{f", crawl-delay {robots['crawl_delay']}s" if robots['crawl_delay'] else ''}{' (blocks the whole site)' if robots['blocks_all'] else ''}
+                </li>
+"""
+        
+        sitemap = technical_findings.get('sitemap')
+        if sitemap and sitemap['sitemaps']:
+            html += f"""
+                <li>Sitemap URLs: {sitemap['url_count']:,} across {len(sitemap['sitemaps'])} file(s)</li>
+"""
+        coverage = technical_findings.get('sitemap_coverage')
+        if coverage:
+            html += f"""
+                <li class="{'status-good' if coverage['coverage_pct'] >= 90 else 'status-warning'}">
+                    Crawled pages listed in sitemap: {coverage['coverage_pct']}% ({coverage['missing_from_sitemap_count']} missing)
+                </li>
+"""
+        
+        page_scores = technical_findings.get('page_scores')
+        if page_scores:
+            percentiles = page_scores['percentiles']
+            html += f"""
+                <li class="{'status-good' if percentiles['p50'] >= 60 else 'status-warning'}">
+                    Page scores across {page_scores['pages']} pages: median {percentiles['p50']}/100 (10th percentile {percentiles['p10']}, 90th percentile {percentiles['p90']})
+                </li>
+"""
+        
+        html += """
             </ul>
 """
         
         # Page findings
         if pages_data:
             homepage = pages_data[0]
+            checks = check_page(homepage)
             html += f"""
             <h3>Homepage Optimization</h3>
             <ul>
-                <li class="{'status-good' if 50 <= homepage['title_length'] <= 60 else 'status-warning'}">
+                <li class="status-{checks['title_length'][1]}">
                     Title Tag: {homepage['title_length']} characters
                 </li>
-                <li class="{'status-good' if 120 <= homepage['meta_length'] <= 160 else 'status-warning'}">
+                <li class="status-{checks['meta_length'][1]}">
                     Meta Description: {homepage['meta_length']} characters
                 </li>
-                <li class="{'status-good' if homepage['h1_count'] == 1 else 'status-critical'}">
+                <li class="status-{checks['h1_count'][1]}">
                     H1 Tags: {homepage['h1_count']} found
                 </li>
-                <li class="{'status-good' if homepage['load_time'] < 3 else 'status-warning'}">
+                <li class="status-{checks['load_time'][1]}">
                     Page Load Time: {homepage['load_time']}s
                 </li>
-                <li class="{'status-good' if homepage['schemas'] else 'status-critical'}">
+                <li class="status-{checks['schema'][1]}">
                     Schema Markup: {', '.join(homepage['schemas']) if homepage['schemas'] else 'None detected'}
                 </li>
             </ul>
@@ -436,7 +410,22 @@ class PDFGenerator:
     <div class="section">
         <h1>Google Search Console Data</h1>
         <p style="color: #64748b; font-size: 14px;">Last 28 days of search performance data</p>
-        
+"""
+            
+            comparison = gsc_data.get('comparison')
+            if comparison:
+                changes = comparison['changes']
+                html += f"""
+        <div class="info-box">
+            <p><strong>Compared with {comparison['date_range']}:</strong>
+            clicks {format_change(changes['total_clicks'])},
+            impressions {format_change(changes['total_impressions'])},
+            average position {changes['avg_position']['previous']} → {changes['avg_position']['current']};
+            {comparison['queries']['new_count']} new queries, {comparison['queries']['lost_count']} no longer ranking</p>
+        </div>
+"""
+            
+            html += """
         <h2>Top Search Queries</h2>
         <table>
             <thead>
@@ -501,7 +490,22 @@ class PDFGenerator:
     <div class="section">
         <h1>Google Analytics Data</h1>
         <p style="color: #64748b; font-size: 14px;">Last 28 days of website traffic and user behavior</p>
-        
+"""
+            
+            comparison = ga4_data.get('comparison')
+            if comparison and comparison['overall']:
+                changes = comparison['changes']
+                html += f"""
+        <div class="info-box">
+            <p><strong>Compared with {comparison['date_range']}:</strong>
+            sessions {format_change(changes['sessions'])},
+            users {format_change(changes['users'])},
+            pageviews {format_change(changes['pageviews'])},
+            bounce rate {changes['bounce_rate']['previous']}% → {changes['bounce_rate']['current']}%</p>
+        </div>
+"""
+            
+            html += """
         <h2>Traffic Overview</h2>
         <div class="metric-grid">
 """
@@ -583,28 +587,310 @@ class PDFGenerator:
     </div>
 """
         
+        # Internal Link Structure
+        link_graph = technical_findings.get('link_graph')
+        if link_graph:
+            html += f"""
+    <div class="section">
+        <h1>Internal Link Structure</h1>
+        <p style="color: #64748b; font-size: 14px;">{link_graph['nodes']:,} URLs connected by {link_graph['edges']:,} internal links</p>
+        
+        <div class="metric-grid">
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if link_graph['orphan_count'] == 0 else 'status-warning'}">{link_graph['orphan_count']}</div>
+                <div class="metric-label">Orphan Pages</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if link_graph['max_click_depth'] <= 3 else 'status-warning'}">{link_graph['max_click_depth']}</div>
+                <div class="metric-label">Max Click Depth</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value">{link_graph['unlinked_sitemap_urls']:,}</div>
+                <div class="metric-label">Unlinked Sitemap URLs</div>
+            </div>
+        </div>
+        
+        <h2>Strongest Pages by Internal PageRank</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Page</th>
+                    <th>PageRank (x avg)</th>
+                    <th>Inbound Links</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+            
+            for top_page in link_graph['top_pages']:
+                html += f"""
+                <tr>
+                    <td style="font-size: 12px;">{top_page['url']}</td>
+                    <td>{top_page['internal_pagerank']}</td>
+                    <td>{top_page['inlinks']}</td>
+                </tr>
+"""
+            
+            html += """
+            </tbody>
+        </table>
+"""
+            
+            if link_graph['orphan_pages']:
+                html += """
+        <h2>Orphan Pages</h2>
+        <ul>
+"""
+                for orphan_url in link_graph['orphan_pages']:
+                    html += f"""
+            <li style="font-size: 12px;">{orphan_url}</li>
+"""
+                html += """
+        </ul>
+"""
+            
+            html += """
+    </div>
+"""
+        
+        # Duplicate & Thin Content
+        duplicates = technical_findings.get('duplicates')
+        if duplicates and (duplicates['near_duplicate_groups'] or duplicates['duplicate_title_groups']
+                           or duplicates['duplicate_meta_groups'] or duplicates['thin_pages']):
+            html += f"""
+    <div class="section">
+        <h1>Duplicate &amp; Thin Content</h1>
+        
+        <div class="metric-grid">
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if duplicates['near_duplicate_count'] == 0 else 'status-warning'}">{duplicates['near_duplicate_count']}</div>
+                <div class="metric-label">Near-Duplicate Pages</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if duplicates['duplicate_title_count'] == 0 else 'status-warning'}">{duplicates['duplicate_title_count']}</div>
+                <div class="metric-label">Duplicate Titles</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if duplicates['thin_page_count'] == 0 else 'status-warning'}">{duplicates['thin_page_count']}</div>
+                <div class="metric-label">Thin Pages (&lt;{duplicates['thin_word_count']} words)</div>
+            </div>
+        </div>
+"""
+            
+            for heading, groups in (("Near-Duplicate Pages", duplicates['near_duplicate_groups']),
+                                    ("Pages Sharing a Title", duplicates['duplicate_title_groups']),
+                                    ("Pages Sharing a Meta Description", duplicates['duplicate_meta_groups'])):
+                if groups:
+                    html += f"""
+        <h2>{heading}</h2>
+        <ul>
+"""
+                    for group in groups[:10]:
+                        html += f"""
+            <li style="font-size: 12px;">{'<br>'.join(group[:5])}</li>
+"""
+                    html += """
+        </ul>
+"""
+            
+            html += """
+    </div>
+"""
+        
+        # What Changed
+        changes = technical_findings.get('changes')
+        if changes:
+            html += f"""
+    <div class="section">
+        <h1>What Changed</h1>
+        <p style="color: #64748b; font-size: 14px;">Compared with the audit from {changes['previous_audit_at']}: {changes['changed_page_count']} pages changed, {changes['added_count']} new, {changes['removed_count']} no longer found</p>
+"""
+            if not changes['has_changes']:
+                html += """
+        <p class="status-good">No changes since the last audit.</p>
+"""
+            if changes['site_changes'] or changes['page_changes']:
+                html += """
+        <table>
+            <thead>
+                <tr>
+                    <th>Where</th>
+                    <th>What</th>
+                    <th>Before</th>
+                    <th>After</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+                rows = [('Site-wide', change) for change in changes['site_changes']]
+                rows += [(page_change['url'], change) for page_change in changes['page_changes'] for change in page_change['fields']]
+                for where, change in rows[:40]:
+                    html += f"""
+                <tr>
+                    <td style="font-size: 12px;">{where}</td>
+                    <td>{change['field'].replace('_', ' ').capitalize()}</td>
+                    <td style="font-size: 12px;">{change['before']}</td>
+                    <td style="font-size: 12px;">{change['after']}</td>
+                </tr>
+"""
+                html += """
+            </tbody>
+        </table>
+"""
+            for heading, urls in (("New Pages", changes['added_pages']), ("Pages No Longer Found", changes['removed_pages'])):
+                if urls:
+                    html += f"""
+        <h2>{heading}</h2>
+        <ul>
+"""
+                    for changed_url in urls:
+                        html += f"""
+            <li style="font-size: 12px;">{changed_url}</li>
+"""
+                    html += """
+        </ul>
+"""
+            html += """
+    </div>
+"""
+        
+        # Page Weight
+        weight = technical_findings.get('page_weight')
+        if weight and weight['heaviest']:
+            html += f"""
+    <div class="section">
+        <h1>Page Weight</h1>
+        
+        <div class="metric-grid">
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if weight['avg_page_kb'] < 2000 else 'status-warning'}">{weight['avg_page_kb']:,} KB</div>
+                <div class="metric-label">Average Page Weight</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if not weight['uncompressed'] else 'status-warning'}">{len(weight['uncompressed'])}</div>
+                <div class="metric-label">Uncompressed Assets</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-value {'status-good' if not weight['legacy_images'] else 'status-warning'}">{len(weight['legacy_images'])}</div>
+                <div class="metric-label">Images Not in WebP/AVIF</div>
+            </div>
+        </div>
+        
+        <h2>Heaviest Assets</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Asset</th>
+                    <th>Type</th>
+                    <th>Size</th>
+                    <th>Pages</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+            for asset in weight['heaviest']:
+                html += f"""
+                <tr>
+                    <td style="font-size: 12px;">{asset['url']}</td>
+                    <td>{asset['kind'].capitalize()}</td>
+                    <td>{asset['kb']} KB</td>
+                    <td>{asset['pages']}</td>
+                </tr>
+"""
+            html += """
+            </tbody>
+        </table>
+    </div>
+"""
+        
+        # Broken Links & Redirects
+        link_check = technical_findings.get('link_check')
+        if link_check and (link_check['broken'] or link_check['redirects']):
+            html += f"""
+    <div class="section">
+        <h1>Broken Links &amp; Redirects</h1>
+        <p style="color: #64748b; font-size: 14px;">{link_check['checked']:,} links checked: {link_check['broken_count']} broken, {link_check['redirected_count']} redirected, {link_check.get('blocked_count', 0)} blocked by robots.txt (not checked)</p>
+"""
+            
+            if link_check['broken']:
+                html += """
+        <h2>Broken Links</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Link</th>
+                    <th>Status</th>
+                    <th>Found On</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+                for broken in link_check['broken']:
+                    html += f"""
+                <tr>
+                    <td style="font-size: 12px;">{broken['url']}</td>
+                    <td>{broken['status'] or broken['error']}</td>
+                    <td style="font-size: 12px;">{'<br>'.join(broken['found_on'])}</td>
+                </tr>
+"""
+                html += """
+            </tbody>
+        </table>
+"""
+            
+            if link_check['redirects']:
+                html += """
+        <h2>Redirects</h2>
+        <table>
+            <thead>
+                <tr>
+                    <th>Link</th>
+                    <th>Final URL</th>
+                    <th>Hops</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+                for redirect in link_check['redirects']:
+                    html += f"""
+                <tr>
+                    <td style="font-size: 12px;">{redirect['url']}</td>
+                    <td style="font-size: 12px;">{redirect['final_url']}</td>
+                    <td>{' &rarr; '.join(str(code) for code in redirect['chain'])}</td>
+                </tr>
+"""
+                html += """
+            </tbody>
+        </table>
+"""
+            
+            html += """
+    </div>
+"""
+        
         # Page-by-Page Analysis
         html += """
     <div class="section">
         <h1>Page-by-Page Analysis</h1>
 """
         
-        for page in pages_data:
+        for page in pages_data[:self.max_detailed_pages]:
+            checks = check_page(page)
             html += f"""
         <h2>{page['page_name']}</h2>
         <p style="color: #64748b; font-size: 12px; margin-top: -10px;">{page['url']}</p>
         
         <div class="metric-grid">
             <div class="metric-box">
-                <div class="metric-value {'status-good' if 50 <= page['title_length'] <= 60 else 'status-warning'}">{page['title_length']}</div>
+                <div class="metric-value status-{checks['title_length'][1]}">{page['title_length']}</div>
                 <div class="metric-label">Title Length (chars)</div>
             </div>
             <div class="metric-box">
-                <div class="metric-value {'status-good' if 120 <= page['meta_length'] <= 160 else 'status-warning'}">{page['meta_length']}</div>
+                <div class="metric-value status-{checks['meta_length'][1]}">{page['meta_length']}</div>
                 <div class="metric-label">Meta Desc (chars)</div>
             </div>
             <div class="metric-box">
-                <div class="metric-value {'status-good' if page['load_time'] < 3 else 'status-warning'}">{page['load_time']}s</div>
+                <div class="metric-value status-{checks['load_time'][1]}">{page['load_time']}s</div>
                 <div class="metric-label">Load Time</div>
             </div>
             <div class="metric-box">
@@ -612,11 +898,11 @@ class PDFGenerator:
                 <div class="metric-label">Page Size</div>
             </div>
             <div class="metric-box">
-                <div class="metric-value {'status-good' if page['h1_count'] == 1 else 'status-critical'}">{page['h1_count']}</div>
+                <div class="metric-value status-{checks['h1_count'][1]}">{page['h1_count']}</div>
                 <div class="metric-label">H1 Tags</div>
             </div>
             <div class="metric-box">
-                <div class="metric-value {'status-critical' if page['resources']['images_without_alt'] > 0 else 'status-good'}">{page['resources']['images_without_alt']}</div>
+                <div class="metric-value status-{checks['image_alt'][1]}">{page['resources']['images_without_alt']}</div>
                 <div class="metric-label">Images Missing ALT</div>
             </div>
         </div>
@@ -625,9 +911,30 @@ class PDFGenerator:
             <p><strong>Title:</strong> {page['title']}</p>
             <p><strong>Meta Description:</strong> {page['meta_description']}</p>
             <p><strong>Schema Markup:</strong> {', '.join(page['schemas']) if page['schemas'] else 'None detected'}</p>
+"""
+            if 'timing' in page:
+                phases = page['timing']['phases']
+                if page['timing']['runs'] > 1:
+                    load_time = f"median {phases['total']['median']}s, p90 {phases['total']['p90']}s over {page['timing']['runs']} runs"
+                else:
+                    load_time = f"{phases['total']['median']}s"
+                html += f"""
+            <p><strong>Load Time:</strong> {load_time} (DNS {phases['dns']['median']}s, Connect {phases['connect']['median']}s, TLS {phases['tls']['median']}s, TTFB {phases['ttfb']['median']}s, Transfer {phases['transfer']['median']}s)</p>
+            <p><strong>Page Weight:</strong> {page['page_weight_kb']} KB transferred including {page['page_weight']['asset_count']} scripts, stylesheets and images</p>
+"""
+            if 'internal_pagerank' in page:
+                html += f"""
+            <p><strong>Internal PageRank:</strong> {page['internal_pagerank']}x site average | <strong>Inbound Links:</strong> {page['inlinks']} | <strong>Click Depth:</strong> {page['click_depth'] if page['click_depth'] is not None else 'Unreachable'}</p>
+"""
+            html += """
         </div>
 """
         
+        if len(pages_data) > self.max_detailed_pages:
+            html += f"""
+        <p style="color: #64748b; font-size: 12px;">Showing {self.max_detailed_pages} of {len(pages_data)} analyzed pages.</p>
+"""
+        
         html += """
     </div>
 """
@@ -681,7 +988,7 @@ class PDFGenerator:
         
         return html
     
-def _html_to_pdf(self, html_content, website_name):
+    def _html_to_pdf(self, html_content, website_name):
         """Convert HTML to PDF and return file path"""
         
         # Create temp file
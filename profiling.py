@@ -0,0 +1,179 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# First matching frame from the innermost outwards decides where a sample's
+# time went
+CATEGORIES = [
+    ('pdf', ('xhtml2pdf', 'reportlab', 'html5lib', 'pdf_generator.py')),
+    ('parsing', ('bs4', 'html/parser.py', 'lxml', 'duplicate_detector.py')),
+    ('llm', ('anthropic',)),
+    ('google_api', ('googleapiclient', 'google/analytics', 'google/auth', 'grpc')),
+    ('database', ('sqlite3', 'audit_store.py')),
+    ('network', ('socket.py', 'ssl.py', 'http/client.py', 'urllib3', 'requests')),
+]
+# Samples whose innermost frame is in one of these are threads parked on a
+# lock, queue, future or event loop rather than working, and are left out
+IDLE_FILES = ('/threading.py', '/queue.py', '/selectors.py', '/concurrent/futures/')
+# Only stacks passing through this project's modules belong to an audit;
+# library threads (Streamlit's file watcher, idle pools) are left out
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One profiled audit at a time: the sampler and tracemalloc see the whole process
+_active = threading.Lock()
+
+def profiling_enabled():
+    """Whether AUDIT_PROFILE asks for every audit to be profiled"""
+    return os.getenv('AUDIT_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+def _category(filenames):
+    for filename in filenames:
+        normalized = filename.replace('\\', '/')
+        for category, markers in CATEGORIES:
+            if any(marker in normalized for marker in markers):
+                return category
+    return 'other'
+
+
+class StackSampler:
+    def __init__(self, interval=0.005):
+        """
+        Wall-clock sampling profiler covering every thread of the process
+
+        cProfile and pyinstrument only follow the thread that starts them,
+        while an audit's pages, assets and link checks run in thread pools.
+        Samples are kept as folded stacks (one "frame;frame;frame count" line
+        per stack), the input format of flamegraph.pl and speedscope.
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.leaves = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                leaf = frame.f_code.co_filename.replace('\\', '/')
+                if ident == own or any(marker in leaf for marker in IDLE_FILES):
+                    continue
+                frames = []
+                filenames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    filenames.append(code.co_filename)
+                    frame = frame.f_back
+                if not any(filename.startswith(PROJECT_DIR) for filename in filenames):
+                    continue
+                # Pool threads are numbered per pool; group them by pool
+                thread_name = re.sub(r'_\d+$', '', names.get(ident, str(ident)))
+                self.stacks[';'.join([thread_name] + frames[::-1])] += 1
+                self.leaves[frames[0]] += 1
+                self.categories[_category(filenames)] += 1
+                self.samples += 1
+
+    def write_folded(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profile_audit(name, enabled=True, interval=0.005, top_n=15):
+    """
+    Profile the enclosed block: sampled stacks of every thread plus
+    tracemalloc peak memory and top allocation sites
+
+    Files go to PROFILE_DIR (default "profiles"): <name>-<time>.folded (flame
+    graph input) and <name>-<time>.tracemalloc (a tracemalloc snapshot, load
+    with tracemalloc.Snapshot.load). tracemalloc records one frame per
+    allocation, which still makes allocation-heavy stages such as PDF
+    rendering several times slower, so compare stages within a profile
+    rather than with unprofiled timings.
+
+    Yields a dict filled in when the block exits: duration_s, samples,
+    categories (percent of samples in network, parsing, pdf, ...),
+    top_functions, peak_memory_mb, top_allocations and files. It stays empty
+    when `enabled` is false, and only holds 'skipped' when another audit in
+    this process is already being profiled.
+    """
+    result = {}
+    if not enabled:
+        yield result
+        return
+    if not _active.acquire(blocking=False):
+        result['skipped'] = "another audit is being profiled in this process"
+        yield result
+        return
+
+    try:
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(1)
+        tracemalloc.reset_peak()
+        sampler = StackSampler(interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            duration = time.perf_counter() - start
+            sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            profile_dir = os.getenv('PROFILE_DIR', 'profiles')
+            os.makedirs(profile_dir, exist_ok=True)
+            base = os.path.join(
+                profile_dir, f"{re.sub(r'[^A-Za-z0-9.-]+', '_', name)}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            )
+            sampler.write_folded(base + '.folded')
+            snapshot.dump(base + '.tracemalloc')
+
+            samples = sampler.samples or 1
+            result.update({
+                'duration_s': round(duration, 2),
+                'samples': sampler.samples,
+                'interval_ms': interval * 1000,
+                'categories': {
+                    category: round(100 * count / samples, 1) for category, count in sampler.categories.most_common()
+                },
+                'top_functions': [
+                    {'function': function, 'samples': count, 'percent': round(100 * count / samples, 1)}
+                    for function, count in sampler.leaves.most_common(top_n)
+                ],
+                'peak_memory_mb': round(peak / 1024 / 1024, 1),
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:top_n]
+                ],
+                'files': {'flamegraph': base + '.folded', 'memory': base + '.tracemalloc'}
+            })
+            logger.info("Profiled %s: %.1fs, peak %.1f MB, %s", name, duration, result['peak_memory_mb'], base)
+    finally:
+        _active.release()
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from tracing import span
+
+# Requests per second and burst size per destination. 'host' applies to each
+# website host separately, 'web' to all website requests together; the API
+# limits follow the published per-user quotas (Search Console ~1200 queries a
+# minute, Sheets 60 writes a minute, Anthropic tier 1 50 requests a minute)
+DEFAULT_LIMITS = {
+    'host': (20, 40),
+    'web': (200, 200),
+    'gsc': (10, 10),
+    'ga4': (5, 10),
+    'anthropic': (50 / 60, 5),
+    'smtp': (5, 10),
+    'sheets': (1, 5),
+}
+
+def parse_limits(spec):
+    """
+    Parse "name=rate[:burst],..." where rate is "N/s" or "N/m" (per minute),
+    e.g. "anthropic=1000/m:20,host=5/s"
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, value = item.split('=', 1)
+        rate, _, burst = value.partition(':')
+        count, _, unit = rate.partition('/')
+        per_second = float(count) / (60 if unit.strip() in ('m', 'min') else 1)
+        limits[name.strip()] = (per_second, float(burst) if burst else max(1.0, per_second))
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        Token bucket that hands out reservations instead of refusing
+
+        Tokens may go negative: each caller reserves the next free slot and
+        waits for it, so concurrent callers queue in arrival order.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now, tokens=1):
+        """Take `tokens` and return how long the caller must wait for them"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self, now):
+        """Whether the bucket has refilled completely (so it can be dropped)"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_hosts=10000):
+        """
+        Process-wide throttle for outbound calls
+
+        Callers block until their destination has capacity rather than
+        failing, so bursts of audits slow down instead of hitting 429s. Waits
+        show up as 'ratelimit.wait' spans. Limits apply per process; with
+        several worker processes each gets the full budget.
+
+        Args:
+            limits: {destination: (requests per second, burst)}; defaults to
+                DEFAULT_LIMITS overridden by the RATE_LIMITS environment variable
+            max_hosts: per-host buckets kept before idle ones are dropped
+        """
+        if limits is None:
+            limits = dict(DEFAULT_LIMITS, **parse_limits(os.getenv('RATE_LIMITS', '')))
+        self.limits = limits
+        self.max_hosts = max_hosts
+        self._buckets = {name: TokenBucket(*limit) for name, limit in limits.items() if name != 'host'}
+        self._hosts = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _host_bucket(self, host, now):
+        bucket = self._hosts.get(host)
+        if bucket is None:
+            if len(self._hosts) >= self.max_hosts:
+                self._hosts = {name: b for name, b in self._hosts.items() if not b.idle(now)}
+            bucket = self._hosts[host] = TokenBucket(*self.limits['host'])
+        return bucket
+
+    def _wait(self, destination, buckets, tokens):
+        with self._lock:
+            now = time.monotonic()
+            wait = max((bucket.reserve(now, tokens) for bucket in buckets), default=0.0)
+            stats = self._stats.setdefault(destination, {'requests': 0, 'waited': 0, 'wait_s': 0.0, 'max_wait_s': 0.0})
+            stats['requests'] += 1
+            if wait > 0:
+                stats['waited'] += 1
+                stats['wait_s'] += wait
+                stats['max_wait_s'] = max(stats['max_wait_s'], wait)
+        if wait > 0:
+            with span('ratelimit.wait', destination=destination, wait_ms=round(wait * 1000, 1)):
+                time.sleep(wait)
+        return wait
+
+    def acquire(self, service, tokens=1):
+        """
+        Block until `service` ('gsc', 'ga4', 'anthropic', 'smtp', 'sheets')
+        may be called; returns the seconds waited
+        """
+        bucket = self._buckets.get(service)
+        return self._wait(service, [bucket] if bucket else [], tokens)
+
+    def acquire_host(self, url):
+        """Block until a request to `url`'s host may start; returns the seconds waited"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            buckets = [self._host_bucket(host, time.monotonic())] if 'host' in self.limits else []
+        if 'web' in self._buckets:
+            buckets.append(self._buckets['web'])
+        return self._wait('host', buckets, 1)
+
+    def stats(self):
+        """Per destination: requests, how many waited, total and longest wait in seconds"""
+        with self._lock:
+            return {destination: dict(stats) for destination, stats in self._stats.items()}
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,250 @@
+import contextvars
+import random
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from rate_limiter import rate_limiter
+from tracing import current_span, span
+
+# HTTP statuses worth retrying
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+# gRPC status names (GA4) and exception class names (Anthropic, google-api-core,
+# google-auth) of transient failures that carry no HTTP status
+TRANSIENT_CODES = {'UNAVAILABLE', 'RESOURCE_EXHAUSTED', 'DEADLINE_EXCEEDED', 'INTERNAL', 'ABORTED'}
+TRANSIENT_NAMES = {'APIConnectionError', 'APITimeoutError', 'ServiceUnavailable', 'DeadlineExceeded',
+                   'TooManyRequests', 'ResourceExhausted', 'TransportError', 'RetryError'}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+def _status_of(error):
+    """HTTP status of an API error, if it has one"""
+    for candidate in (getattr(error, 'status_code', None), getattr(getattr(error, 'resp', None), 'status', None),
+                      getattr(error, 'code', None)):
+        if isinstance(candidate, int):
+            return candidate
+        if isinstance(candidate, str) and candidate.isdigit():
+            return int(candidate)
+    return None
+
+def is_transient(error):
+    """Whether a failed call may succeed if retried (rate limited, overloaded, unreachable)"""
+    status = _status_of(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if getattr(code, 'name', None) in TRANSIENT_CODES:
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError, socket.timeout)) or type(error).__name__ in TRANSIENT_NAMES
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, or None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers is None:
+        headers = getattr(error, 'resp', None)  # googleapiclient: httplib2 response (a dict)
+    try:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        return float(value) if value else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        """
+        Fail fast while a service is down
+
+        After `failure_threshold` consecutive transient failures the circuit
+        opens and calls raise CircuitOpenError for `reset_timeout` seconds.
+        Then one trial call is let through (half-open): success closes the
+        circuit, failure opens it again.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"{self.name} is unavailable after repeated failures; retrying in {max(remaining, 0):.0f}s"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+# Runs hedged attempts; shared by every service
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class ResilientService:
+    def __init__(self, name, max_attempts=4, base_delay=0.5, max_delay=20, rate_limit=None, hedge=False,
+                 hedge_after=2.0, breaker=None):
+        """
+        Retries, circuit breaking and optional hedging for calls to one service
+
+        Args:
+            name: service name used in errors and spans
+            max_attempts: attempts per call, including the first
+            base_delay, max_delay: backoff bounds in seconds; the wait before
+                retry n is drawn uniformly from [0, min(max_delay, base_delay * 2**(n-1))]
+                ("full jitter", so clients that failed together don't retry
+                together), or follows Retry-After when the service sends one
+            rate_limit: rate_limiter destination acquired before every attempt
+            hedge: when an attempt is slower than the service's recent p95
+                latency (`hedge_after` seconds until enough calls were seen),
+                start a duplicate and use whichever finishes first. Only for
+                idempotent calls on thread-safe clients.
+            breaker: CircuitBreaker for calls made without a key (one per
+                service by default); calls with a key get a breaker of their
+                own, so one failing site or property doesn't trip the circuit
+                for every other one
+        """
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit = rate_limit
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker(name)
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+        self._latencies = deque(maxlen=200)
+
+    def breaker_for(self, key=None):
+        """The CircuitBreaker for calls about `key` (a site URL or property ID)"""
+        if key is None:
+            return self.breaker
+        with self._breakers_lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(
+                    f"{self.name} ({key})", self.breaker.failure_threshold, self.breaker.reset_timeout
+                )
+            return breaker
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging: recent p95 latency once 20 calls were seen"""
+        latencies = sorted(self._latencies)
+        if len(latencies) < 20:
+            return self.hedge_after
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _run_once(self, func):
+        if self.rate_limit:
+            rate_limiter.acquire(self.rate_limit)
+        start = time.monotonic()
+        result = func()
+        self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _run_hedged(self, func):
+        # Each attempt runs in its own copy of the caller's context so its
+        # spans join the caller's trace
+        first = _hedge_pool.submit(contextvars.copy_context().run, self._run_once, func)
+        done, _ = wait([first], timeout=self.hedge_delay())
+        if done:
+            return first.result()
+
+        current = current_span()
+        if current is not None:
+            current.set_attribute('hedged', True)
+        pending = {first, _hedge_pool.submit(contextvars.copy_context().run, self._run_once, func)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower attempt finishes in the background and is ignored
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+        return delay
+
+    def call(self, func, key=None):
+        """
+        Call `func()` (no arguments) with retries on transient errors
+
+        Args:
+            key: site URL, property ID or other resource the call is about;
+                failures only open the circuit for calls with the same key
+
+        Raises:
+            CircuitOpenError if the circuit is open, otherwise the last error
+            once attempts run out or on a non-transient error
+        """
+        breaker = self.breaker_for(key)
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker.before_call()
+            try:
+                result = self._run_hedged(func) if self.hedge else self._run_once(func)
+            except Exception as e:
+                transient = is_transient(e)
+                # A non-transient error (bad request, no permission) still
+                # means the service is up
+                if transient:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if not transient or attempt >= self.max_attempts:
+                    raise
+                delay = self._backoff(attempt, e)
+                with span('retry.backoff', service=self.name, attempt=attempt, error=type(e).__name__):
+                    time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            if attempt > 1:
+                current = current_span()
+                if current is not None:
+                    current.set_attribute('attempts', attempt)
+            return result
+
+# The googleapiclient (httplib2) transport is not thread-safe, so Search
+# Console calls are not hedged; the GA4 gRPC client is
+gsc_api = ResilientService('Google Search Console', rate_limit='gsc')
+ga4_api = ResilientService('Google Analytics', rate_limit='ga4', hedge=True)
+anthropic_api = ResilientService('Anthropic', max_attempts=3, base_delay=2, max_delay=60, rate_limit='anthropic')
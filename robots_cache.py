@@ -0,0 +1,228 @@
+import re
+import threading
+import time
+from urllib.parse import urljoin, urlsplit, unquote
+
+import requests
+
+from rate_limiter import rate_limiter
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+# Product token matched against robots.txt User-agent groups
+ROBOTS_USER_AGENT = 'seo-audit-bot'
+
+
+class _RuleTrie:
+    """Prefix trie of plain (wildcard-free) rules for longest-match lookups"""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, path, allow):
+        node = self.root
+        for char in path:
+            node = node.setdefault(char, {})
+        # Allow wins over disallow for identical paths
+        node[None] = allow or node.get(None, False)
+
+    def longest_match(self, path):
+        """Return (match_length, allow) for the longest rule prefixing `path`, or (-1, True)"""
+        node = self.root
+        best = (0, node[None]) if None in node else (-1, True)
+        for depth, char in enumerate(path, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                best = (depth, node[None])
+        return best
+
+
+class RobotsRules:
+    def __init__(self, status=200, allow_all=False, disallow_all=False):
+        """Parsed rules of one robots.txt for one user-agent"""
+        self.status = status
+        self.allow_all = allow_all
+        self.disallow_all = disallow_all
+        self.crawl_delay = None
+        self.sitemaps = []
+        self.allow_rules = 0
+        self.disallow_rules = 0
+        self.raw_length = 0
+        self._trie = _RuleTrie()
+        self._patterns = []  # (length, allow, compiled regex) for rules with * or $
+
+    def _add_rule(self, path, allow):
+        if allow:
+            self.allow_rules += 1
+        else:
+            self.disallow_rules += 1
+        if '*' in path or path.endswith('$'):
+            anchored = path.endswith('$')
+            body = path[:-1] if anchored else path
+            regex = '.*'.join(re.escape(part) for part in body.split('*')) + ('$' if anchored else '')
+            self._patterns.append((len(path), allow, re.compile(regex)))
+        else:
+            self._trie.add(path, allow)
+
+    def can_fetch(self, url):
+        """Whether the URL may be crawled (longest matching rule wins, allow wins ties)"""
+        if self.allow_all:
+            return True
+        if self.disallow_all:
+            return False
+        parts = urlsplit(url)
+        path = unquote(parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        if path == '/robots.txt':
+            return True
+
+        length, allow = self._trie.longest_match(path)
+        for pattern_length, pattern_allow, regex in self._patterns:
+            if pattern_length >= length and regex.match(path):
+                if pattern_length > length or pattern_allow:
+                    length, allow = pattern_length, pattern_allow
+        return allow
+
+    def summary(self):
+        """Directive overview for technical findings"""
+        return {
+            'status': self.status,
+            'allow_rules': self.allow_rules,
+            'disallow_rules': self.disallow_rules,
+            'crawl_delay': self.crawl_delay,
+            'sitemaps': list(self.sitemaps),
+            'blocks_all': self.disallow_all or not self.can_fetch('/'),
+        }
+
+def parse_robots(text, user_agent=ROBOTS_USER_AGENT, base_url=''):
+    """
+    Parse robots.txt per RFC 9309 for one user-agent
+
+    Uses the group naming `user_agent` if there is one, otherwise the `*` group.
+    """
+    groups = []  # [agents, rules, crawl_delay]
+    sitemaps = []
+    current = None
+    last_was_agent = False
+
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line or ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key == 'user-agent':
+            if current is None or not last_was_agent:
+                current = [[], [], None]
+                groups.append(current)
+            current[0].append(value.lower())
+            last_was_agent = True
+            continue
+        last_was_agent = False
+
+        if key == 'sitemap':
+            if value:
+                sitemaps.append(urljoin(base_url, value))
+        elif current is None:
+            continue
+        elif key in ('allow', 'disallow'):
+            current[1].append((value, key == 'allow'))
+        elif key == 'crawl-delay':
+            try:
+                current[2] = float(value)
+            except ValueError:
+                pass
+
+    token = user_agent.lower()
+    chosen = [group for group in groups if token in group[0]]
+    if not chosen:
+        chosen = [group for group in groups if '*' in group[0]]
+
+    rules = RobotsRules()
+    rules.sitemaps = sitemaps
+    rules.raw_length = len(text)
+    for _, group_rules, crawl_delay in chosen:
+        for path, allow in group_rules:
+            # An empty Disallow means "allow everything" and adds no rule
+            if path:
+                rules._add_rule(path, allow)
+        if crawl_delay is not None:
+            rules.crawl_delay = crawl_delay
+    return rules
+
+
+class RobotsCache:
+    def __init__(self, ttl=3600, error_ttl=300, timeout=5, user_agent=ROBOTS_USER_AGENT):
+        """
+        Per-host robots.txt rules shared by every crawl in the process
+
+        Args:
+            ttl: seconds to keep successfully fetched rules
+            error_ttl: seconds to keep the result of a failed fetch
+            timeout: robots.txt request timeout
+            user_agent: product token used to select the rule group
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._entries = {}  # origin -> (expires_at, rules)
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _origin(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _fetch(self, origin):
+        try:
+            rate_limiter.acquire_host(origin)
+            response = requests.get(f"{origin}/robots.txt", headers=HEADERS, timeout=self.timeout)
+        except Exception:
+            # Unreachable robots.txt: treat as a temporary full disallow
+            return RobotsRules(status=None, disallow_all=True), self.error_ttl
+
+        if response.status_code >= 500:
+            return RobotsRules(status=response.status_code, disallow_all=True), self.error_ttl
+        if response.status_code >= 400:
+            return RobotsRules(status=response.status_code, allow_all=True), self.ttl
+
+        rules = parse_robots(response.text, self.user_agent, origin)
+        rules.status = response.status_code
+        return rules, self.ttl
+
+    def get(self, url):
+        """Rules for the URL's host, fetching robots.txt at most once per TTL"""
+        origin = self._origin(url)
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            host_lock = self._locks.setdefault(origin, threading.Lock())
+
+        # One fetch per host even when many crawl threads ask at once
+        with host_lock:
+            with self._lock:
+                entry = self._entries.get(origin)
+                if entry and entry[0] > time.monotonic():
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            rules, ttl = self._fetch(origin)
+            with self._lock:
+                self._entries[origin] = (time.monotonic() + ttl, rules)
+            return rules
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(url)
+
+    def crawl_delay(self, url):
+        return self.get(url).crawl_delay
+
+robots_cache = RobotsCache()
@@ -0,0 +1,369 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from audit_engine import run_full_audit
+from audit_store import findings_snapshot
+from email_sender import EmailSender
+from metrics import start_from_env as start_metrics
+
+logger = logging.getLogger(__name__)
+
+CRON_FIELDS = [('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 6)]
+
+
+class CronSchedule:
+    def __init__(self, expression):
+        """
+        Five-field cron expression (minute hour day month weekday)
+
+        Supports *, lists, ranges and steps (e.g. "30 6 * * 1", "0 */6 * * *",
+        "0 9 1,15 * *"). Weekday 0 and 7 are Sunday. As in cron, when both day
+        and weekday are restricted a time matches if either does.
+        """
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {len(parts)}: {expression!r}")
+        self.expression = expression
+        self.fields = {}
+        for part, (name, low, high) in zip(parts, CRON_FIELDS):
+            self.fields[name] = self._parse_field(part, low, 7 if name == 'weekday' else high)
+        self.fields['weekday'] = {day % 7 for day in self.fields['weekday']}
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(','):
+            range_part, _, step = item.partition('/')
+            step = int(step) if step else 1
+            if range_part == '*':
+                start, end = low, high
+            elif '-' in range_part:
+                start, end = (int(value) for value in range_part.split('-', 1))
+            else:
+                start = int(range_part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.fields['day']
+        # datetime weekday(): Monday=0; cron: Sunday=0
+        weekday = (moment.weekday() + 1) % 7 in self.fields['weekday']
+        if self.day_restricted and self.weekday_restricted:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, moment):
+        """First matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.fields['month'] or not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.fields['hour']:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.fields['minute']:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+def stable_jitter(key, spread_seconds):
+    """Deterministic per-site offset so sites sharing a schedule don't start together"""
+    if spread_seconds <= 0:
+        return 0
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % spread_seconds
+
+
+class SiteRegistry:
+    def __init__(self, db_path="scheduler.db"):
+        """
+        SQLite registry of monitored sites and their audit results
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sites (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    company TEXT,
+                    gsc_property TEXT,
+                    ga4_property_id TEXT,
+                    schedule TEXT NOT NULL,
+                    active INTEGER NOT NULL DEFAULT 1,
+                    next_run_at REAL NOT NULL,
+                    last_run_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    site_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT NOT NULL,
+                    pages INTEGER,
+                    metrics TEXT,
+                    pdf_path TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sites_due ON sites (active, next_run_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_site ON results (site_id, id)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_site(self, url, name, email, schedule, next_run_at, company=None, gsc_property=None, ga4_property_id=None):
+        """Register a site (or update its settings) and return its id"""
+        CronSchedule(schedule)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sites (url, name, email, company, gsc_property, ga4_property_id, schedule, next_run_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET name = excluded.name, email = excluded.email, "
+                "company = excluded.company, gsc_property = excluded.gsc_property, "
+                "ga4_property_id = excluded.ga4_property_id, schedule = excluded.schedule, "
+                "next_run_at = excluded.next_run_at, active = 1",
+                (url, name, email, company, gsc_property, ga4_property_id, schedule, next_run_at)
+            )
+            return conn.execute("SELECT id FROM sites WHERE url = ?", (url,)).fetchone()['id']
+
+    def remove_site(self, site_id):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE sites SET active = 0 WHERE id = ?", (site_id,))
+
+    def list_sites(self, active_only=True):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM sites" + (" WHERE active = 1" if active_only else "") + " ORDER BY next_run_at"
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def claim_due(self, now, limit, next_run_for):
+        """
+        Claim up to `limit` due sites, moving each to its next run time so it
+        is not picked up again while it runs
+        """
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM sites WHERE active = 1 AND next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            sites = [dict(row) for row in rows]
+            conn.executemany(
+                "UPDATE sites SET next_run_at = ?, last_run_at = ? WHERE id = ?",
+                [(next_run_for(site), datetime.now().strftime("%Y-%m-%d %H:%M:%S"), site['id']) for site in sites]
+            )
+            return sites
+
+    def record_result(self, site_id, status, started_at, pages=None, metrics=None, pdf_path=None, error=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO results (site_id, status, started_at, finished_at, pages, metrics, pdf_path, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (site_id, status, started_at, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pages,
+                 json.dumps(metrics) if metrics is not None else None, pdf_path, error)
+            )
+
+    def results(self, site_id, limit=12):
+        """Most recent results of a site, newest first, with parsed metrics for trend reports"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM results WHERE site_id = ? ORDER BY id DESC LIMIT ?", (site_id, limit)
+            ).fetchall()
+        results = [dict(row) for row in rows]
+        for result in results:
+            result['metrics'] = json.loads(result['metrics']) if result['metrics'] else None
+        return results
+
+
+class AuditScheduler:
+    def __init__(self, registry, max_concurrent=2, jitter_seconds=900, poll_interval=30, send_email=True):
+        """
+        Runs audits of registered sites on their cron schedules
+
+        Args:
+            registry: SiteRegistry
+            max_concurrent: audits running at once across all sites
+            jitter_seconds: spread of the per-site start offset
+            poll_interval: seconds between checks for due sites
+            send_email: email each report through EmailSender
+        """
+        self.registry = registry
+        self.max_concurrent = max_concurrent
+        self.jitter_seconds = jitter_seconds
+        self.poll_interval = poll_interval
+        self.send_email = send_email
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='scheduled-audit')
+        self._running = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._email_sender = None
+
+    def next_run_at(self, schedule, url, after=None):
+        """Epoch seconds of the next scheduled run of `url`, jitter included"""
+        moment = CronSchedule(schedule).next_after(after or datetime.now())
+        return moment.timestamp() + stable_jitter(url, self.jitter_seconds)
+
+    def _next_run_for(self, site):
+        return self.next_run_at(site['schedule'], site['url'])
+
+    def run_pending(self):
+        """Start every due site that fits in the free concurrency slots; returns how many started"""
+        with self._lock:
+            free = self.max_concurrent - self._running
+            if free <= 0:
+                return 0
+            sites = self.registry.claim_due(time.time(), free, self._next_run_for)
+            self._running += len(sites)
+        for site in sites:
+            self.executor.submit(self._run_site, site)
+        return len(sites)
+
+    def _run_site(self, site):
+        started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            client_data = {'name': site['name'], 'email': site['email'], 'company': site['company'] or '',
+                           'website': site['url']}
+            bundle = run_full_audit(site['url'], client_data, site['gsc_property'], site['ga4_property_id'])
+            if bundle is None:
+                self.registry.record_result(site['id'], 'failed', started_at, error="Could not fetch the website")
+                return
+            metrics = findings_snapshot(bundle['pages_data'], bundle['technical_findings'],
+                                        bundle['gsc_data'], bundle['ga4_data'])['site']
+            self.registry.record_result(site['id'], 'completed', started_at, pages=len(bundle['pages_data']),
+                                        metrics=metrics, pdf_path=bundle['pdf_path'], error=bundle['pdf_error'])
+            if self.send_email:
+                self._get_email_sender().send_audit_complete_email(
+                    site['email'], site['name'], site['url'], bundle['pdf_path']
+                )
+            logger.info("Audited %s (%d pages)", site['url'], len(bundle['pages_data']))
+        except Exception as e:
+            logger.exception("Scheduled audit of %s failed", site['url'])
+            self.registry.record_result(site['id'], 'failed', started_at, error=str(e))
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _get_email_sender(self):
+        with self._lock:
+            if self._email_sender is None:
+                self._email_sender = EmailSender()
+            return self._email_sender
+
+    def run_forever(self):
+        logger.info("Scheduler started (%d concurrent audits)", self.max_concurrent)
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                self._stop.wait(self.poll_interval)
+        finally:
+            self.shutdown()
+
+    def shutdown(self, email_timeout=None):
+        """
+        Wait for running audits, then deliver their queued report emails
+
+        The outbox worker is a daemon thread, so without this a process
+        exiting right after its audits (run --once from cron) would leave the
+        reports undelivered.
+        """
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            email_sender = self._email_sender
+        if email_sender is not None:
+            if email_timeout is None:
+                email_timeout = float(os.getenv('SCHEDULER_EMAIL_DRAIN_TIMEOUT', '120'))
+            sent = email_sender.flush(email_timeout)
+            logger.info("Delivered %d queued email(s) before exit", sent)
+
+    def stop(self):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled recurring SEO audits")
+    parser.add_argument('--db', default=os.getenv('SCHEDULER_DB_PATH', 'scheduler.db'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="register a site")
+    add.add_argument('url')
+    add.add_argument('--name', required=True)
+    add.add_argument('--email', required=True)
+    add.add_argument('--schedule', default='0 6 * * 1', help="cron expression (default: Mondays 06:00)")
+    add.add_argument('--company')
+    add.add_argument('--gsc-property')
+    add.add_argument('--ga4-property-id')
+
+    remove = commands.add_parser('remove', help="stop monitoring a site")
+    remove.add_argument('site_id', type=int)
+
+    commands.add_parser('list', help="list registered sites")
+
+    history = commands.add_parser('history', help="recent results of a site")
+    history.add_argument('site_id', type=int)
+
+    run = commands.add_parser('run', help="run the scheduler")
+    run.add_argument('--once', action='store_true', help="start due audits, wait for them and exit")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    registry = SiteRegistry(args.db)
+    scheduler = AuditScheduler(
+        registry,
+        max_concurrent=int(os.getenv('SCHEDULER_MAX_CONCURRENT', '2')),
+        jitter_seconds=int(os.getenv('SCHEDULER_JITTER_SECONDS', '900')),
+        poll_interval=float(os.getenv('SCHEDULER_POLL_INTERVAL', '30'))
+    )
+
+    if args.command == 'add':
+        site_id = registry.add_site(
+            args.url, args.name, args.email, args.schedule, scheduler.next_run_at(args.schedule, args.url),
+            company=args.company, gsc_property=args.gsc_property, ga4_property_id=args.ga4_property_id
+        )
+        print(f"Registered site {site_id}: {args.url} ({args.schedule})")
+    elif args.command == 'remove':
+        registry.remove_site(args.site_id)
+    elif args.command == 'list':
+        for site in registry.list_sites():
+            next_run = datetime.fromtimestamp(site['next_run_at']).strftime("%Y-%m-%d %H:%M")
+            print(f"{site['id']:>4}  {site['url']}  [{site['schedule']}]  next {next_run}  last {site['last_run_at'] or '-'}")
+    elif args.command == 'history':
+        for result in registry.results(args.site_id):
+            metrics = result['metrics'] or {}
+            print(f"{result['finished_at']}  {result['status']:<9}  pages {result['pages'] or 0:>4}  "
+                  f"broken links {metrics.get('broken_links')}  avg KB {metrics.get('avg_page_kb')}  "
+                  f"{result['error'] or result['pdf_path'] or ''}")
+    elif args.once:
+        scheduler.run_pending()
+        scheduler.shutdown()
+    else:
+        start_metrics()
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import numpy as np
+
+
+class Condition:
+    def __init__(self, expression, text):
+        """
+        Test on a feature value `x`
+
+        `expression` only uses comparisons joined with & and |, so the same
+        source evaluates a single value or a whole NumPy column of values.
+        """
+        self.expression = expression
+        self.text = text
+        self._code = compile(expression, '<condition>', 'eval')
+
+    def test(self, x):
+        """Evaluate for a value, or elementwise for an array"""
+        return eval(self._code, {}, {'x': x})
+
+def between(low, high, text=None):
+    return Condition(f"((x >= {low!r}) & (x <= {high!r}))", text or f"{low}-{high}")
+
+def below(limit, text=None):
+    return Condition(f"(x < {limit!r})", text or f"under {limit}")
+
+def at_least(limit, text=None):
+    return Condition(f"(x >= {limit!r})", text or f"{limit} or more")
+
+def equals(value, text=None):
+    return Condition(f"(x == {value!r})", text or f"exactly {value}")
+
+def present(text="present"):
+    return Condition("(x == True)", text)
+
+
+class Rule:
+    def __init__(self, key, label, feature, good, points=0, tiers=None, scaled=False, severity='warning',
+                 problem='NEEDS WORK', unit=''):
+        """
+        One SEO check, declared once and shared by the UI, the LLM prompt and
+        the scorer
+
+        Args:
+            key: identifier used in evaluation results
+            label: human-readable name
+            feature: name of the value checked, from PAGE_FEATURES or SITE_FEATURES
+            good: Condition for the check to pass; otherwise its status is
+                `severity` ('warning' or 'critical')
+            points: score for passing
+            tiers: [(Condition, points), ...] scored instead, first match
+                wins, for checks that earn partial points
+            scaled: score the value (a 0-1 ratio) times `points`, rounded down
+            problem: wording for a failed check in the LLM prompt
+            unit: appended to the value and target when displayed
+        """
+        self.key = key
+        self.label = label
+        self.feature = feature
+        self.good = good
+        self.points = points
+        self.tiers = tiers if tiers is not None else ([(good, points)] if points and not scaled else [])
+        self.scaled = scaled
+        self.severity = severity
+        self.problem = problem
+        self.unit = unit
+
+    @property
+    def target(self):
+        return f"{self.good.text}{self.unit}"
+
+    @property
+    def max_points(self):
+        return self.points if self.scaled else max((points for _, points in self.tiers), default=0)
+
+def _alt_ratio(page):
+    resources = page['resources']
+    if not resources['total_images']:
+        return 1.0  # nothing to fix
+    return 1 - resources['images_without_alt'] / resources['total_images']
+
+# Values the page rules read from a page_data dict (see analyze_single_page)
+PAGE_FEATURES = {
+    'title_length': lambda page: page['title_length'],
+    'meta_length': lambda page: page['meta_length'],
+    'h1_count': lambda page: page['h1_count'],
+    'load_time': lambda page: page['load_time'],
+    'page_size_kb': lambda page: page['page_size_kb'],
+    'has_schema': lambda page: bool(page['schemas']),
+    'has_canonical': lambda page: bool(page['page_elements'].get('has_canonical')),
+    'has_opengraph': lambda page: bool(page['page_elements'].get('has_opengraph')),
+    'has_gsc_verification': lambda page: bool(page['page_elements'].get('has_gsc_verification')),
+    'alt_ratio': _alt_ratio,
+}
+
+# Values the site rules read from a {'technical', 'gsc', 'ga4'} dict
+SITE_FEATURES = {
+    'has_robots_txt': lambda site: bool(site['technical'].get('has_robots_txt')),
+    'has_sitemap': lambda site: bool(site['technical'].get('has_sitemap')),
+    'gsc_connected': lambda site: bool(site['gsc'] and site['gsc'].get('success')),
+    'ga4_connected': lambda site: bool(site['ga4'] and site['ga4'].get('success')),
+}
+
+PAGE_RULES = [
+    Rule('title_length', "Title length", 'title_length', between(50, 60),
+         tiers=[(between(50, 60), 10), (between(30, 70), 5)], problem='NEEDS OPTIMIZATION', unit=' chars'),
+    Rule('meta_length', "Meta description length", 'meta_length', between(120, 160),
+         tiers=[(between(120, 160), 10), (between(80, 180), 5)], unit=' chars'),
+    Rule('h1_count', "H1 tags", 'h1_count', equals(1), 5, severity='critical', problem='ISSUE'),
+    Rule('load_time', "Load time", 'load_time', below(3), tiers=[(below(2), 5), (below(3), 3)], problem='SLOW',
+         unit='s'),
+    Rule('page_size', "Page size", 'page_size_kb', below(1000), problem='HEAVY', unit=' KB'),
+    Rule('schema', "Schema markup", 'has_schema', present(), 10, severity='critical', problem='MISSING'),
+    Rule('canonical', "Canonical tag", 'has_canonical', present(), 5, problem='MISSING'),
+    Rule('opengraph', "OpenGraph tags", 'has_opengraph', present(), 5, problem='INCOMPLETE'),
+    Rule('gsc_verification', "GSC verification", 'has_gsc_verification', present(), 5, problem='NOT DETECTED'),
+    Rule('image_alt', "Image ALT text", 'alt_ratio', at_least(1, "on every image"), 5, scaled=True,
+         severity='critical', problem='MISSING ALT'),
+]
+
+SITE_RULES = [
+    Rule('robots_txt', "robots.txt", 'has_robots_txt', present(), 5, problem='MISSING'),
+    Rule('sitemap', "XML sitemap", 'has_sitemap', present(), 5, problem='MISSING'),
+    Rule('gsc_connected', "Search Console data", 'gsc_connected', present(), 10, problem='NOT CONNECTED'),
+    Rule('ga4_connected', "Analytics data", 'ga4_connected', present(), 10, problem='NOT CONNECTED'),
+]
+
+
+def compile_rules(rules, features):
+    """
+    Compile `rules` into one function: record -> {rule key: (value, status, points)}
+
+    The generated code reads each feature once and has every threshold
+    inlined, so evaluating many pages costs no per-rule lookups or dispatch.
+    """
+    lines = ["def evaluate(record):", "    results = {}"]
+    for i, rule in enumerate(rules):
+        lines += [
+            f"    x = _feature_{i}(record)",
+            f"    status = 'good' if {rule.good.expression} else {rule.severity!r}",
+        ]
+        if rule.scaled:
+            lines.append(f"    points = int(x * {rule.points!r})")
+        else:
+            keyword = 'if'
+            for condition, points in rule.tiers:
+                lines += [f"    {keyword} {condition.expression}:", f"        points = {points!r}"]
+                keyword = 'elif'
+            lines += ["    else:", "        points = 0"] if rule.tiers else ["    points = 0"]
+        lines.append(f"    results[{rule.key!r}] = (x, status, points)")
+    lines.append("    return results")
+
+    source = "\n".join(lines)
+    namespace = {f"_feature_{i}": features[rule.feature] for i, rule in enumerate(rules)}
+    exec(compile(source, f"<seo_rules:{len(rules)} rules>", 'exec'), namespace)
+    evaluate = namespace['evaluate']
+    evaluate.source = source
+    return evaluate
+
+_evaluate_page = compile_rules(PAGE_RULES, PAGE_FEATURES)
+_evaluate_site = compile_rules(SITE_RULES, SITE_FEATURES)
+RULES_BY_KEY = {rule.key: rule for rule in PAGE_RULES + SITE_RULES}
+
+def check_page(page):
+    """{rule key: (value, status, points)} for one page_data dict"""
+    return _evaluate_page(page)
+
+def check_pages(pages):
+    """check_page for a batch of pages"""
+    evaluate = _evaluate_page
+    return [evaluate(page) for page in pages]
+
+def check_site(technical_findings, gsc_data, ga4_data):
+    """{rule key: (value, status, points)} for the site-wide rules"""
+    return _evaluate_site({'technical': technical_findings or {}, 'gsc': gsc_data, 'ga4': ga4_data})
+
+def is_good(checks, key):
+    return checks[key][1] == 'good'
+
+def status_text(checks, key):
+    """'GOOD' or the rule's problem wording, for the LLM prompt"""
+    return 'GOOD' if is_good(checks, key) else RULES_BY_KEY[key].problem
+
+# Lower bounds of the page score bands, as labelled in the PDF report
+SCORE_BANDS = [('excellent', 80), ('good', 60), ('needs_improvement', 40), ('critical', 0)]
+
+def feature_columns(pages, rules=PAGE_RULES, features=PAGE_FEATURES):
+    """{feature: float64 array with one value per page} for the features `rules` read"""
+    return {
+        name: np.fromiter((features[name](page) for page in pages), dtype=np.float64, count=len(pages))
+        for name in dict.fromkeys(rule.feature for rule in rules)
+    }
+
+def score_pages(pages, rules=PAGE_RULES):
+    """
+    Score every page at once on feature columns
+
+    Rules are applied to whole NumPy columns rather than page by page, so a
+    crawl of thousands of pages is scored in a few array operations per rule.
+
+    Returns:
+        (points, passed, scores): points and passed map rule keys to per-page
+        arrays of points earned and of booleans; scores holds each page's
+        points as a percentage of the most the page rules can give
+    """
+    columns = feature_columns(pages, rules)
+    points = {}
+    passed = {}
+    for rule in rules:
+        x = columns[rule.feature]
+        passed[rule.key] = np.asarray(rule.good.test(x), dtype=bool)
+        if rule.scaled:
+            points[rule.key] = np.floor(x * rule.points)
+        elif rule.tiers:
+            points[rule.key] = np.select([condition.test(x) for condition, _ in rule.tiers],
+                                         [tier_points for _, tier_points in rule.tiers], default=0)
+        else:
+            points[rule.key] = np.zeros(len(pages))
+    total = sum(points.values()) if points else np.zeros(len(pages))
+    max_total = sum(rule.max_points for rule in rules) or 1
+    return points, passed, 100 * total / max_total
+
+def summarize_page_scores(pages, top_n=10):
+    """
+    Site-wide distribution of page scores
+
+    Returns:
+        dict with pages, mean, min, max, percentiles (p10-p90), bands (page
+        counts per SCORE_BANDS label), rules (share of pages passing each
+        check) and weakest (lowest-scoring pages and their failed checks),
+        or None without pages
+    """
+    if not pages:
+        return None
+    points, passed, scores = score_pages(pages)
+    percentiles = np.percentile(scores, [10, 25, 50, 75, 90])
+
+    bands = {}
+    upper = np.inf
+    for label, lower in SCORE_BANDS:
+        bands[label] = int(np.count_nonzero((scores >= lower) & (scores < upper)))
+        upper = lower
+
+    weakest = []
+    for index in np.argsort(scores, kind='stable')[:top_n]:
+        weakest.append({
+            'url': pages[index]['url'],
+            'score': round(float(scores[index]), 1),
+            'failed': [rule.label for rule in PAGE_RULES if not passed[rule.key][index]]
+        })
+
+    return {
+        'pages': len(pages),
+        'mean': round(float(scores.mean()), 1),
+        'min': round(float(scores.min()), 1),
+        'max': round(float(scores.max()), 1),
+        'percentiles': {f'p{p}': round(float(value), 1) for p, value in zip((10, 25, 50, 75, 90), percentiles)},
+        'bands': bands,
+        'rules': [
+            {'key': rule.key, 'label': rule.label, 'target': rule.target,
+             'passed_pct': round(100 * float(passed[rule.key].mean()), 1),
+             'failing': int(len(pages) - np.count_nonzero(passed[rule.key]))}
+            for rule in PAGE_RULES
+        ],
+        'weakest': weakest
+    }
+
+def calculate_seo_score(pages_data, technical_findings, gsc_data, ga4_data, mode='homepage'):
+    """
+    Overall SEO score out of 100: the site rules plus the page rules
+
+    With mode 'homepage' the page rules are applied to the homepage
+    (pages_data[0]); with mode 'site' they give the average points of every
+    page.
+    """
+    score = sum(points for _, _, points in check_site(technical_findings, gsc_data, ga4_data).values())
+    if pages_data:
+        if mode == 'site':
+            points, _, _ = score_pages(pages_data)
+            score += round(float(np.mean(sum(points.values()))))
+        else:
+            score += sum(points for _, _, points in check_page(pages_data[0]).values())
+    return min(score, 100)
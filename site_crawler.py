@@ -0,0 +1,243 @@
+import contextvars
+import hashlib
+import heapq
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid')
+
+def normalize_url(url, base_url=None):
+    """
+    Canonical form of a URL for deduplication
+
+    Resolves relative URLs, lowercases scheme and host, drops default ports,
+    fragments and tracking parameters, and sorts the query string.
+    Returns None for anything that is not http(s).
+    """
+    if base_url:
+        url = urljoin(base_url, url.strip())
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(sorted(query)), ''))
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        """Fixed-size probabilistic set; never forgets, may report false positives"""
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SeenURLs:
+    def __init__(self, exact_limit=100000, bloom_capacity=10000000):
+        """Exact set for normal sites that switches to a Bloom filter past `exact_limit` URLs"""
+        self.exact_limit = exact_limit
+        self.bloom_capacity = bloom_capacity
+        self._exact = set()
+        self._bloom = None
+        self.count = 0
+
+    def add(self, url):
+        """Add a URL; returns False if it was (probably) already seen"""
+        if url in self:
+            return False
+        self.count += 1
+        if self._bloom is not None:
+            self._bloom.add(url)
+            return True
+        self._exact.add(url)
+        if len(self._exact) > self.exact_limit:
+            self._bloom = BloomFilter(self.bloom_capacity)
+            for seen in self._exact:
+                self._bloom.add(seen)
+            self._exact = None
+        return True
+
+    def __contains__(self, url):
+        if self._bloom is not None:
+            return url in self._bloom
+        return url in self._exact
+
+
+class SiteCrawler:
+    def __init__(self, analyze_page, max_pages=4, max_depth=3, max_workers=8,
+                 politeness_delay=0.2, max_frontier=50000, priority_keywords=(), robots=None):
+        """
+        Breadth-first site crawler
+
+        Args:
+            analyze_page: callable(url, page_name) returning page data with a 'links'
+                list of absolute internal URLs, or None if the page failed
+            max_pages: page budget (successfully analyzed pages)
+            max_depth: maximum click depth from the start URL
+            max_workers: concurrent page fetches
+            politeness_delay: minimum seconds between request starts to the same host
+            max_frontier: maximum queued URLs; further discoveries are dropped
+            priority_keywords: URLs containing these are crawled first within a depth level
+            robots: optional RobotsCache; disallowed URLs are skipped and Crawl-delay
+                raises the per-host delay
+        """
+        self.analyze_page = analyze_page
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self.politeness_delay = politeness_delay
+        self.max_frontier = max_frontier
+        self.priority_keywords = tuple(k.lower() for k in priority_keywords)
+        self.robots = robots
+        self.blocked_by_robots = 0
+
+        self._host_next_slot = {}
+        self._host_lock = threading.Lock()
+
+    def allowed(self, url):
+        """Whether a URL may be queued"""
+        if self.robots is not None and not self.robots.can_fetch(url):
+            self.blocked_by_robots += 1
+            return False
+        return True
+
+    def _priority(self, url):
+        url_lower = url.lower()
+        return 0 if any(keyword in url_lower for keyword in self.priority_keywords) else 1
+
+    def _wait_for_host(self, url):
+        """Reserve the next request slot for the URL's host and sleep until it"""
+        delay = self.politeness_delay
+        if self.robots is not None:
+            delay = max(delay, self.robots.crawl_delay(url) or 0)
+        if not delay:
+            return
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._host_next_slot.get(host, now))
+            self._host_next_slot[host] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _fetch(self, url, page_name):
+        self._wait_for_host(url)
+        try:
+            return self.analyze_page(url, page_name)
+        except Exception:
+            return None
+
+    def crawl(self, start_url, on_page=None, start_page=None, seed_urls=()):
+        """
+        Crawl from `start_url` until the page budget, depth limit or frontier is exhausted
+
+        Args:
+            start_url: first URL (becomes the "Homepage")
+            on_page: optional callback(page_data, pages_done) run on the calling thread
+            start_page: page data for `start_url` if the caller already analyzed it
+            seed_urls: extra URLs (e.g. from sitemaps) queued at depth 1 behind linked pages
+
+        Returns:
+            list of page data dicts in completion order (the homepage is always first)
+        """
+        start_url = normalize_url(start_url) or start_url
+        seen = SeenURLs()
+        seen.add(start_url)
+        frontier = []
+        sequence = 0
+
+        def enqueue(url, depth, priority):
+            nonlocal sequence
+            url = normalize_url(url)
+            if not url or url in seen or len(frontier) >= self.max_frontier:
+                return
+            seen.add(url)
+            if not self.allowed(url):
+                return
+            sequence += 1
+            heapq.heappush(frontier, (depth, priority, sequence, url))
+
+        # The start page is analyzed on its own so it is always first
+        if start_page is None:
+            start_page = self._fetch(start_url, "Homepage")
+        if not start_page:
+            return []
+        pages = [start_page]
+        if on_page:
+            on_page(start_page, 1)
+        if self.max_depth > 0:
+            for link in start_page.get('links', []):
+                enqueue(link, 1, self._priority(link))
+
+        start_host = urlsplit(start_url).netloc
+        for seed in seed_urls:
+            if urlsplit(seed).netloc == start_host:
+                enqueue(seed, 1, 2 + self._priority(seed))
+
+        in_flight = {}
+        dispatched = 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier or in_flight:
+                # Keep workers busy while the remaining budget allows
+                while frontier and len(in_flight) < self.max_workers and len(pages) + len(in_flight) < self.max_pages:
+                    depth, _, _, url = heapq.heappop(frontier)
+                    dispatched += 1
+                    # Run in a copy of the caller's context so per-page work joins its trace
+                    future = executor.submit(contextvars.copy_context().run, self._fetch, url, f"Page {dispatched}")
+                    in_flight[future] = depth
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = in_flight.pop(future)
+                    page_data = future.result()
+                    if not page_data:
+                        continue
+
+                    pages.append(page_data)
+                    if on_page:
+                        on_page(page_data, len(pages))
+
+                    if depth < self.max_depth:
+                        for link in page_data.get('links', []):
+                            enqueue(link, depth + 1, self._priority(link))
+
+                if len(pages) >= self.max_pages:
+                    for future in in_flight:
+                        future.cancel()
+                    break
+
+        return pages
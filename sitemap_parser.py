@@ -0,0 +1,167 @@
+import gzip
+import xml.etree.ElementTree as ET
+from collections import deque
+from urllib.parse import urljoin
+
+import requests
+
+from rate_limiter import rate_limiter
+from site_crawler import normalize_url
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+GZIP_MAGIC = b'\x1f\x8b'
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class _PeekableStream:
+    """File-like wrapper that allows peeking at the first bytes of a raw response"""
+
+    def __init__(self, raw, head):
+        self.raw = raw
+        self.head = head
+
+    def read(self, size=-1):
+        if self.head:
+            if size is None or size < 0:
+                data, self.head = self.head + self.raw.read(), b''
+                return data
+            data, self.head = self.head[:size], self.head[size:]
+            if len(data) < size:
+                data += self.raw.read(size - len(data))
+            return data
+        return self.raw.read(size)
+
+
+class SitemapCollector:
+    def __init__(self, max_urls=200000, max_sitemaps=50, timeout=15):
+        """
+        Streams sitemaps (including indexes and .gz files) into a URL set
+
+        Args:
+            max_urls: stop collecting page URLs after this many
+            max_sitemaps: maximum number of sitemap files fetched per site
+            timeout: request timeout in seconds
+        """
+        self.max_urls = max_urls
+        self.max_sitemaps = max_sitemaps
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+
+    def _open(self, sitemap_url):
+        """Open a sitemap as a decompressed byte stream without reading it into memory"""
+        rate_limiter.acquire_host(sitemap_url)
+        response = self.session.get(sitemap_url, timeout=self.timeout, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True  # undo Content-Encoding: gzip
+        head = response.raw.read(2)
+        stream = _PeekableStream(response.raw, head)
+        if head == GZIP_MAGIC:
+            # A .xml.gz file served as-is
+            stream = gzip.GzipFile(fileobj=stream)
+        return response, stream
+
+    def _parse(self, stream, on_page_url, on_sitemap_url):
+        """
+        Incrementally parse one sitemap document
+
+        Returns 'index' for <sitemapindex>, 'urlset' for <urlset>.
+        """
+        context = ET.iterparse(stream, events=('start', 'end'))
+        _, root = next(context)
+        kind = 'index' if _local_name(root.tag) == 'sitemapindex' else 'urlset'
+
+        for event, element in context:
+            if event != 'end':
+                continue
+            name = _local_name(element.tag)
+            if name == 'loc' and element.text:
+                loc = element.text.strip()
+                if kind == 'index':
+                    on_sitemap_url(loc)
+                elif not on_page_url(loc):
+                    break
+            elif name in ('url', 'sitemap'):
+                # Drop finished entries so memory stays flat for 50k-URL files
+                root.clear()
+        return kind
+
+    def collect(self, base_url, declared_sitemaps=None):
+        """
+        Fetch and parse every sitemap reachable for a site
+
+        Args:
+            base_url: site URL; /sitemap.xml is tried when nothing is declared
+            declared_sitemaps: sitemap URLs from robots.txt
+
+        Returns:
+            dict with urls (set of normalized page URLs), url_count, sitemaps
+            (files parsed), index_count, truncated flag and errors
+        """
+        queue = deque(declared_sitemaps or [urljoin(base_url, '/sitemap.xml')])
+        queued = set(queue)
+        urls = set()
+        parsed = []
+        errors = []
+        index_count = 0
+        truncated = False
+
+        def on_page_url(loc):
+            nonlocal truncated
+            if len(urls) >= self.max_urls:
+                truncated = True
+                return False
+            normalized = normalize_url(loc, base_url)
+            if normalized:
+                urls.add(normalized)
+            return True
+
+        def on_sitemap_url(loc):
+            loc = urljoin(base_url, loc)
+            if loc not in queued:
+                queued.add(loc)
+                queue.append(loc)
+
+        while queue and len(parsed) < self.max_sitemaps and not truncated:
+            sitemap_url = queue.popleft()
+            try:
+                response, stream = self._open(sitemap_url)
+                with response:
+                    kind = self._parse(stream, on_page_url, on_sitemap_url)
+                parsed.append(sitemap_url)
+                if kind == 'index':
+                    index_count += 1
+            except Exception as e:
+                errors.append({'sitemap': sitemap_url, 'error': str(e)[:200]})
+
+        return {
+            'urls': urls,
+            'url_count': len(urls),
+            'sitemaps': parsed,
+            'index_count': index_count,
+            'truncated': truncated or bool(queue),
+            'errors': errors
+        }
+
+def sitemap_coverage(pages_data, sitemap_urls, sample_size=20):
+    """
+    Compare crawled pages against the sitemap
+
+    Returns:
+        dict with sitemap_urls, crawled_in_sitemap, coverage_pct (share of crawled
+        pages listed in the sitemap) and a sample of crawled pages missing from it
+    """
+    if not sitemap_urls or not pages_data:
+        return None
+    crawled = [normalize_url(page['url']) or page['url'] for page in pages_data]
+    in_sitemap = [url for url in crawled if url in sitemap_urls]
+    missing = [url for url in crawled if url not in sitemap_urls]
+    return {
+        'sitemap_urls': len(sitemap_urls),
+        'crawled_in_sitemap': len(in_sitemap),
+        'coverage_pct': round(len(in_sitemap) / len(crawled) * 100, 1),
+        'missing_from_sitemap': missing[:sample_size],
+        'missing_from_sitemap_count': len(missing)
+    }
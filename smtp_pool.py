@@ -0,0 +1,159 @@
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class SMTPConnectionPool:
+    def __init__(self, smtp_server, smtp_port, username, password, max_size=4,
+                 max_idle_seconds=30, max_messages_per_connection=100, timeout=30):
+        """
+        Pool of authenticated SMTP sessions shared between senders
+
+        Args:
+            smtp_server: SMTP host
+            smtp_port: SMTP port (STARTTLS is always negotiated)
+            username: login user
+            password: login password
+            max_size: maximum number of open connections
+            max_idle_seconds: idle time after which a connection is checked with NOOP before reuse
+            max_messages_per_connection: recycle a session after this many messages
+            timeout: socket timeout in seconds
+        """
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+
+        self._idle = deque()  # (server, last_used, messages_sent)
+        self._open_count = 0
+        self._lock = threading.Condition()
+
+    def _connect(self):
+        """Open, secure and authenticate a new SMTP session"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            self._quietly_close(server)
+            raise
+        return server
+
+    def _is_healthy(self, server):
+        """Check a session with NOOP"""
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _quietly_close(self, server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self):
+        """Take an idle session or open a new one, waiting if the pool is exhausted"""
+        with self._lock:
+            while True:
+                if self._idle:
+                    # Most recently used first: it is the most likely to still be alive
+                    server, last_used, sent = self._idle.pop()
+                    break
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    server, last_used, sent = None, None, 0
+                    break
+                self._lock.wait()
+
+        if server is not None:
+            if time.monotonic() - last_used < self.max_idle_seconds or self._is_healthy(server):
+                return server, sent
+            self._quietly_close(server)
+
+        try:
+            return self._connect(), 0
+        except Exception:
+            self._discard()
+            raise
+
+    def _release(self, server, sent):
+        with self._lock:
+            if sent >= self.max_messages_per_connection:
+                self._open_count -= 1
+                recycle = True
+            else:
+                self._idle.append((server, time.monotonic(), sent))
+                recycle = False
+            self._lock.notify()
+        if recycle:
+            self._quietly_close(server)
+
+    def _discard(self, server=None):
+        with self._lock:
+            self._open_count -= 1
+            self._lock.notify()
+        if server is not None:
+            self._quietly_close(server)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow an authenticated session
+
+        Yields a list [server, messages_sent]; callers increment the counter
+        for each message. Sessions that raise are closed instead of returned.
+        """
+        server, sent = self._acquire()
+        slot = [server, sent]
+        try:
+            yield slot
+        except Exception:
+            self._discard(slot[0])
+            raise
+        self._release(slot[0], slot[1])
+
+    def send_message(self, message):
+        """Send one message, reconnecting once if the pooled session was dropped"""
+        for attempt in range(2):
+            try:
+                with self.connection() as slot:
+                    slot[0].send_message(message)
+                    slot[1] += 1
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if attempt == 1:
+                    raise
+
+    def close(self):
+        """Close all idle sessions"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open_count -= len(idle)
+            self._lock.notify_all()
+        for server, _, _ in idle:
+            self._quietly_close(server)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_smtp_pool(smtp_server, smtp_port, username, password, **kwargs):
+    """Return the process-wide pool for these credentials, creating it on first use"""
+    key = (smtp_server, int(smtp_port), username)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(smtp_server, int(smtp_port), username, password, **kwargs)
+            _pools[key] = pool
+        return pool
@@ -0,0 +1,252 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        """
+        One timed operation, modelled on an OpenTelemetry span
+
+        Spans started while another span is current (in the same context)
+        become its children and share its trace id.
+        """
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = 'OK'
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = 'ERROR'
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_otlp(self):
+        """OTLP/JSON-style representation"""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.start_ns + int(self.duration * 1e9),
+            'attributes': self.attributes,
+            'status': {'code': self.status, 'message': self.error}
+        }
+
+
+class ConsoleExporter:
+    """Logs each finished span as one line"""
+
+    def export(self, span):
+        logger.info("span %s %.1fms %s%s", span.name, span.duration * 1000, span.status,
+                    f" {span.attributes}" if span.attributes else "")
+
+
+class JsonlExporter:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backups=3, flush_interval=1.0):
+        """
+        Appends finished spans to a JSONL file, one OTLP-style object per line
+
+        The file stays open with buffered writes, flushed at most every
+        `flush_interval` seconds and at exit. Once it grows past `max_bytes`
+        it is renamed to <path>.1 (older files shift up to <path>.<backups>)
+        and a new file is started.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self._file = None
+        self._flushed_at = 0.0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def export(self, span):
+        line = json.dumps(span.to_otlp(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(line + "\n")
+            now = time.monotonic()
+            if now - self._flushed_at >= self.flush_interval:
+                self._file.flush()
+                self._flushed_at = now
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class TraceCollector:
+    def __init__(self, max_traces=200):
+        """Keeps finished spans per trace in memory so a trace can be summarized"""
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+
+    def pop(self, trace_id):
+        with self._lock:
+            return self._traces.pop(trace_id, [])
+
+_exporters = []
+# Added with add_exporter(); kept when configure() replaces the exporters
+_listeners = []
+_collector = TraceCollector()
+
+def configure(exporters=None):
+    """
+    Set the span exporters
+
+    Defaults to TRACE_EXPORTERS (comma-separated: console, jsonl, none; default
+    none) with the JSONL file at TRACE_FILE (default traces.jsonl), rotated at
+    TRACE_FILE_MAX_MB (default 50) keeping TRACE_FILE_BACKUPS (default 3) old
+    files. Spans still feed trace_summary() and metrics without exporters.
+    """
+    global _exporters
+    if exporters is None:
+        exporters = []
+        names = os.getenv('TRACE_EXPORTERS', 'none')
+        for name in (n.strip() for n in names.split(',')):
+            if name == 'console':
+                exporters.append(ConsoleExporter())
+            elif name == 'jsonl':
+                exporters.append(JsonlExporter(
+                    os.getenv('TRACE_FILE', 'traces.jsonl'),
+                    max_bytes=int(float(os.getenv('TRACE_FILE_MAX_MB', '50')) * 1024 * 1024),
+                    backups=int(os.getenv('TRACE_FILE_BACKUPS', '3'))
+                ))
+    _exporters = list(exporters)
+
+def add_exporter(exporter):
+    """Also send finished spans to `exporter` (anything with export(span))"""
+    _listeners.append(exporter)
+
+def current_span():
+    return _current_span.get()
+
+class span:
+    def __init__(self, name, **attributes):
+        """
+        Context manager timing a block as a child of the current span
+
+            with span('pdf.render', pages=len(pages_data)) as s:
+                ...
+                s.set_attribute('bytes', size)
+
+        Exceptions are recorded on the span and re-raised.
+        """
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.span = Span(self.name, _current_span.get(), self.attributes)
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.span.record_error(exc)
+        _collector.export(self.span)
+        for exporter in _exporters + _listeners:
+            try:
+                exporter.export(self.span)
+            except Exception:
+                logger.exception("Span export failed")
+        return False
+
+def traced(name=None):
+    """Decorator form of span(); the span is named after the function by default"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+def trace_summary(root):
+    """
+    Per-stage timings of the finished trace of span `root`
+
+    Returns:
+        dict with total_ms and, per span name, count, total/p50/p95/max ms and
+        errors, slowest stages first
+    """
+    by_name = {}
+    for finished in _collector.pop(root.trace_id):
+        by_name.setdefault(finished.name, []).append(finished)
+
+    stages = []
+    for name, spans in by_name.items():
+        durations = sorted(s.duration * 1000 for s in spans)
+        stages.append({
+            'name': name,
+            'count': len(spans),
+            'total_ms': round(sum(durations), 1),
+            'p50_ms': round(_percentile(durations, 50), 1),
+            'p95_ms': round(_percentile(durations, 95), 1),
+            'max_ms': round(durations[-1], 1),
+            'errors': sum(1 for s in spans if s.status == 'ERROR')
+        })
+    stages.sort(key=lambda stage: -stage['total_ms'])
+    return {
+        'trace_id': root.trace_id,
+        'total_ms': round(root.duration * 1000, 1) if root.duration is not None else None,
+        'stages': stages
+    }
+
+configure()
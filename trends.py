@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+def comparison_windows(end_date, days):
+    """
+    ((start, end), (previous_start, previous_end)): the current window ending
+    at `end_date` (start = end_date - days, as the fetchers always used) and
+    the window of the same length just before it
+    """
+    start = end_date - timedelta(days=days)
+    previous_end = start - timedelta(days=1)
+    return (start, end_date), (previous_end - timedelta(days=days), previous_end)
+
+def format_window(window):
+    return f"{window[0]} to {window[1]}"
+
+def change(current, previous):
+    """Current and previous value with their difference; change_pct is None without a previous value"""
+    current = current or 0
+    previous = previous or 0
+    return {
+        'current': current,
+        'previous': previous,
+        'change': round(current - previous, 2),
+        'change_pct': round((current - previous) / previous * 100, 1) if previous else None
+    }
+
+def compare_totals(current, previous, fields):
+    """{field: change()} for each of `fields` in two dicts of totals"""
+    return {field: change(current.get(field), previous.get(field)) for field in fields}
+
+def format_change(entry, suffix=''):
+    """e.g. "+12.5% (1,200 → 1,350)", for prompts and reports"""
+    if entry['change_pct'] is None:
+        return f"new ({entry['current']:,}{suffix})" if entry['current'] else "no data"
+    return f"{entry['change_pct']:+.1f}% ({entry['previous']:,}{suffix} → {entry['current']:,}{suffix})"
+
+def row_movement(current_rows, previous_rows, top_n=5):
+    """
+    How Search Console rows (queries or pages) moved between two periods
+
+    Rows are {'keys': [key], 'clicks', 'impressions', 'position'} dicts.
+    Position changes are current minus previous, so negative means the row
+    ranks higher than before.
+
+    Returns:
+        dict with gainers and losers (by clicks), improved and declined (by
+        position, among rows with impressions in both periods), new and lost
+        (rows present in one period only), top_n of each
+    """
+    previous_by_key = {row['keys'][0]: row for row in previous_rows}
+    current_keys = set()
+    moved = []
+    new = []
+    for row in current_rows:
+        key = row['keys'][0]
+        current_keys.add(key)
+        before = previous_by_key.get(key)
+        if before is None:
+            new.append({'key': key, 'clicks': row['clicks'], 'position': round(row['position'], 1)})
+            continue
+        moved.append({
+            'key': key,
+            'clicks': row['clicks'],
+            'clicks_change': row['clicks'] - before['clicks'],
+            'position': round(row['position'], 1),
+            'position_change': round(row['position'] - before['position'], 1)
+        })
+    lost = [
+        {'key': key, 'clicks': row['clicks'], 'position': round(row['position'], 1)}
+        for key, row in previous_by_key.items() if key not in current_keys
+    ]
+
+    by_clicks = sorted(moved, key=lambda entry: entry['clicks_change'])
+    by_position = sorted(moved, key=lambda entry: entry['position_change'])
+    return {
+        'gainers': [entry for entry in reversed(by_clicks) if entry['clicks_change'] > 0][:top_n],
+        'losers': [entry for entry in by_clicks if entry['clicks_change'] < 0][:top_n],
+        'improved': [entry for entry in by_position if entry['position_change'] < 0][:top_n],
+        'declined': [entry for entry in reversed(by_position) if entry['position_change'] > 0][:top_n],
+        'new': sorted(new, key=lambda entry: -entry['clicks'])[:top_n],
+        'lost': sorted(lost, key=lambda entry: -entry['clicks'])[:top_n],
+        'new_count': len(new),
+        'lost_count': len(lost)
+    }